@@ -0,0 +1,238 @@
+# backend/columnar.py
+
+from array import array
+from decimal import Decimal
+
+try:
+    import numpy as np   # Opcional: solo para to_numpy()
+except ImportError:
+    np = None
+
+# DECIMAL(p, s) con p <= 18 entra en un entero de 64 bits escalado por 10**s
+MAX_SCALED_PRECISION = 18
+
+
+class _ArrayColumn:
+    """Columna numérica en un array tipado; los NULL se marcan en una máscara aparte."""
+    def __init__(self, typecode, scale=None, is_bool=False):
+        self.data = array(typecode)
+        self.nulls = None      # bytearray (1 = NULL); se crea con el primer NULL
+        self.scale = scale     # Solo DECIMAL: el valor guardado es valor * 10**scale
+        self.is_bool = is_bool
+
+    def __len__(self):
+        return len(self.data)
+
+    def append(self, value):
+        if value is None:
+            if self.nulls is None:
+                self.nulls = bytearray(len(self.data))
+            self.nulls.append(1)
+            self.data.append(0)
+            return
+        if self.nulls is not None:
+            self.nulls.append(0)
+        if self.scale is not None:
+            value = int(value.scaleb(self.scale))
+        self.data.append(value)
+
+    def get(self, i):
+        if self.nulls is not None and self.nulls[i]:
+            return None
+        value = self.data[i]
+        if self.scale is not None:
+            return Decimal(value).scaleb(-self.scale)
+        if self.is_bool:
+            return bool(value)
+        return value
+
+    def nbytes(self):
+        return self.data.itemsize * len(self.data) + (len(self.nulls) if self.nulls is not None else 0)
+
+
+class _DictColumn:
+    """Texto codificado por diccionario: cada valor distinto se guarda una sola vez."""
+    def __init__(self):
+        self.codes = array("i")   # -1 = NULL
+        self.values = []
+        self._lookup = {}
+
+    def __len__(self):
+        return len(self.codes)
+
+    def append(self, value):
+        if value is None:
+            self.codes.append(-1)
+            return
+        code = self._lookup.get(value)
+        if code is None:
+            code = self._lookup[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+    def get(self, i):
+        code = self.codes[i]
+        return None if code < 0 else self.values[code]
+
+    def nbytes(self):
+        return self.codes.itemsize * len(self.codes) + sum(len(v) for v in self.values)
+
+
+class _ObjectColumn:
+    """Resto de tipos (fechas, binarios, DECIMAL muy grandes): lista de Python."""
+    def __init__(self):
+        self.data = []
+
+    def __len__(self):
+        return len(self.data)
+
+    def append(self, value):
+        self.data.append(value)
+
+    def get(self, i):
+        return self.data[i]
+
+    def nbytes(self):
+        return 8 * len(self.data)
+
+
+def _make_column(description):
+    """Elige el almacenamiento según cursor.description (type_code, precision, scale)."""
+    type_code, precision, scale = description[1], description[4], description[5]
+    if type_code is bool:
+        return _ArrayColumn("b", is_bool=True)
+    if type_code is int:
+        return _ArrayColumn("q")
+    if type_code is float:
+        return _ArrayColumn("d")
+    if type_code is Decimal and precision and precision <= MAX_SCALED_PRECISION:
+        return _ArrayColumn("q", scale or 0)
+    if type_code is str:
+        return _DictColumn()
+    return _ObjectColumn()
+
+
+class ColumnView:
+    """Una columna dentro de la ventana [start, stop) de un ColumnarResult (sin copiar)."""
+    def __init__(self, name, store, start, stop):
+        self.name = name
+        self._store = store
+        self._start = start
+        self._stop = stop
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._store.get(self._start + i)
+
+    def __iter__(self):
+        get = self._store.get
+        for i in range(self._start, self._stop):
+            yield get(i)
+
+    @property
+    def is_numeric(self):
+        return isinstance(self._store, _ArrayColumn)
+
+    def buffer(self):
+        """memoryview sobre el array tipado (sin copia). DECIMAL viene escalado; ver scale."""
+        if not self.is_numeric:
+            raise TypeError(f"La columna {self.name} no es numérica.")
+        return memoryview(self._store.data)[self._start:self._stop]
+
+    @property
+    def scale(self):
+        return getattr(self._store, "scale", None)
+
+    def null_mask(self):
+        """memoryview de la máscara de NULL (1 = NULL) o None si la columna no tiene NULL."""
+        nulls = getattr(self._store, "nulls", None)
+        return None if nulls is None else memoryview(nulls)[self._start:self._stop]
+
+    def dictionary(self):
+        """(códigos, valores) de una columna de texto; código -1 = NULL."""
+        if not isinstance(self._store, _DictColumn):
+            raise TypeError(f"La columna {self.name} no es de texto.")
+        return memoryview(self._store.codes)[self._start:self._stop], self._store.values
+
+    def to_numpy(self):
+        """
+        Array NumPy que comparte memoria con la columna (requiere numpy).
+        Los NULL quedan en 0: usar null_mask() para distinguirlos.
+        """
+        if np is None:
+            raise ImportError("to_numpy() requiere numpy (pip install numpy).")
+        return np.frombuffer(self.buffer(), dtype=self._store.data.typecode)
+
+
+class ColumnarResult:
+    """
+    Resultado de una consulta guardado por columnas en lugar de por filas:
+    - numéricas (int, float, bit, DECIMAL <= 18 dígitos) en arrays tipados,
+    - texto codificado por diccionario,
+    - el resto en listas.
+    Rebanar (result[1000:2000]) devuelve otra vista sobre los mismos datos.
+    Las filas se arman recién al pedirlas (result[i], iteración, to_rows()).
+    """
+    def __init__(self, columns, stores, start=0, stop=None):
+        self.columns = list(columns)
+        self._stores = stores
+        self._index = {c.lower(): i for i, c in enumerate(self.columns)}
+        self._start = start
+        self._stop = (len(stores[0]) if stores else 0) if stop is None else stop
+
+    @classmethod
+    def from_cursor(cls, cursor, chunk_size=1000):
+        """Consume un cursor ya ejecutado de a chunk_size filas (sin lista intermedia de Row)."""
+        description = cursor.description
+        stores = [_make_column(d) for d in description]
+        appenders = [s.append for s in stores]
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                break
+            for row in chunk:
+                for append, value in zip(appenders, row):
+                    append(value)
+        return cls([d[0] for d in description], stores)
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                raise ValueError("ColumnarResult solo admite rebanadas contiguas (paso 1).")
+            return ColumnarResult(self.columns, self._stores, self._start + start,
+                                  self._start + max(start, stop))
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError(key)
+        i = self._start + key
+        return tuple(store.get(i) for store in self._stores)
+
+    def __iter__(self):
+        stores = self._stores
+        for i in range(self._start, self._stop):
+            yield tuple(store.get(i) for store in stores)
+
+    def column(self, name):
+        idx = self._index.get(name.lower())
+        if idx is None:
+            raise ValueError(f"La columna {name} no está en el resultado.")
+        return ColumnView(self.columns[idx], self._stores[idx], self._start, self._stop)
+
+    def to_rows(self):
+        """Lista de tuplas (mismo formato que fetch_table_data) para la ventana actual."""
+        return list(self)
+
+    def nbytes(self):
+        """Memoria aproximada de los datos (de todo el resultado, no solo de la vista)."""
+        return sum(store.nbytes() for store in self._stores)
@@ -1,3 +1,4 @@
+import os
 import socket
 
 # Credenciales y Configuración Global
@@ -10,21 +11,105 @@ SUPPORTED_TABLES = [
     "CLIENTE", "EMPLEADO", "FACTURA", "DETALLE_FACTURA"
 ]
 
+# Raíz del proyecto (para archivos generados en tiempo de ejecución)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Carpeta del catálogo de esquema en disco
+SCHEMA_CACHE_DIR = os.path.join(BASE_DIR, ".cache")
+
+# Pool de conexiones (ver backend/connection.py)
+POOL_SETTINGS = {
+    "max_size": 10,            # Conexiones abiertas como máximo
+    "max_idle_seconds": 300,   # Las ociosas por más tiempo se cierran
+    "ping_after_seconds": 30,  # Tras este tiempo ociosa se verifica con SELECT 1
+    "checkout_timeout": 15     # Segundos de espera por una conexión libre
+}
+
+# Filas por página en las lecturas paginadas (grilla de escritorio, exportaciones)
+PAGE_SIZE = 200
+
+# Filas por fetchmany() en las lecturas en streaming (exportaciones, reportes)
+STREAM_CHUNK_SIZE = 1000
+
+# Filas por lote (y por commit) en las cargas masivas con fast_executemany
+BULK_CHUNK_SIZE = 1000
+
+# SQL Server acepta hasta 2100 parámetros por sentencia: los IN (...) se parten
+# en bloques de este tamaño (ver generic_dao.in_chunks)
+MAX_IN_PARAMS = 2000
+
+# IDs que cada proceso reserva de una vez en ID_CONTADOR (asignación hi/lo)
+ID_BLOCK_SIZE = 20
+
+# Métricas por sentencia SQL y log de consultas lentas (ver backend/instrumentation.py)
+QUERY_STATS = {
+    "enabled": True,
+    "slow_query_ms": 200,   # Umbral para registrar una consulta como lenta
+    "slow_query_log": os.path.join(BASE_DIR, "logs", "slow_queries.log")
+}
+
+# Caché de lecturas de DataManager (LRU + TTL; las escrituras la invalidan por tabla)
+READ_CACHE = {
+    "max_entries": 256,   # Consultas distintas guardadas como máximo
+    "ttl_seconds": 30     # Cubre los cambios hechos fuera de la app
+}
+
+# Stock bajo: umbral por defecto para productos sin umbral propio (UMBRAL_STOCK).
+# En el resumen de la red se compara con el total; en las alertas, con el stock de cada sucursal.
+LOW_STOCK_THRESHOLD = 5
+
+# Alertas de stock bajo (ver backend/services/stock_alerts.py)
+STOCK_ALERTS = {
+    "scan_interval_seconds": 60,   # Revisión periódica completa (escritorio)
+    "coalesce_ms": 1500            # Alertas que llegan juntas se muestran en un solo toast
+}
+
+# Stock por (sucursal, producto) en memoria (ver backend/services/stock_cache.py)
+STOCK_CACHE = {
+    "max_entries": 5000,
+    "ttl_seconds": 10
+}
+
+# Catálogo web por sucursal en memoria (ver backend/services/catalog_cache.py)
+CATALOG_CACHE = {
+    "ttl_seconds": 60   # Cubre cambios hechos fuera de la app (otra PC, SQL directo)
+}
+
+# Login / registro web: correo -> cliente (ver backend/services/client_cache.py)
+CLIENT_CACHE = {
+    "max_entries": 2000,
+    "ttl_seconds": 300,
+    "negative_ttl_seconds": 10   # Correos no registrados: corto, por si se registran en otra PC
+}
+
 NODES = {
     "GUAYAQUIL": {
         "hostnames": ["MiniPC"],
         "db_name": "TechStore_Guayaquil",
         "role": "Publicador (Matriz)",
-        "id_sucursal": 2
+        "id_sucursal": 2,
+        "server": "MiniPC"
     },
     "QUITO": {
         "hostnames": ["LAPTOP"], 
         "db_name": "TechStore_Quito",
         "role": "Suscriptor (Sucursal)",
-        "id_sucursal": 3
+        "id_sucursal": 3,
+        "server": "LAPTOP"
     }
 }
 
+# Separación lectura/escritura (ver backend/connection.py).
+# Apagado, todo va a la BD local (SERVER_ADDR + db_name del nodo actual).
+# Encendido, las escrituras van al publicador y las lecturas de solo consulta al suscriptor.
+ROUTING = {
+    "enabled": False,
+    "primary": "GUAYAQUIL",   # Nodo que recibe las escrituras
+    "replica": "QUITO",       # Nodo que atiende catálogo, grillas y reportes
+    "sticky_seconds": 5,      # Tras un commit, el hilo sigue leyendo del primario (retraso de réplica)
+    "replica_retry_seconds": 30   # Réplica caída: se lee del primario sin reintentarla durante este tiempo
+}
+
 def get_current_node_config():
     """Detecta la PC y retorna la configuración del nodo actual."""
     pc_name = socket.gethostname()
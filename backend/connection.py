@@ -1,17 +1,406 @@
+import threading
+import time
+from contextlib import contextmanager
 import pyodbc
-from backend.config import SERVER_ADDR, DB_USER, DB_PASS, CURRENT_NODE
+from backend.config import (SERVER_ADDR, DB_USER, DB_PASS, CURRENT_NODE, NODES,
+                            POOL_SETTINGS, QUERY_STATS, ROUTING)
+from backend.instrumentation import InstrumentedCursor, get_query_stats
 
-def get_db_connection():
-    """Genera y retorna la conexión ODBC."""
+def build_connection_string(db_name, server=SERVER_ADDR):
+    """Arma la cadena ODBC para una base de datos (por defecto, del servidor configurado)."""
     conn_str = (
         f"DRIVER={{ODBC Driver 17 for SQL Server}};"
-        f"SERVER={SERVER_ADDR};"
-        f"DATABASE={CURRENT_NODE['db_name']};"
+        f"SERVER={server};"
+        f"DATABASE={db_name};"
     )
-    
+
     if DB_USER and DB_PASS:
         conn_str += f"UID={DB_USER};PWD={DB_PASS};"
     else:
         conn_str += "Trusted_Connection=yes;"
-        
-    return pyodbc.connect(conn_str)
\ No newline at end of file
+
+    return conn_str
+
+
+class _PoolEntry:
+    """Conexión física administrada por el pool (con sus tiempos de uso)."""
+    def __init__(self, raw):
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.owner_thread = None
+
+
+class PooledConnection:
+    """
+    Préstamo de una conexión del pool. Se usa igual que una conexión pyodbc,
+    pero close() la devuelve al pool en lugar de cerrarla físicamente.
+    """
+    def __init__(self, pool, entry):
+        self._pool = pool
+        self._entry = entry
+
+    def close(self):
+        entry, self._entry = self._entry, None
+        if entry is not None:
+            self._pool.release(entry)
+
+    def cursor(self):
+        # Todas las sentencias pasan por aquí: se miden para las métricas por SQL
+        if self._entry is None:
+            raise pyodbc.ProgrammingError("Attempt to use a closed connection.")
+        cursor = self._entry.raw.cursor()
+        if QUERY_STATS["enabled"]:
+            return InstrumentedCursor(cursor, get_query_stats())
+        return cursor
+
+    def execute(self, sql, *params):
+        return self.cursor().execute(sql, *params)
+
+    def commit(self):
+        if self._entry is None:
+            raise pyodbc.ProgrammingError("Attempt to use a closed connection.")
+        self._entry.raw.commit()
+        if self._pool.role == "primary":
+            _mark_write()
+
+    def __getattr__(self, name):
+        entry = self.__dict__.get("_entry")
+        if entry is None:
+            raise pyodbc.ProgrammingError("Attempt to use a closed connection.")
+        return getattr(entry.raw, name)
+
+    def __setattr__(self, name, value):
+        # Atributos propios con "_"; el resto (ej. autocommit) va a la conexión real
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)
+        elif self._entry is None:
+            raise pyodbc.ProgrammingError("Attempt to use a closed connection.")
+        else:
+            setattr(self._entry.raw, name, value)
+
+
+class ConnectionPool:
+    """
+    Pool acotado y thread-safe de conexiones ODBC.
+    - Préstamo/devolución con espera (y timeout) cuando se llega a max_size.
+    - Ping (SELECT 1) a las conexiones que estuvieron ociosas un rato.
+    - Cierre de conexiones ociosas por más de max_idle_seconds.
+    - Afinidad por hilo: cada hilo recupera primero la conexión que usó antes.
+    """
+    def __init__(self, conn_str, max_size=10, max_idle_seconds=300,
+                 ping_after_seconds=30, checkout_timeout=15, role="primary"):
+        self.conn_str = conn_str
+        self.role = role
+        self.max_size = max_size
+        self.max_idle_seconds = max_idle_seconds
+        self.ping_after_seconds = ping_after_seconds
+        self.checkout_timeout = checkout_timeout
+
+        self._cond = threading.Condition()
+        self._idle = []   # Conexiones libres (la última devuelta va al final)
+        self._size = 0    # Conexiones vivas: prestadas + libres + en creación
+        self._closed = False
+        self._stats = {
+            "checkouts": 0, "hits": 0, "thread_hits": 0, "creates": 0,
+            "waits": 0, "wait_seconds": 0.0, "timeouts": 0,
+            "pings": 0, "ping_failures": 0, "evictions": 0, "discards": 0,
+        }
+
+    # ------------------------------------------
+    # PRÉSTAMO Y DEVOLUCIÓN
+    # ------------------------------------------
+
+    def acquire(self):
+        stale = []
+        entry = None
+        with self._cond:
+            if self._closed:
+                raise pyodbc.ProgrammingError("El pool de conexiones está cerrado.")
+            self._stats["checkouts"] += 1
+            start = time.monotonic()
+            deadline = start + self.checkout_timeout
+            waited = False
+
+            while True:
+                stale.extend(self._evict_idle_locked())
+                entry = self._take_idle_locked()
+                if entry is not None:
+                    break
+                if self._size < self.max_size:
+                    self._size += 1  # Reservamos el cupo; la conexión se crea fuera del lock
+                    break
+
+                if not waited:
+                    waited = True
+                    self._stats["waits"] += 1
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    self._stats["wait_seconds"] += time.monotonic() - start
+                    raise TimeoutError(
+                        f"No hay conexiones libres tras {self.checkout_timeout}s "
+                        f"(max_size={self.max_size})."
+                    )
+                self._cond.wait(remaining)
+
+            if waited:
+                self._stats["wait_seconds"] += time.monotonic() - start
+
+        self._close_entries(stale)
+
+        # Operaciones de red (ping / connect) siempre fuera del lock
+        if entry is not None and not self._is_alive(entry):
+            self._close_entries([entry])
+            entry = None
+            with self._cond:
+                self._stats["discards"] += 1
+
+        if entry is None:
+            entry = self._create_entry()
+
+        entry.owner_thread = threading.get_ident()
+        return PooledConnection(self, entry)
+
+    def release(self, entry):
+        healthy = True
+        try:
+            # Lo que no se confirmó se descarta, igual que al cerrar una conexión
+            entry.raw.rollback()
+            if entry.raw.autocommit:
+                entry.raw.autocommit = False
+        except pyodbc.Error:
+            healthy = False
+
+        with self._cond:
+            if healthy and not self._closed:
+                entry.last_used = time.monotonic()
+                self._idle.append(entry)
+                entry = None
+            else:
+                self._size -= 1
+                self._stats["discards"] += 1
+            self._cond.notify()
+
+        if entry is not None:
+            self._close_entries([entry])
+
+    def close(self):
+        """Cierra las conexiones libres; las prestadas se cierran al devolverse."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        self._close_entries(idle)
+
+    def get_stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats["size"] = self._size
+            stats["idle"] = len(self._idle)
+            stats["in_use"] = self._size - len(self._idle)
+            stats["max_size"] = self.max_size
+            stats["role"] = self.role
+        return stats
+
+    # ------------------------------------------
+    # INTERNOS
+    # ------------------------------------------
+
+    def _take_idle_locked(self):
+        if not self._idle:
+            return None
+        current = threading.get_ident()
+        for idx in range(len(self._idle) - 1, -1, -1):
+            if self._idle[idx].owner_thread == current:
+                self._stats["hits"] += 1
+                self._stats["thread_hits"] += 1
+                return self._idle.pop(idx)
+        self._stats["hits"] += 1
+        return self._idle.pop()
+
+    def _evict_idle_locked(self):
+        if not self._idle:
+            return []
+        limit = time.monotonic() - self.max_idle_seconds
+        stale = [e for e in self._idle if e.last_used < limit]
+        if stale:
+            self._idle = [e for e in self._idle if e.last_used >= limit]
+            self._size -= len(stale)
+            self._stats["evictions"] += len(stale)
+        return stale
+
+    def _is_alive(self, entry):
+        if time.monotonic() - entry.last_used < self.ping_after_seconds:
+            return True
+        with self._cond:
+            self._stats["pings"] += 1
+        try:
+            cursor = entry.raw.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except pyodbc.Error:
+            with self._cond:
+                self._stats["ping_failures"] += 1
+            return False
+
+    def _create_entry(self):
+        try:
+            raw = pyodbc.connect(self.conn_str)
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats["creates"] += 1
+        return _PoolEntry(raw)
+
+    def _close_entries(self, entries):
+        for entry in entries:
+            try:
+                entry.raw.close()
+            except pyodbc.Error:
+                pass
+
+
+_pools = {}
+_pool_lock = threading.Lock()
+_local = threading.local()   # Por hilo: último commit y lecturas forzadas al primario
+_routing_stats = {"primary_reads": 0, "replica_reads": 0, "replica_failures": 0, "replica_skips": 0}
+_replica_down_until = 0.0    # Cortocircuito: hasta cuándo no se intenta la réplica (0 = disponible)
+
+def _count_read(key):
+    with _pool_lock:
+        _routing_stats[key] += 1
+
+_database_override = None    # (db_name, server) fijado por use_database()
+
+def _node_connection_string(role):
+    """Cadena ODBC del rol pedido; sin separación, ambos roles son la BD local."""
+    if _database_override is not None:
+        return build_connection_string(*_database_override)
+    if not ROUTING["enabled"]:
+        return build_connection_string(CURRENT_NODE['db_name'])
+    node = NODES[ROUTING[role]]
+    return build_connection_string(node['db_name'], node.get('server', SERVER_ADDR))
+
+def get_pool(role="primary"):
+    """Retorna el pool del rol pedido ("primary" o "replica"); se crea en el primer uso."""
+    if not ROUTING["enabled"] or _database_override is not None:
+        role = "primary"
+    pool = _pools.get(role)
+    if pool is None:
+        with _pool_lock:
+            pool = _pools.get(role)
+            if pool is None:
+                pool = _pools[role] = ConnectionPool(_node_connection_string(role), role=role, **POOL_SETTINGS)
+    return pool
+
+def _mark_write():
+    _local.last_write = time.monotonic()
+
+def _must_read_primary():
+    if getattr(_local, "force_primary", 0):
+        return True
+    last_write = getattr(_local, "last_write", None)
+    return last_write is not None and time.monotonic() - last_write < ROUTING["sticky_seconds"]
+
+@contextmanager
+def read_from_primary():
+    """
+    Dentro del bloque, las lecturas de este hilo van al primario
+    (read-your-writes cuando no se puede esperar a la réplica).
+    """
+    _local.force_primary = getattr(_local, "force_primary", 0) + 1
+    try:
+        yield
+    finally:
+        _local.force_primary -= 1
+
+def _replica_available():
+    """
+    Cortocircuito de la réplica: tras una falla de conexión no se la vuelve a
+    intentar por replica_retry_seconds (cada intento fallido espera el timeout de
+    login de ODBC). Vencido el plazo, un solo hilo la prueba; el resto sigue en el primario.
+    """
+    global _replica_down_until
+    with _pool_lock:
+        if not _replica_down_until:
+            return True
+        now = time.monotonic()
+        if now < _replica_down_until:
+            _routing_stats["replica_skips"] += 1
+            return False
+        _replica_down_until = now + ROUTING["replica_retry_seconds"]
+        return True
+
+def _set_replica_down(down):
+    global _replica_down_until
+    with _pool_lock:
+        _replica_down_until = time.monotonic() + ROUTING["replica_retry_seconds"] if down else 0.0
+
+def get_db_connection(read_only=False):
+    """
+    Presta una conexión ODBC del pool. Llamar a close() la devuelve.
+    read_only=True marca una lectura que puede servir la réplica; si la réplica
+    no responde, o el hilo escribió hace poco, se usa el primario.
+    """
+    if read_only and ROUTING["enabled"] and _database_override is None:
+        if not _must_read_primary() and _replica_available():
+            try:
+                conn = get_pool("replica").acquire()
+                _set_replica_down(False)
+                _count_read("replica_reads")
+                return conn
+            except pyodbc.Error as e:
+                _set_replica_down(True)
+                _count_read("replica_failures")
+                print(f"ALERTA: Réplica no disponible, se lee del primario por "
+                      f"{ROUTING['replica_retry_seconds']}s: {e}")
+            except TimeoutError as e:
+                # Pool de la réplica lleno: está ocupada, no caída
+                _count_read("replica_failures")
+                print(f"ALERTA: Réplica sin conexiones libres, se lee del primario: {e}")
+        _count_read("primary_reads")
+    return get_pool("primary").acquire()
+
+def get_pool_stats(role="primary"):
+    """Contadores del pool (esperas, reutilizaciones, creaciones...) para dimensionarlo."""
+    return get_pool(role).get_stats()
+
+def get_routing_stats():
+    """Lecturas servidas por réplica / primario, fallas de la réplica y lecturas desviadas por el cortocircuito."""
+    with _pool_lock:
+        return {"enabled": ROUTING["enabled"], "replica_down": time.monotonic() < _replica_down_until,
+                **_routing_stats}
+
+def use_database(db_name, server=SERVER_ADDR):
+    """
+    Apunta todas las conexiones del proceso a otra BD (ej. una copia local para
+    pruebas de carga), sin réplica. Cierra los pools actuales.
+    """
+    global _database_override
+    close_pool()
+    with _pool_lock:
+        _database_override = (db_name, server)
+
+def current_database():
+    """Nombre de la BD a la que apuntan las escrituras (la del nodo, o la de use_database)."""
+    if _database_override is not None:
+        return _database_override[0]
+    if ROUTING["enabled"]:
+        return NODES[ROUTING["primary"]]["db_name"]
+    return CURRENT_NODE["db_name"]
+
+def close_pool():
+    global _replica_down_until
+    with _pool_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+        _replica_down_until = 0.0
+    for pool in pools:
+        pool.close()
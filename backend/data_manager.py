@@ -1,10 +1,22 @@
 # backend/data_manager.py
 
-from backend.config import CURRENT_NODE, SUPPORTED_TABLES
+from backend.config import CURRENT_NODE, SUPPORTED_TABLES, PAGE_SIZE, STREAM_CHUNK_SIZE, READ_CACHE
 from backend.generic_dao import GenericDAO
 from backend.services.inventory_service import InventoryService
-from backend.connection import get_db_connection
+from backend.connection import get_pool_stats, get_routing_stats, read_from_primary
+from backend.instrumentation import get_query_stats
+from backend.schema_catalog import get_schema_catalog
+from backend.migrations import apply_migrations
+from backend.services.id_allocator import get_id_allocator
+from backend.services.stock_cache import get_stock_cache
+from backend.services.stock_alerts import get_stock_alert_engine
+from backend.services.catalog_cache import get_catalog_cache
+from backend.services.client_cache import get_client_cache
 from backend.services.web_service import WebService
+from backend.services.export_service import ExportService
+from backend.services.import_service import ImportService
+from backend.query_cache import QueryCache, freeze
+from backend.unit_of_work import UnitOfWork
 
 class DataManager:
     def __init__(self):
@@ -12,19 +24,59 @@ class DataManager:
         self.dao = GenericDAO()
         self.inventory_service = InventoryService()
         self.web_service = WebService()
+        self.export_service = ExportService(self.dao)
+        self.import_service = ImportService(self.dao)
+        # Caché de lecturas: se invalida por tabla en cada escritura hecha por aquí
+        self.cache = QueryCache(**READ_CACHE)
         self.current_node = CURRENT_NODE
+        self._ensure_db_objects()
         self.current_node["tables"] = self._get_available_tables_from_db()
 
+    def _invalidate(self, *tables):
+        """
+        Tras una escritura: descarta las lecturas cacheadas de esas tablas y, si tocan
+        productos o inventario por una vía que no informa el stock nuevo, el catálogo web;
+        si tocan CLIENTE, la caché de login.
+        (Los cambios de stock conocidos lo parchean en su lugar; ver on_stock_changed.)
+        """
+        self.cache.invalidate_table(*tables)
+        if "PRODUCTO" in tables or "INVENTARIO" in tables:
+            get_catalog_cache().invalidate()
+        if "CLIENTE" in tables:
+            get_client_cache().clear()
+
+    def _sync_brand_thresholds(self, table_name="PRODUCTO", columns=None):
+        """
+        Tras crear, borrar o cambiar de marca productos: aplica los umbrales por marca.
+        columns: columnas escritas por un UPDATE (sin "marca" no hay nada que aplicar).
+        """
+        if table_name.upper() != "PRODUCTO":
+            return
+        if columns is not None and "marca" not in {c.lower() for c in columns}:
+            return
+        try:
+            get_stock_alert_engine().sync_brand_thresholds()
+        except Exception as e:
+            print(f"ALERTA: No se pudieron aplicar los umbrales por marca: {e}")
+
+    def _ensure_db_objects(self):
+        """Crea los objetos auxiliares de la app (contadores de IDs, Change Tracking...) si faltan."""
+        try:
+            apply_migrations()
+        except Exception as e:
+            print(f"ALERTA: No se pudieron aplicar las migraciones: {e}")
+
     def _get_available_tables_from_db(self):
         """Método interno para filtrar qué tablas mostrar en el Sidebar"""
         existing_tables = []
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            query = "SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_TYPE = 'BASE TABLE'"
-            cursor.execute(query)
-            db_tables = [row[0] for row in cursor.fetchall()]
-            conn.close()
+            # El catálogo se lee de disco; una sola consulta (la marca de esquema)
+            # confirma que la copia sigue vigente; si la BD cambió, se reconstruye
+            catalog = get_schema_catalog().load()
+            if catalog.is_stale():
+                print("DEBUG: El esquema de la BD cambió; reconstruyendo el catálogo")
+                catalog.refresh()
+            db_tables = catalog.tables()
 
             # Intersección: Tablas en BD y Tablas Soportadas
             for table in SUPPORTED_TABLES:
@@ -37,51 +89,284 @@ class DataManager:
             print(f"ALERTA: Error detectando tablas: {e}")
             return []
 
+    def reload_schema(self):
+        """Vuelve a leer el esquema de la BD (tras un cambio de tablas/columnas)."""
+        get_schema_catalog().refresh()
+        self.current_node["tables"] = self._get_available_tables_from_db()
+        return self.current_node["tables"]
+
+    def get_primary_key(self, table_name):
+        """Columnas de la PK de la tabla, según el catálogo de esquema."""
+        return get_schema_catalog().primary_key(table_name)
+
     # ==========================================
     # DELEGACIÓN A GENERIC DAO (CRUD Básico)
     # ==========================================
     
-    def fetch_table_data(self, table_name):
-        return self.dao.fetch_table_data(table_name)
+    def fetch_table_data(self, table_name, columns=None, filters=None, search=None,
+                         search_columns=None, order_by=None):
+        """Proyección, filtros y orden se resuelven en SQL. Ver GenericDAO.fetch_table_data."""
+        key = freeze(("fetch_table_data", table_name, columns, filters, search, search_columns, order_by))
+        return self.cache.get_or_load(key, [table_name], lambda: self.dao.fetch_table_data(
+            table_name, columns, filters, search, search_columns, order_by
+        ))
+
+    def fetch_table_columnar(self, table_name, columns=None, filters=None, search=None,
+                             search_columns=None, order_by=None):
+        """Resultado por columnas para lecturas grandes (sin caché, como el streaming)."""
+        return self.dao.fetch_table_columnar(table_name, columns, filters, search, search_columns, order_by)
+
+    def stream_table_data(self, table_name, chunk_size=STREAM_CHUNK_SIZE, columns=None,
+                          filters=None, search=None, search_columns=None, order_by=None):
+        """(columns, generador de filas) con memoria constante. Ver GenericDAO.stream_table_data."""
+        return self.dao.stream_table_data(table_name, chunk_size, columns, filters,
+                                          search, search_columns, order_by)
+
+    def export_table(self, table_name, path, fmt=None, columns=None, filters=None,
+                     order_by=None, progress=None):
+        """Vuelca la tabla a CSV / Parquet / Arrow en streaming. Ver ExportService.export_table."""
+        return self.export_service.export_table(table_name, path, fmt, columns, filters,
+                                                order_by, STREAM_CHUNK_SIZE, progress)
+
+    def fetch_table_page(self, table_name, page_size=PAGE_SIZE, after_key=None, with_total=False,
+                         columns=None, filters=None, search=None, search_columns=None):
+        """Página de una tabla ordenada por PK. Ver GenericDAO.fetch_page."""
+        key = freeze(("fetch_page", table_name, page_size, after_key, with_total,
+                      columns, filters, search, search_columns))
+        return self.cache.get_or_load(key, [table_name], lambda: self.dao.fetch_page(
+            table_name, page_size, after_key, with_total, columns, filters, search, search_columns
+        ))
+
+    def get_change_token(self, table_name):
+        return self.dao.get_change_token(table_name)
+
+    def fetch_table_changes(self, table_name, since_token):
+        """Delta de la tabla desde since_token. Ver GenericDAO.fetch_changes."""
+        changes = self.dao.fetch_changes(table_name, since_token)
+        if changes["full"] or changes["inserted"] or changes["updated"] or changes["deleted"]:
+            # Lo cacheado de esta tabla ya no refleja la BD
+            self._invalidate(table_name)
+        return changes
+
+    # Las escrituras invalidan en finally: una carga por bloques puede fallar
+    # a mitad de camino con parte de los datos ya confirmados.
 
     def insert_data(self, table_name, data_dict):
-        return self.dao.insert_data(table_name, data_dict)
+        try:
+            return self.dao.insert_data(table_name, data_dict)
+        finally:
+            self._invalidate(table_name)
+            self._sync_brand_thresholds(table_name)
+
+    def insert_many(self, table_name, rows, columns=None):
+        """Carga masiva por bloques. Retorna estadísticas (filas, filas/segundo...)."""
+        try:
+            return self.dao.insert_many(table_name, rows, columns)
+        finally:
+            self._invalidate(table_name)
+            self._sync_brand_thresholds(table_name)
+
+    def import_csv(self, table_name, path, reject_path=None, progress=None):
+        """Carga masiva validada desde CSV con archivo de rechazos. Ver ImportService.import_csv."""
+        try:
+            return self.import_service.import_csv(table_name, path, reject_path, progress=progress)
+        finally:
+            self._invalidate(table_name)
+            self._sync_brand_thresholds(table_name)
 
     def update_data(self, table_name, data_dict, id_column, id_value):
-        return self.dao.update_data(table_name, data_dict, id_column, id_value)
+        try:
+            return self.dao.update_data(table_name, data_dict, id_column, id_value)
+        finally:
+            self._invalidate(table_name)
+            self._sync_brand_thresholds(table_name, data_dict)
+    
+    def update_many(self, table_name, rows, key_columns):
+        try:
+            return self.dao.update_many(table_name, rows, key_columns)
+        finally:
+            self._invalidate(table_name)
+            self._sync_brand_thresholds(table_name, rows[0] if rows else ())
+
+    def upsert_many(self, table_name, rows, key_columns):
+        try:
+            return self.dao.upsert_many(table_name, rows, key_columns)
+        finally:
+            self._invalidate(table_name)
+            self._sync_brand_thresholds(table_name)
     
     def delete_data(self, table_name, id_column, id_value):
-        # Si es un producto, usamos el borrado seguro del servicio de inventario
-        if table_name == "PRODUCTO":
-            return self.inventory_service.delete_product_secure(id_value)
-        return self.dao.delete_data(table_name, id_column, id_value)
+        try:
+            # Si es un producto, usamos el borrado seguro del servicio de inventario
+            if table_name == "PRODUCTO":
+                return self.inventory_service.delete_product_secure(id_value)
+            return self.dao.delete_data(table_name, id_column, id_value)
+        finally:
+            self._invalidate(table_name, "INVENTARIO")
+            self._sync_brand_thresholds(table_name)
 
     def get_next_id(self, table_name, id_column):
         return self.dao.get_next_id(table_name, id_column)
 
+    def read_your_writes(self):
+        """
+        Con separación lectura/escritura activa, las lecturas dentro del bloque van al primario:
+            with manager.read_your_writes():
+                data = manager.fetch_table_data("FACTURA")
+        """
+        return read_from_primary()
+
+    def unit_of_work(self):
+        """
+        Agrupa varias escrituras en una sola conexión y transacción.
+        Ver backend/unit_of_work.py; al confirmar invalida la caché de las tablas tocadas
+        y, si creó, borró o cambió de marca productos, aplica los umbrales por marca.
+        """
+        return UnitOfWork(self.dao, self.inventory_service, on_flush=self._invalidate,
+                          on_product_brands=self._sync_brand_thresholds)
+
     # ==========================================
     # DELEGACIÓN A INVENTORY SERVICE (Lógica Compleja)
     # ==========================================
 
     def create_product_with_inventory(self, product_data, initial_qty):
-        return self.inventory_service.create_product_with_inventory(product_data, initial_qty)
+        try:
+            return self.inventory_service.create_product_with_inventory(product_data, initial_qty)
+        finally:
+            self._invalidate("PRODUCTO", "INVENTARIO")
+            self._sync_brand_thresholds()
+
+    def create_products_with_inventory(self, products):
+        """Alta por lote: [(datos_producto, cantidad_inicial)] en una transacción. Retorna los IDs."""
+        try:
+            return self.inventory_service.create_products_with_inventory(products)
+        finally:
+            self._invalidate("PRODUCTO", "INVENTARIO")
+            self._sync_brand_thresholds()
+
+    def delete_products_secure(self, product_ids):
+        """Baja por lote de productos con su inventario, en una transacción."""
+        try:
+            return self.inventory_service.delete_products_secure(product_ids)
+        finally:
+            self._invalidate("PRODUCTO", "INVENTARIO")
+            self._sync_brand_thresholds()
 
     def update_inventory_quantity(self, product_id, new_quantity):
-        return self.inventory_service.update_inventory_quantity(product_id, new_quantity)
+        try:
+            return self.inventory_service.update_inventory_quantity(product_id, new_quantity)
+        finally:
+            self.cache.invalidate_table("INVENTARIO")
+
+    def update_inventory_quantities(self, quantities):
+        """{Id_producto: cantidad} para la sucursal actual, en un solo MERGE."""
+        try:
+            return self.inventory_service.update_inventory_quantities(quantities)
+        finally:
+            self.cache.invalidate_table("INVENTARIO")
 
     def get_product_stock(self, product_id):
         return self.inventory_service.get_product_stock(product_id)
+
+    def get_stock_bulk(self, product_ids, sucursal_id=None):
+        """{Id_producto: cantidad} en un solo viaje (con caché de stock por sucursal)."""
+        return self.inventory_service.get_stock_bulk(product_ids, sucursal_id)
     
-    def get_web_catalog(self):
-        """Método puente usado por app.py"""
-        return self.web_service.get_catalog()
+    def get_inventory_summary(self, product_ids=None, with_branches=True):
+        """Totales por producto, desglose por sucursal y cantidad con stock bajo (vista indexada)."""
+        key = freeze(("get_inventory_summary", product_ids, with_branches))
+        return self.cache.get_or_load(key, ["INVENTARIO", "PRODUCTO"], lambda: self.inventory_service.get_inventory_summary(
+            product_ids, with_branches=with_branches
+        ))
+
+    # ==========================================
+    # ALERTAS DE STOCK BAJO
+    # ==========================================
+
+    def scan_low_stock(self, sucursal_id=None):
+        """Revisión completa (consultas por índice); retorna las alertas vigentes de la sucursal."""
+        return get_stock_alert_engine().scan(sucursal_id)
+
+    def get_stock_alerts(self, sucursal_id=None):
+        """Alertas vigentes en memoria (sin ir a la BD)."""
+        return get_stock_alert_engine().get_active_alerts(sucursal_id)
+
+    def subscribe_stock_alerts(self, callback):
+        """callback(alertas_nuevas) en cada producto que cae a su umbral."""
+        get_stock_alert_engine().subscribe(callback)
+
+    def set_stock_threshold(self, product_id, threshold):
+        get_stock_alert_engine().set_product_threshold(product_id, threshold)
+
+    def set_brand_stock_threshold(self, brand, threshold):
+        get_stock_alert_engine().set_brand_threshold(brand, threshold)
+
+    def clear_stock_threshold(self, product_id):
+        get_stock_alert_engine().clear_product_threshold(product_id)
+
+    def get_web_catalog(self, search=None):
+        """Método puente usado por app.py (foto en memoria por sucursal, ver CatalogCache)"""
+        return self.web_service.get_catalog(search)
 
     def process_web_cart(self, client_id, cart_items):
-        return self.web_service.process_cart_purchase(client_id, cart_items)
+        try:
+            return self.web_service.process_cart_purchase(client_id, cart_items)
+        finally:
+            self.cache.invalidate_table("FACTURA", "DETALLE_FACTURA", "INVENTARIO")
     
     def register_web_client(self, client_data):
         """Registra un cliente desde la web y retorna su ID."""
-        return self.web_service.register_client(client_data)
+        try:
+            return self.web_service.register_client(client_data)
+        finally:
+            self.cache.invalidate_table("CLIENTE")
     
     def login_web_client(self, email):
-        return self.web_service.login_by_email(email)
\ No newline at end of file
+        return self.web_service.login_by_email(email)
+
+    # ==========================================
+    # DIAGNÓSTICO
+    # ==========================================
+
+    def get_pool_stats(self, role="primary"):
+        """Estadísticas del pool de conexiones ("primary" o "replica") para dimensionarlo."""
+        return get_pool_stats(role)
+
+    def get_routing_stats(self):
+        """Lecturas atendidas por la réplica y por el primario."""
+        return get_routing_stats()
+
+    def get_id_allocator_stats(self):
+        return get_id_allocator().get_stats()
+
+    def get_top_queries(self, n=10, by="total_ms"):
+        """Las n sentencias SQL más costosas (llamadas, latencias, histograma)."""
+        return get_query_stats().top(n, by)
+
+    def reset_query_stats(self):
+        get_query_stats().reset()
+
+    def get_cache_stats(self):
+        """Aciertos, fallos, expulsiones LRU, expiraciones e invalidaciones de la caché de lecturas."""
+        return self.cache.get_stats()
+
+    def get_stock_cache_stats(self):
+        return get_stock_cache().get_stats()
+
+    def get_catalog_cache_stats(self):
+        return get_catalog_cache().get_stats()
+
+    def get_client_cache_stats(self):
+        return get_client_cache().get_stats()
+
+    def invalidate_cache(self, table_name=None):
+        """Descarta lo cacheado de una tabla (o todo) para forzar una lectura fresca."""
+        if table_name is None:
+            self.cache.clear()
+        else:
+            self._invalidate(table_name)
+        if table_name in (None, "INVENTARIO", "PRODUCTO"):
+            get_stock_cache().clear()
+            get_catalog_cache().invalidate()
+        if table_name in (None, "CLIENTE"):
+            get_client_cache().clear()
\ No newline at end of file
@@ -1,5 +1,22 @@
+import time
+from itertools import islice
 from backend.connection import get_db_connection
-from backend.config import SUPPORTED_TABLES, CURRENT_NODE
+from backend.columnar import ColumnarResult
+from backend.schema_catalog import get_schema_catalog, TEXT_TYPES, INT_TYPES
+from backend.services.id_allocator import get_id_allocator
+from backend.config import (SUPPORTED_TABLES, CURRENT_NODE, PAGE_SIZE, STREAM_CHUNK_SIZE, BULK_CHUNK_SIZE,
+                            MAX_IN_PARAMS)
+
+FILTER_OPERATORS = {
+    "=", "<>", "<", "<=", ">", ">=", "LIKE", "NOT LIKE",
+    "IN", "IS NULL", "IS NOT NULL", "CONTAINS", "STARTSWITH"
+}
+
+def in_chunks(values, size=MAX_IN_PARAMS):
+    """Parte values en bloques que caben en un IN (?, ?, ...) de una sentencia."""
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
 
 class GenericDAO:
     def _check_table_security(self, table_name):
@@ -9,45 +26,354 @@ class GenericDAO:
              # Por simplicidad, validamos contra la lista estática primero.
             raise ValueError(f"Acceso denegado o tabla no soportada: {table_name}")
 
-    def fetch_table_data(self, table_name):
+    def _select_list(self, table_name, columns=None):
+        """Lista explícita de columnas (en lugar de SELECT *) validada contra el catálogo."""
+        catalog = get_schema_catalog()
+        if columns:
+            return ", ".join(catalog.resolve_columns(table_name, columns))
+        return ", ".join(catalog.columns(table_name))
+
+    def _like_escape(self, text):
+        """Escapa los comodines de LIKE de SQL Server para buscar el texto literal."""
+        return text.replace("[", "[[]").replace("%", "[%]").replace("_", "[_]")
+
+    def _build_where(self, table_name, filters=None, search=None, search_columns=None):
+        """
+        filters: lista de (columna, operador, valor), combinados con AND.
+            Operadores: =, <>, <, <=, >, >=, LIKE, NOT LIKE, IN, IS NULL, IS NOT NULL,
+            CONTAINS y STARTSWITH (estos dos escapan el texto y arman el LIKE).
+        search: texto libre buscado con LIKE en search_columns (por defecto, las de texto).
+        Retorna (condición SQL, parámetros). Nada del usuario se concatena al SQL.
+        """
+        catalog = get_schema_catalog()
+        clauses, params = [], []
+
+        for column, op, value in (filters or []):
+            col = catalog.resolve_columns(table_name, [column])[0]
+            op = op.upper().strip()
+            if op not in FILTER_OPERATORS:
+                raise ValueError(f"Operador de filtro no soportado: {op}")
+
+            if op in ("IS NULL", "IS NOT NULL"):
+                clauses.append(f"{col} {op}")
+            elif op == "IN":
+                values = [catalog.coerce(table_name, col, v) for v in value]
+                if not values:
+                    clauses.append("1 = 0")
+                else:
+                    clauses.append(f"{col} IN ({', '.join(['?'] * len(values))})")
+                    params.extend(values)
+            elif op == "CONTAINS":
+                clauses.append(f"{col} LIKE ?")
+                params.append(f"%{self._like_escape(str(value))}%")
+            elif op == "STARTSWITH":
+                # Prefijo: SQL Server puede usar el índice de la columna
+                clauses.append(f"{col} LIKE ?")
+                params.append(f"{self._like_escape(str(value))}%")
+            elif op in ("LIKE", "NOT LIKE"):
+                clauses.append(f"{col} {op} ?")
+                params.append(value)
+            else:
+                clauses.append(f"{col} {op} ?")
+                params.append(catalog.coerce(table_name, col, value))
+
+        search = (search or "").strip()
+        if search:
+            pattern = f"%{self._like_escape(search)}%"
+            parts = []
+            if search_columns:
+                for col in catalog.resolve_columns(table_name, search_columns):
+                    if catalog.column_info(table_name, col)["type"] in TEXT_TYPES:
+                        parts.append(f"{col} LIKE ?")
+                    else:
+                        parts.append(f"CAST({col} AS NVARCHAR(100)) LIKE ?")
+                    params.append(pattern)
+            else:
+                for col in catalog.columns(table_name):
+                    col_type = catalog.column_info(table_name, col)["type"]
+                    if col_type in TEXT_TYPES:
+                        parts.append(f"{col} LIKE ?")
+                        params.append(pattern)
+                    elif col_type in INT_TYPES and search.isdigit():
+                        # Un número buscado en "Todo" compara por igualdad (usa índices)
+                        parts.append(f"{col} = ?")
+                        params.append(int(search))
+            clauses.append("(" + " OR ".join(parts) + ")" if parts else "1 = 0")
+
+        return " AND ".join(clauses), params
+
+    def _build_order_by(self, table_name, order_by):
+        """order_by: lista de 'columna', 'columna DESC' o (columna, 'ASC'|'DESC')."""
+        if not order_by:
+            return ""
+        if isinstance(order_by, str):
+            order_by = [order_by]
+
+        catalog = get_schema_catalog()
+        parts = []
+        for item in order_by:
+            if isinstance(item, str):
+                pieces = item.split()
+                column, direction = pieces[0], (pieces[1] if len(pieces) > 1 else "ASC")
+            else:
+                column, direction = item
+            direction = direction.upper()
+            if direction not in ("ASC", "DESC"):
+                raise ValueError(f"Dirección de orden inválida: {direction}")
+            parts.append(f"{catalog.resolve_columns(table_name, [column])[0]} {direction}")
+        return " ORDER BY " + ", ".join(parts)
+
+    def _build_select(self, table_name, columns=None, filters=None, search=None,
+                      search_columns=None, order_by=None):
+        where, params = self._build_where(table_name, filters, search, search_columns)
+        query = f"SELECT {self._select_list(table_name, columns)} FROM {table_name}"
+        if where:
+            query += f" WHERE {where}"
+        query += self._build_order_by(table_name, order_by)
+        return query, params
+
+    def fetch_table_data(self, table_name, columns=None, filters=None, search=None,
+                         search_columns=None, order_by=None):
+        """
+        Lee la tabla completa o, si se indican, solo las columnas / filas pedidas.
+        El filtrado y el orden los resuelve SQL Server (ver _build_where).
+        """
         self._check_table_security(table_name)
-        conn = get_db_connection()
+        query, params = self._build_select(table_name, columns, filters, search, search_columns, order_by)
+        conn = get_db_connection(read_only=True)
         try:
             cursor = conn.cursor()
-            query = f"SELECT * FROM {table_name}"
-            cursor.execute(query)
+            cursor.execute(query, params)
             columns = [column[0] for column in cursor.description]
             rows = cursor.fetchall()
             return columns, rows
         finally:
             conn.close()
 
-    def insert_data(self, table_name, data_dict):
+    def fetch_table_columnar(self, table_name, columns=None, filters=None, search=None,
+                             search_columns=None, order_by=None, chunk_size=STREAM_CHUNK_SIZE):
+        """
+        Igual que fetch_table_data pero guarda el resultado por columnas (ver backend/columnar.py):
+        arrays tipados para números y diccionario para texto, en lugar de un Row por fila.
+        Pensado para lecturas grandes (ej. DETALLE_FACTURA completa) y análisis.
+        """
+        self._check_table_security(table_name)
+        query, params = self._build_select(table_name, columns, filters, search, search_columns, order_by)
+        conn = get_db_connection(read_only=True)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return ColumnarResult.from_cursor(cursor, chunk_size)
+        finally:
+            conn.close()
+
+    def stream_table_data(self, table_name, chunk_size=STREAM_CHUNK_SIZE, columns=None,
+                          filters=None, search=None, search_columns=None, order_by=None):
+        """
+        Igual que fetch_table_data pero retorna (columns, generador de filas).
+        Las filas se leen con fetchmany() de a chunk_size: en memoria solo hay un bloque.
+        La conexión queda prestada hasta agotar (o descartar) el generador.
+        """
+        self._check_table_security(table_name)
+        query, params = self._build_select(table_name, columns, filters, search, search_columns, order_by)
+        rows = self._stream_rows(query, params, chunk_size)
+        # El primer valor son las columnas; así la consulta ya corrió y el
+        # generador está iniciado (su finally devuelve la conexión aunque no se recorra)
+        columns = next(rows)
+        return columns, rows
+
+    def _stream_rows(self, query, params, chunk_size):
+        conn = get_db_connection(read_only=True)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            yield [column[0] for column in cursor.description]
+            while True:
+                chunk = cursor.fetchmany(chunk_size)
+                if not chunk:
+                    break
+                yield from chunk
+        finally:
+            conn.close()
+
+    def _get_primary_key(self, table_name):
+        """Retorna las columnas de la PK de la tabla, en orden (desde el catálogo)."""
+        key_cols = get_schema_catalog().primary_key(table_name)
+        if not key_cols:
+            raise ValueError(f"La tabla {table_name} no tiene clave primaria.")
+        return key_cols
+
+    def _keyset_condition(self, key_cols, after_key):
+        """
+        Traduce (a, b) > (x, y) a SQL: a > x OR (a = x AND b > y).
+        Así el filtro sigue el orden de la PK y usa su índice.
+        """
+        clauses, params = [], []
+        for i, col in enumerate(key_cols):
+            parts = [f"{c} = ?" for c in key_cols[:i]] + [f"{col} > ?"]
+            clauses.append("(" + " AND ".join(parts) + ")")
+            params.extend(after_key[:i + 1])
+        return "(" + " OR ".join(clauses) + ")", params
+
+    def fetch_page(self, table_name, page_size=PAGE_SIZE, after_key=None, with_total=False,
+                   columns=None, filters=None, search=None, search_columns=None):
+        """
+        Lectura paginada por clave (keyset): ordena por la PK y continúa después de after_key.
+        Acepta la misma proyección y filtros que fetch_table_data.
+        Retorna {"columns", "rows", "next_key", "total"}.
+        next_key es None en la última página; total solo se calcula si with_total=True.
+        """
+        self._check_table_security(table_name)
+        key_cols = self._get_primary_key(table_name)
+
+        if columns:
+            # La PK siempre viaja: de ella sale el cursor de la siguiente página
+            columns = get_schema_catalog().resolve_columns(table_name, columns)
+            columns = columns + [k for k in key_cols if k not in columns]
+
+        filter_sql, filter_params = self._build_where(table_name, filters, search, search_columns)
+        conditions = [filter_sql] if filter_sql else []
+        params = list(filter_params)
+
+        if after_key is not None:
+            if not isinstance(after_key, (tuple, list)):
+                after_key = (after_key,)
+            if len(after_key) != len(key_cols):
+                raise ValueError(f"after_key debe tener {len(key_cols)} valores: {key_cols}")
+            condition, key_params = self._keyset_condition(key_cols, list(after_key))
+            conditions.append(condition)
+            params.extend(key_params)
+
+        where = (" WHERE " + " AND ".join(conditions)) if conditions else ""
+        order_by = ", ".join(key_cols)
+        # Pedimos una fila extra para saber si hay otra página sin hacer COUNT
+        query = f"SELECT TOP (?) {self._select_list(table_name, columns)} FROM {table_name}{where} ORDER BY {order_by}"
+
+        conn = get_db_connection(read_only=True)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, [page_size + 1] + params)
+            columns = [column[0] for column in cursor.description]
+            rows = cursor.fetchall()
+
+            next_key = None
+            if len(rows) > page_size:
+                rows = rows[:page_size]
+                lower_cols = [c.lower() for c in columns]
+                key_idx = [lower_cols.index(c.lower()) for c in key_cols]
+                next_key = tuple(rows[-1][i] for i in key_idx)
+
+            total = None
+            if with_total:
+                count_query = f"SELECT COUNT_BIG(*) FROM {table_name}"
+                if filter_sql:
+                    count_query += f" WHERE {filter_sql}"
+                cursor.execute(count_query, filter_params)
+                total = cursor.fetchone()[0]
+
+            return {"columns": columns, "rows": rows, "next_key": next_key, "total": total}
+        finally:
+            conn.close()
+
+    # ==========================================
+    # LECTURA INCREMENTAL (Change Tracking)
+    # Siempre contra el primario: los tokens son propios de cada base de datos.
+    # ==========================================
+
+    def get_change_token(self, table_name):
+        """Versión actual de Change Tracking; None si la tabla no lo tiene habilitado."""
         self._check_table_security(table_name)
         conn = get_db_connection()
         try:
             cursor = conn.cursor()
-            columns = ", ".join(data_dict.keys())
-            placeholders = ", ".join(["?"] * len(data_dict))
-            values = list(data_dict.values())
-            
-            query = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
-            cursor.execute(query, values)
-            conn.commit()
-            return True
-        except Exception as e:
-            print(f"Error insertando en {table_name}: {e}")
-            raise e
+            cursor.execute("""
+                SELECT CASE WHEN CHANGE_TRACKING_MIN_VALID_VERSION(OBJECT_ID(?)) IS NULL
+                            THEN NULL ELSE CHANGE_TRACKING_CURRENT_VERSION() END
+            """, (table_name,))
+            return cursor.fetchone()[0]
         finally:
             conn.close()
 
-    def update_data(self, table_name, data_dict, id_column, id_value):
+    def fetch_changes(self, table_name, since_token=None):
+        """
+        Filas cambiadas desde since_token (token devuelto por una llamada anterior).
+        Retorna {"full", "columns", "key_columns", "inserted", "updated", "deleted", "token"}:
+            inserted / updated -> filas completas
+            deleted            -> tuplas con la PK de las filas borradas
+        Si no hay token o es más viejo que la retención, full=True sin filas: el llamador
+        debe recargar (ej. la primera página) y seguir desde el token devuelto.
+        """
+        self._check_table_security(table_name)
+        key_cols = self._get_primary_key(table_name)
+        columns = get_schema_catalog().columns(table_name)
+
         conn = get_db_connection()
-        cursor = conn.cursor()
-        
+        try:
+            cursor = conn.cursor()
+            # El token nuevo se toma ANTES de leer: un cambio concurrente puede
+            # llegar dos veces (se aplica igual) pero nunca se pierde
+            cursor.execute(
+                "SELECT CHANGE_TRACKING_CURRENT_VERSION(), CHANGE_TRACKING_MIN_VALID_VERSION(OBJECT_ID(?))",
+                (table_name,)
+            )
+            current, min_valid = cursor.fetchone()
+            if min_valid is None:
+                raise ValueError(f"Change Tracking no está habilitado en {table_name}.")
+
+            result = {"full": False, "columns": columns, "key_columns": key_cols,
+                      "inserted": [], "updated": [], "deleted": [], "token": current}
+
+            if since_token is None or since_token < min_valid:
+                result["full"] = True
+                return result
+
+            ct_keys = ", ".join(f"CT.{k}" for k in key_cols)
+            join = " AND ".join(f"T.{k} = CT.{k}" for k in key_cols)
+            select_cols = ", ".join(f"T.{c}" for c in columns)
+            query = f"""
+                SELECT CASE WHEN T.{key_cols[0]} IS NULL THEN 'D' ELSE CT.SYS_CHANGE_OPERATION END,
+                       {ct_keys}, {select_cols}
+                FROM CHANGETABLE(CHANGES {table_name}, ?) AS CT
+                LEFT JOIN {table_name} T ON {join}
+            """
+            cursor.execute(query, (since_token,))
+
+            n_keys = len(key_cols)
+            for row in cursor.fetchall():
+                # Si la fila ya no existe (aunque el cambio fuera I/U) solo queda su clave
+                if row[0] == "D":
+                    result["deleted"].append(tuple(row[1:1 + n_keys]))
+                elif row[0] == "I":
+                    result["inserted"].append(tuple(row[1 + n_keys:]))
+                else:
+                    result["updated"].append(tuple(row[1 + n_keys:]))
+            return result
+        finally:
+            conn.close()
+
+    # ==========================================
+    # CONSTRUCCIÓN DE SENTENCIAS (usadas también por UnitOfWork)
+    # ==========================================
+
+    def build_insert(self, table_name, data_dict):
+        """Retorna (sql, params) de un INSERT validado contra el esquema."""
+        self._check_table_security(table_name)
+        data_dict = get_schema_catalog().bind_row(table_name, data_dict)
+        columns = ", ".join(data_dict.keys())
+        placeholders = ", ".join(["?"] * len(data_dict))
+        query = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
+        return query, list(data_dict.values())
+
+    def build_update(self, table_name, data_dict, id_column, id_value):
+        """Retorna (sql, params) de un UPDATE por ID validado contra el esquema."""
+        self._check_table_security(table_name)
+        catalog = get_schema_catalog()
+        id_column = catalog.resolve_columns(table_name, [id_column])[0]
+        id_value = catalog.coerce(table_name, id_column, id_value)
+
         # --- CORRECCIÓN: Quitamos el ID del diccionario de datos a actualizar ---
-        # Hacemos una copia para no afectar el diccionario original
-        data_to_update = data_dict.copy()
+        # bind_row ya retorna una copia con los nombres reales y tipos de la tabla
+        data_to_update = catalog.bind_row(table_name, data_dict)
         
         # Si el ID viene en los datos (ej: 'Id_sucursal': 1), lo quitamos.
         # El ID se usa en el WHERE, nunca en el SET.
@@ -60,6 +386,91 @@ class GenericDAO:
         values.append(id_value) # El ID va al final para el WHERE
         
         query = f"UPDATE {table_name} SET {set_clause} WHERE {id_column} = ?"
+        return query, values
+
+    def build_delete(self, table_name, id_column, id_value):
+        """Retorna (sql, params) de un DELETE por ID validado contra el esquema."""
+        self._check_table_security(table_name)
+        catalog = get_schema_catalog()
+        id_column = catalog.resolve_columns(table_name, [id_column])[0]
+        id_value = catalog.coerce(table_name, id_column, id_value)
+        return f"DELETE FROM {table_name} WHERE {id_column} = ?", [id_value]
+
+    def insert_data(self, table_name, data_dict):
+        query, values = self.build_insert(table_name, data_dict)
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, values)
+            conn.commit()
+            return True
+        except Exception as e:
+            print(f"Error insertando en {table_name}: {e}")
+            raise e
+        finally:
+            conn.close()
+
+    def insert_many(self, table_name, rows, columns=None, chunk_size=BULK_CHUNK_SIZE):
+        """
+        Carga masiva: un INSERT parametrizado enviado con fast_executemany por bloques.
+        rows: iterable de diccionarios (mismas claves) o de tuplas si se indica columns.
+        Se hace commit por bloque; si un bloque falla, los anteriores ya quedaron guardados.
+        Retorna {"rows", "chunks", "seconds", "rows_per_second"}.
+        """
+        self._check_table_security(table_name)
+        rows = iter(rows)
+        start = time.perf_counter()
+        total = chunks = 0
+
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.fast_executemany = True
+            query = None
+
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+
+                if columns is None:
+                    columns = list(chunk[0].keys())
+                if query is None:
+                    keys = columns
+                    columns = get_schema_catalog().resolve_columns(table_name, keys)
+                    placeholders = ", ".join(["?"] * len(columns))
+                    query = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})"
+                if isinstance(chunk[0], dict):
+                    chunk = [[row[k] for k in keys] for row in chunk]
+
+                try:
+                    cursor.executemany(query, chunk)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                total += len(chunk)
+                chunks += 1
+
+            seconds = time.perf_counter() - start
+            return {
+                "rows": total,
+                "chunks": chunks,
+                "seconds": seconds,
+                "rows_per_second": total / seconds if seconds > 0 else float(total)
+            }
+        except Exception as e:
+            print(f"Error en carga masiva de {table_name} (filas guardadas: {total}): {e}")
+            raise e
+        finally:
+            conn.close()
+            if total:
+                self._resync_ids(table_name)
+
+    def update_data(self, table_name, data_dict, id_column, id_value):
+        query, values = self.build_update(table_name, data_dict, id_column, id_value)
+        conn = get_db_connection()
+        cursor = conn.cursor()
         
         try:
             cursor.execute(query, values)
@@ -71,12 +482,121 @@ class GenericDAO:
         finally:
             conn.close()
 
+    # ==========================================
+    # ACTUALIZACIONES POR LOTE (basadas en conjuntos)
+    # ==========================================
+
+    def _normalize_batch(self, table_name, rows, key_columns):
+        """Valida que todas las filas tengan las mismas columnas e incluyan la clave."""
+        if isinstance(key_columns, str):
+            key_columns = [key_columns]
+        rows = list(rows)
+        if not rows:
+            return key_columns, [], []
+
+        catalog = get_schema_catalog()
+        keys = list(rows[0].keys())
+        columns = catalog.resolve_columns(table_name, keys)
+        key_columns = catalog.resolve_columns(table_name, key_columns)
+        missing = [k for k in key_columns if k not in columns]
+        if missing:
+            raise ValueError(f"Las filas no incluyen las columnas clave: {missing}")
+        for row in rows:
+            if set(row.keys()) != set(keys):
+                raise ValueError("Todas las filas del lote deben tener las mismas columnas.")
+        values = [
+            [catalog.coerce(table_name, col, row[key]) for col, key in zip(columns, keys)]
+            for row in rows
+        ]
+        return key_columns, columns, values
+
+    def _stage_rows(self, cursor, table_name, columns, values):
+        """
+        Copia el lote a una tabla temporal con los mismos tipos que la tabla destino.
+        La temporal vive en la sesión; como las conexiones vuelven al pool, quien
+        la crea debe borrarla (o hacer rollback) antes de soltar la conexión.
+        """
+        staging = f"#stg_{table_name}"
+        cols = ", ".join(columns)
+        cursor.execute(f"IF OBJECT_ID('tempdb..{staging}') IS NOT NULL DROP TABLE {staging}")
+        cursor.execute(f"SELECT TOP 0 {cols} INTO {staging} FROM {table_name}")
+        cursor.fast_executemany = True
+        for i in range(0, len(values), BULK_CHUNK_SIZE):
+            cursor.executemany(
+                f"INSERT INTO {staging} ({cols}) VALUES ({', '.join(['?'] * len(columns))})",
+                values[i:i + BULK_CHUNK_SIZE]
+            )
+        return staging
+
+    def _run_staged(self, table_name, rows, key_columns, build_statement):
+        """Carga el lote en la temporal y aplica build_statement(...) en una sola transacción."""
+        key_columns, columns, values = self._normalize_batch(table_name, rows, key_columns)
+        if not values:
+            return 0
+
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            staging = self._stage_rows(cursor, table_name, columns, values)
+            cursor.execute(build_statement(staging, key_columns, columns))
+            affected = cursor.rowcount
+            cursor.execute(f"DROP TABLE {staging}")
+            conn.commit()
+            return affected
+        except Exception as e:
+            conn.rollback()
+            print(f"Error en lote sobre {table_name}: {e}")
+            raise e
+        finally:
+            conn.close()
+
+    def update_many(self, table_name, rows, key_columns):
+        """
+        UPDATE por lote: rows es una lista de diccionarios con la clave y las columnas a cambiar.
+        Todo el lote se aplica con un único UPDATE ... FROM contra una tabla temporal.
+        Retorna la cantidad de filas actualizadas.
+        """
+        self._check_table_security(table_name)
+
+        def build(staging, keys, columns):
+            set_cols = [c for c in columns if c not in keys]
+            if not set_cols:
+                raise ValueError("No hay columnas para actualizar además de la clave.")
+            set_clause = ", ".join([f"T.{c} = S.{c}" for c in set_cols])
+            on_clause = " AND ".join([f"T.{k} = S.{k}" for k in keys])
+            return f"UPDATE T SET {set_clause} FROM {table_name} T JOIN {staging} S ON {on_clause}"
+
+        return self._run_staged(table_name, rows, key_columns, build)
+
+    def upsert_many(self, table_name, rows, key_columns):
+        """
+        Inserta o actualiza un lote con un único MERGE desde una tabla temporal.
+        Retorna la cantidad de filas afectadas (insertadas + actualizadas).
+        """
+        self._check_table_security(table_name)
+
+        def build(staging, keys, columns):
+            set_cols = [c for c in columns if c not in keys]
+            on_clause = " AND ".join([f"T.{k} = S.{k}" for k in keys])
+            cols = ", ".join(columns)
+            source_cols = ", ".join([f"S.{c}" for c in columns])
+            query = f"MERGE {table_name} WITH (HOLDLOCK) AS T USING {staging} AS S ON {on_clause}"
+            if set_cols:
+                query += " WHEN MATCHED THEN UPDATE SET " + ", ".join([f"T.{c} = S.{c}" for c in set_cols])
+            query += f" WHEN NOT MATCHED THEN INSERT ({cols}) VALUES ({source_cols});"
+            return query
+
+        affected = self._run_staged(table_name, rows, key_columns, build)
+        if affected:
+            self._resync_ids(table_name)  # Las filas nuevas traen su clave
+        return affected
+
     def delete_data(self, table_name, id_column, id_value):
+        query, values = self.build_delete(table_name, id_column, id_value)
         conn = get_db_connection()
         try:
             cursor = conn.cursor()
-            query = f"DELETE FROM {table_name} WHERE {id_column} = ?"
-            cursor.execute(query, (id_value,))
+            cursor.execute(query, values)
             conn.commit()
             return True
         except Exception as e:
@@ -85,7 +605,22 @@ class GenericDAO:
         finally:
             conn.close()
             
+    def _resync_ids(self, table_name):
+        """Tras una carga con claves explícitas: alinea los contadores de IDs de la tabla."""
+        try:
+            get_id_allocator().resync_table(table_name)
+        except Exception as e:
+            print(f"ALERTA: No se pudo alinear el contador de IDs de {table_name}: {e}")
+
     def get_next_id(self, table_name, id_column):
+        self._check_table_security(table_name)
+        id_column = get_schema_catalog().resolve_columns(table_name, [id_column])[0]
+        try:
+            # Bloques reservados en ID_CONTADOR: sin recorrer el índice ni colisionar
+            return get_id_allocator().next_id(table_name, id_column)
+        except Exception as e:
+            print(f"ALERTA: Asignador de IDs no disponible ({e}). Usando MAX()+1.")
+
         conn = get_db_connection()
         try:
             cursor = conn.cursor()
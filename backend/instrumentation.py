@@ -0,0 +1,175 @@
+# backend/instrumentation.py
+
+import logging
+import os
+import re
+import threading
+import time
+from backend.config import QUERY_STATS
+
+# Límites superiores (ms) de los buckets del histograma de latencia
+LATENCY_BUCKETS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float("inf")]
+
+_WHITESPACE = re.compile(r"\s+")
+_STRING_LITERAL = re.compile(r"N?'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.#@])-?\d+(?:\.\d+)?(?![\w.])")
+_PARAM_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_VALUES_LIST = re.compile(r"(VALUES\s*\(\?\.\.\.\))(?:\s*,\s*\(\?\.\.\.\))+", re.IGNORECASE)
+
+def normalize_sql(sql):
+    """
+    Texto canónico de una sentencia para agrupar métricas:
+    espacios colapsados, literales reemplazados por ? y listas (?, ?, ?) por (?...).
+    """
+    text = _WHITESPACE.sub(" ", sql).strip()
+    text = _STRING_LITERAL.sub("?", text)
+    text = _NUMBER_LITERAL.sub("?", text)
+    text = _PARAM_LIST.sub("(?...)", text)
+    text = _VALUES_LIST.sub(r"\1", text)
+    return text
+
+def redact_params(params):
+    """Describe los parámetros sin revelar su valor (solo tipo)."""
+    if params is None:
+        return "[]"
+    return "[" + ", ".join(f"<{type(p).__name__}>" for p in params) + "]"
+
+
+class _StatementStats:
+    __slots__ = ("calls", "errors", "rows_batched", "total_ms", "max_ms", "buckets")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rows_batched = 0   # Juegos de parámetros enviados por executemany
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS_MS)
+
+
+class QueryStats:
+    """
+    Métricas por sentencia normalizada: llamadas, errores, latencia total/máxima
+    e histograma. Las que superan slow_query_ms se registran en el log de lentas.
+    """
+    def __init__(self, slow_query_ms=200, slow_query_log=None):
+        self.slow_query_ms = slow_query_ms
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._logger = logging.getLogger("techstore.slow_queries")
+        if slow_query_log and not self._logger.handlers:
+            try:
+                os.makedirs(os.path.dirname(slow_query_log), exist_ok=True)
+                handler = logging.FileHandler(slow_query_log, encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+                self._logger.addHandler(handler)
+                self._logger.setLevel(logging.WARNING)
+                self._logger.propagate = False
+            except OSError as e:
+                print(f"ALERTA: No se pudo abrir el log de consultas lentas: {e}")
+
+    def record(self, sql, elapsed_ms, params=None, batch_size=0, failed=False):
+        key = normalize_sql(sql)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = _StatementStats()
+            stats.calls += 1
+            stats.errors += 1 if failed else 0
+            stats.rows_batched += batch_size
+            stats.total_ms += elapsed_ms
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+            for i, bound in enumerate(LATENCY_BUCKETS_MS):
+                if elapsed_ms <= bound:
+                    stats.buckets[i] += 1
+                    break
+
+        if elapsed_ms >= self.slow_query_ms:
+            detail = f"lote de {batch_size}" if batch_size else redact_params(params)
+            self._logger.warning(f"CONSULTA LENTA {elapsed_ms:.1f} ms | params {detail} | {key}")
+
+    def top(self, n=10, by="total_ms"):
+        """Las n sentencias con mayor `by` (total_ms, max_ms, avg_ms, calls o errors)."""
+        with self._lock:
+            rows = []
+            for sql, s in self._stats.items():
+                rows.append({
+                    "sql": sql,
+                    "calls": s.calls,
+                    "errors": s.errors,
+                    "rows_batched": s.rows_batched,
+                    "total_ms": round(s.total_ms, 3),
+                    "avg_ms": round(s.total_ms / s.calls, 3) if s.calls else 0.0,
+                    "max_ms": round(s.max_ms, 3),
+                    "histogram": {
+                        ("inf" if bound == float("inf") else f"<={bound}ms"): count
+                        for bound, count in zip(LATENCY_BUCKETS_MS, s.buckets)
+                    }
+                })
+        rows.sort(key=lambda r: r[by], reverse=True)
+        return rows[:n]
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+class InstrumentedCursor:
+    """Cursor pyodbc que mide cada execute/executemany y lo reporta a QueryStats."""
+    def __init__(self, cursor, stats):
+        self._cursor = cursor
+        self._stats = stats
+
+    def execute(self, sql, *params):
+        # pyodbc acepta execute(sql, p1, p2) o execute(sql, [p1, p2])
+        bound = params[0] if len(params) == 1 and isinstance(params[0], (list, tuple)) else params
+        start = time.perf_counter()
+        failed = False
+        try:
+            self._cursor.execute(sql, *params)
+            return self
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self._stats.record(sql, (time.perf_counter() - start) * 1000, bound, failed=failed)
+
+    def executemany(self, sql, seq_of_params):
+        seq_of_params = seq_of_params if isinstance(seq_of_params, list) else list(seq_of_params)
+        start = time.perf_counter()
+        failed = False
+        try:
+            self._cursor.executemany(sql, seq_of_params)
+            return self
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self._stats.record(sql, (time.perf_counter() - start) * 1000,
+                               batch_size=len(seq_of_params), failed=failed)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        # Atributos propios con "_"; el resto (ej. fast_executemany) va al cursor real
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._cursor, name, value)
+
+
+_query_stats = None
+_stats_lock = threading.Lock()
+
+def get_query_stats():
+    """Registro de métricas compartido por el proceso (se crea en el primer uso)."""
+    global _query_stats
+    if _query_stats is None:
+        with _stats_lock:
+            if _query_stats is None:
+                _query_stats = QueryStats(QUERY_STATS["slow_query_ms"], QUERY_STATS["slow_query_log"])
+    return _query_stats
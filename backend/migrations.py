@@ -0,0 +1,158 @@
+# backend/migrations.py
+
+from backend.connection import get_db_connection
+from backend.config import SUPPORTED_TABLES
+
+# Objetos auxiliares que la aplicación necesita en la BD.
+# Cada script es idempotente (verifica antes de crear) y se ejecuta en su propio batch.
+MIGRATIONS = [
+    ("001_id_contador", """
+        IF OBJECT_ID('dbo.ID_CONTADOR', 'U') IS NULL
+        CREATE TABLE dbo.ID_CONTADOR (
+            clave VARCHAR(128) NOT NULL PRIMARY KEY,
+            ultimo_id BIGINT NOT NULL
+        )
+    """),
+    # Change Tracking: permite pedir "qué cambió desde el token X" (ver GenericDAO.fetch_changes)
+    ("002_change_tracking", """
+        IF NOT EXISTS (SELECT 1 FROM sys.change_tracking_databases WHERE database_id = DB_ID())
+        ALTER DATABASE CURRENT SET CHANGE_TRACKING = ON (CHANGE_RETENTION = 2 DAYS, AUTO_CLEANUP = ON)
+    """),
+] + [
+    (f"002_change_tracking_{table}", f"""
+        IF OBJECT_ID('dbo.{table}', 'U') IS NOT NULL
+           AND NOT EXISTS (SELECT 1 FROM sys.change_tracking_tables WHERE object_id = OBJECT_ID('dbo.{table}'))
+        ALTER TABLE dbo.{table} ENABLE CHANGE_TRACKING
+    """)
+    for table in SUPPORTED_TABLES
+] + [
+    # Resumen de stock por producto (todas las sucursales) como vista indexada:
+    # SQL Server la mantiene sola en cada INSERT/UPDATE/DELETE de INVENTARIO.
+    # CREATE VIEW debe ir solo en su batch, por eso el EXEC.
+    ("003_v_stock_producto", """
+        IF OBJECT_ID('dbo.V_STOCK_PRODUCTO', 'V') IS NULL
+        EXEC('CREATE VIEW dbo.V_STOCK_PRODUCTO WITH SCHEMABINDING AS
+              SELECT Id_producto,
+                     SUM(ISNULL(cantidad, 0)) AS stock_total,
+                     SUM(CASE WHEN ISNULL(cantidad, 0) <= 0 THEN 1 ELSE 0 END) AS sucursales_sin_stock,
+                     COUNT_BIG(*) AS sucursales
+              FROM dbo.INVENTARIO
+              GROUP BY Id_producto')
+    """),
+    ("003_ix_v_stock_producto", """
+        IF NOT EXISTS (SELECT 1 FROM sys.indexes
+                       WHERE object_id = OBJECT_ID('dbo.V_STOCK_PRODUCTO') AND name = 'IX_V_STOCK_PRODUCTO')
+        CREATE UNIQUE CLUSTERED INDEX IX_V_STOCK_PRODUCTO ON dbo.V_STOCK_PRODUCTO (Id_producto)
+    """),
+    # Umbral de reposición por producto. origen = 'producto' (fijado a mano) o 'marca'
+    # (heredado de un umbral por marca; uno por producto siempre tiene prioridad)
+    ("004_umbral_stock", """
+        IF OBJECT_ID('dbo.UMBRAL_STOCK', 'U') IS NULL
+        CREATE TABLE dbo.UMBRAL_STOCK (
+            Id_producto INT NOT NULL PRIMARY KEY,
+            umbral INT NOT NULL,
+            origen VARCHAR(10) NOT NULL DEFAULT 'producto'
+        )
+    """),
+    # Productos sin umbral propio: rango sobre cantidad (umbral por defecto) dentro de
+    # una sucursal; la igualdad va primero para no recorrer las filas de otras sucursales.
+    # Reemplaza a IX_INVENTARIO_CANTIDAD (cantidad), si quedó de una versión anterior
+    ("004_ix_inventario_cantidad", """
+        IF EXISTS (SELECT 1 FROM sys.indexes
+                   WHERE object_id = OBJECT_ID('dbo.INVENTARIO') AND name = 'IX_INVENTARIO_CANTIDAD')
+        DROP INDEX IX_INVENTARIO_CANTIDAD ON dbo.INVENTARIO;
+        IF NOT EXISTS (SELECT 1 FROM sys.indexes
+                       WHERE object_id = OBJECT_ID('dbo.INVENTARIO') AND name = 'IX_INVENTARIO_SUCURSAL_CANTIDAD')
+        CREATE INDEX IX_INVENTARIO_SUCURSAL_CANTIDAD ON dbo.INVENTARIO (Id_sucursal, cantidad);
+    """),
+    # Productos con umbral: margen = cantidad - umbral indexado, el detector busca
+    # margen <= 0 en una sucursal (Id_sucursal primero, igual que en INVENTARIO)
+    ("004_v_stock_margen", """
+        IF OBJECT_ID('dbo.V_STOCK_MARGEN', 'V') IS NULL
+        EXEC('CREATE VIEW dbo.V_STOCK_MARGEN WITH SCHEMABINDING AS
+              SELECT I.Id_sucursal, I.Id_producto, ISNULL(I.cantidad, 0) AS cantidad, U.umbral,
+                     ISNULL(I.cantidad, 0) - U.umbral AS margen
+              FROM dbo.INVENTARIO I
+              JOIN dbo.UMBRAL_STOCK U ON U.Id_producto = I.Id_producto')
+    """),
+    ("004_ix_v_stock_margen", """
+        IF NOT EXISTS (SELECT 1 FROM sys.indexes
+                       WHERE object_id = OBJECT_ID('dbo.V_STOCK_MARGEN') AND name = 'IX_V_STOCK_MARGEN')
+            CREATE UNIQUE CLUSTERED INDEX IX_V_STOCK_MARGEN ON dbo.V_STOCK_MARGEN (Id_sucursal, Id_producto);
+        IF EXISTS (SELECT 1 FROM sys.indexes
+                   WHERE object_id = OBJECT_ID('dbo.V_STOCK_MARGEN') AND name = 'IX_V_STOCK_MARGEN_MARGEN')
+            DROP INDEX IX_V_STOCK_MARGEN_MARGEN ON dbo.V_STOCK_MARGEN;
+        IF NOT EXISTS (SELECT 1 FROM sys.indexes
+                       WHERE object_id = OBJECT_ID('dbo.V_STOCK_MARGEN') AND name = 'IX_V_STOCK_MARGEN_SUCURSAL_MARGEN')
+            CREATE INDEX IX_V_STOCK_MARGEN_SUCURSAL_MARGEN ON dbo.V_STOCK_MARGEN (Id_sucursal, margen);
+    """),
+    # Contador de facturas por sucursal (clave de IdAllocator.next_invoice_id), sembrado
+    # con el MAX actual: el checkout nunca recorre FACTURA ni compite por crear la clave
+    ("005_contador_facturas", """
+        IF OBJECT_ID('dbo.FACTURA', 'U') IS NOT NULL AND OBJECT_ID('dbo.SUCURSAL', 'U') IS NOT NULL
+        INSERT INTO dbo.ID_CONTADOR (clave, ultimo_id)
+        SELECT K.clave, ISNULL(MAX(F.id_factura), 0)
+        FROM dbo.SUCURSAL S
+        CROSS APPLY (SELECT 'FACTURA.id_factura@id_sucursal=' + CAST(S.Id_sucursal AS VARCHAR(20)) AS clave) K
+        LEFT JOIN dbo.FACTURA F ON F.id_sucursal = S.Id_sucursal
+        WHERE NOT EXISTS (SELECT 1 FROM dbo.ID_CONTADOR C WHERE C.clave = K.clave)
+        GROUP BY K.clave
+    """),
+    # Login / registro web buscan por correo: índice único (un correo, un cliente)
+    # que incluye nombre, así la búsqueda no vuelve a la tabla.
+    # Si ya hay correos repetidos no se crea y la migración avisa cuáles depurar.
+    ("006_ux_cliente_correo", """
+        IF OBJECT_ID('dbo.CLIENTE', 'U') IS NOT NULL
+           AND NOT EXISTS (SELECT 1 FROM sys.indexes
+                           WHERE object_id = OBJECT_ID('dbo.CLIENTE') AND name = 'UX_CLIENTE_CORREO')
+        BEGIN
+            IF EXISTS (SELECT correo FROM dbo.CLIENTE WHERE correo IS NOT NULL
+                       GROUP BY correo HAVING COUNT(*) > 1)
+                RAISERROR('CLIENTE tiene correos repetidos; depurarlos para crear UX_CLIENTE_CORREO.', 16, 1);
+            ELSE
+                CREATE UNIQUE INDEX UX_CLIENTE_CORREO ON dbo.CLIENTE (correo) INCLUDE (nombre)
+                WHERE correo IS NOT NULL;
+        END
+    """),
+    # Umbral por marca guardado como regla: se aplica también a los productos que se
+    # creen o cambien de marca después (StockAlertEngine.sync_brand_thresholds).
+    # Se siembra con los umbrales 'marca' que ya se habían copiado a UMBRAL_STOCK
+    ("007_umbral_marca", """
+        IF OBJECT_ID('dbo.UMBRAL_MARCA', 'U') IS NULL
+        BEGIN
+            CREATE TABLE dbo.UMBRAL_MARCA (
+                marca NVARCHAR(100) NOT NULL PRIMARY KEY,
+                umbral INT NOT NULL
+            );
+            IF OBJECT_ID('dbo.UMBRAL_STOCK', 'U') IS NOT NULL
+            INSERT INTO dbo.UMBRAL_MARCA (marca, umbral)
+            SELECT P.marca, MAX(U.umbral)
+            FROM dbo.UMBRAL_STOCK U
+            JOIN dbo.PRODUCTO P ON P.Id_producto = U.Id_producto
+            WHERE U.origen = 'marca' AND P.marca IS NOT NULL
+            GROUP BY P.marca;
+        END
+    """),
+]
+
+def apply_migrations():
+    """
+    Aplica todas las migraciones. Una que falle (ej. por permisos) no frena al resto.
+    Retorna (aplicadas, fallidas).
+    """
+    conn = get_db_connection()
+    applied, failed = [], []
+    try:
+        # ALTER DATABASE no se permite dentro de una transacción
+        conn.autocommit = True
+        cursor = conn.cursor()
+        for name, script in MIGRATIONS:
+            try:
+                cursor.execute(script)
+                applied.append(name)
+            except Exception as e:
+                print(f"ALERTA: Migración {name} fallida: {e}")
+                failed.append(name)
+        return applied, failed
+    finally:
+        conn.close()
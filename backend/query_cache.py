@@ -0,0 +1,127 @@
+# backend/query_cache.py
+
+import threading
+import time
+from collections import OrderedDict
+
+def freeze(value):
+    """Convierte listas/diccionarios en tuplas para poder usarlos como clave."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+class QueryCache:
+    """
+    Caché de lecturas con tamaño máximo (LRU) y tiempo de vida (TTL).
+    Cada entrada recuerda de qué tablas depende, así una escritura en una tabla
+    descarta solo las lecturas que la usan.
+    Cada tabla lleva además una generación que sube al invalidarla: una carga que
+    empezó antes de una invalidación no guarda su resultado (ya viejo) encima.
+    """
+    def __init__(self, max_entries=256, ttl_seconds=30):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # clave -> (expira_en, tablas, valor)
+        self._by_table = {}            # tabla -> {claves}
+        self._generations = {}         # tabla -> veces invalidada
+        self._epoch = 0                # Sube con clear() (y al podar _generations)
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0,
+                       "stale_loads": 0}
+
+    def get(self, key):
+        """Retorna (True, valor) si hay una entrada vigente; (False, None) si no."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return False, None
+            if entry[0] < time.monotonic():
+                self._remove_locked(key)
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return True, entry[2]
+
+    def generation(self, tables):
+        """Marca a tomar antes de leer de la BD; se pasa luego a put(..., generation=)."""
+        with self._lock:
+            return self._generation_locked(tables)
+
+    def put(self, key, value, tables, generation=None):
+        """
+        Guarda value para key. Con generation (de generation(tables) antes de la carga),
+        no guarda si alguna de esas tablas se invalidó entretanto; retorna False.
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation_locked(tables):
+                self._stats["stale_loads"] += 1
+                return False
+            if key in self._entries:
+                self._remove_locked(key)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, tuple(tables), value)
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove_locked(oldest)
+                self._stats["evictions"] += 1
+            return True
+
+    def get_or_load(self, key, tables, loader):
+        """Devuelve la entrada vigente o ejecuta loader() y guarda su resultado."""
+        hit, value = self.get(key)
+        if hit:
+            return value
+        generation = self.generation(tables)
+        value = loader()
+        self.put(key, value, tables, generation=generation)
+        return value
+
+    def invalidate_table(self, *tables):
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+                for key in list(self._by_table.get(table, ())):
+                    self._remove_locked(key)
+                    self._stats["invalidations"] += 1
+            if len(self._generations) > self.max_entries * 4:
+                # Etiquetas por fila (ej. "INVENTARIO#15") acumulan contadores:
+                # se podan y se cambia de época, así ninguna carga en curso se da por vigente
+                self._generations.clear()
+                self._epoch += 1
+
+    def clear(self):
+        with self._lock:
+            self._stats["invalidations"] += len(self._entries)
+            self._entries.clear()
+            self._by_table.clear()
+            self._generations.clear()
+            self._epoch += 1
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def _generation_locked(self, tables):
+        return self._epoch, tuple(self._generations.get(table, 0) for table in tables)
+
+    def _remove_locked(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for table in entry[1]:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
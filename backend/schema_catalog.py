@@ -0,0 +1,304 @@
+# backend/schema_catalog.py
+
+import json
+import os
+import threading
+from datetime import datetime, date, time
+from decimal import Decimal
+from backend.connection import get_db_connection, current_database
+from backend.config import SCHEMA_CACHE_DIR
+
+# Tipos de SQL Server agrupados según el tipo de Python con que se enlazan
+INT_TYPES = {"int", "bigint", "smallint", "tinyint"}
+DECIMAL_TYPES = {"decimal", "numeric", "money", "smallmoney"}
+FLOAT_TYPES = {"float", "real"}
+TEXT_TYPES = {"char", "varchar", "nchar", "nvarchar", "text", "ntext"}
+DATETIME_TYPES = {"datetime", "datetime2", "smalldatetime", "datetimeoffset"}
+
+
+class SchemaCatalog:
+    """
+    Metadatos de las tablas (columnas, tipos, nulos, PK y FK).
+    Se consultan una vez a INFORMATION_SCHEMA y se guardan en disco; los siguientes
+    arranques leen el archivo y solo comparan la marca de esquema (is_stale) para
+    decidir si hay que reconstruirlo con refresh().
+    """
+    # Subir este número si cambia la estructura del archivo
+    FORMAT_VERSION = 2
+
+    def __init__(self, db_name, cache_path):
+        self.db_name = db_name
+        self.cache_path = cache_path
+        self._lock = threading.Lock()
+        self._data = None
+        self._index = {}  # nombre en minúsculas -> nombre real (SQL Server no distingue mayúsculas)
+
+    # ------------------------------------------
+    # CARGA / PERSISTENCIA
+    # ------------------------------------------
+
+    def load(self):
+        """Usa el archivo en disco si es válido para esta BD; si no, consulta la BD."""
+        with self._lock:
+            if self._data is None:
+                data = self._read_file()
+                if data is None:
+                    data = self._fetch_from_db()
+                    self._write_file(data)
+                self._set_data(data)
+        return self
+
+    def refresh(self):
+        """Recarga desde la BD (tras cambios de esquema) y reescribe el archivo."""
+        with self._lock:
+            data = self._fetch_from_db()
+            self._write_file(data)
+            self._set_data(data)
+        return self
+
+    def is_stale(self):
+        """Compara la marca guardada con la fecha de último cambio de esquema en la BD."""
+        return self._data is None or self._read_schema_stamp() != self._data["schema_stamp"]
+
+    @property
+    def version(self):
+        """Marca de versión: {format, db_name, schema_stamp, generated_at}."""
+        data = self._ensure()
+        return {k: data[k] for k in ("format", "db_name", "schema_stamp", "generated_at")}
+
+    def _set_data(self, data):
+        self._data = data
+        self._index = {name.lower(): name for name in data["tables"]}
+
+    def _ensure(self):
+        if self._data is None:
+            self.load()
+        return self._data
+
+    def _read_file(self):
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("format") != self.FORMAT_VERSION or data.get("db_name") != self.db_name:
+            return None
+        return data
+
+    def _write_file(self, data):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = self.cache_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=1)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"ALERTA: No se pudo guardar el catálogo de esquema: {e}")
+
+    def _read_schema_stamp(self):
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT CONVERT(VARCHAR(33), MAX(modify_date), 126) FROM sys.objects WHERE is_ms_shipped = 0")
+            row = cursor.fetchone()
+            return row[0] if row else None
+        finally:
+            conn.close()
+
+    def _fetch_from_db(self):
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            tables = {}
+
+            cursor.execute("SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_TYPE = 'BASE TABLE'")
+            for row in cursor.fetchall():
+                tables[row[0]] = {"columns": [], "primary_key": [], "foreign_keys": []}
+
+            cursor.execute("""
+                SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE, IS_NULLABLE,
+                       CHARACTER_MAXIMUM_LENGTH, NUMERIC_PRECISION, NUMERIC_SCALE, COLUMN_DEFAULT,
+                       COLUMNPROPERTY(OBJECT_ID(QUOTENAME(TABLE_SCHEMA) + '.' + QUOTENAME(TABLE_NAME)),
+                                      COLUMN_NAME, 'IsIdentity'),
+                       COLUMNPROPERTY(OBJECT_ID(QUOTENAME(TABLE_SCHEMA) + '.' + QUOTENAME(TABLE_NAME)),
+                                      COLUMN_NAME, 'IsComputed')
+                FROM INFORMATION_SCHEMA.COLUMNS
+                ORDER BY TABLE_NAME, ORDINAL_POSITION
+            """)
+            for row in cursor.fetchall():
+                if row[0] in tables:
+                    tables[row[0]]["columns"].append({
+                        "name": row[1],
+                        "type": row[2].lower(),
+                        "nullable": row[3] == "YES",
+                        "max_length": row[4],
+                        "precision": row[5],
+                        "scale": row[6],
+                        "default": row[7],
+                        "identity": row[8] == 1,
+                        "computed": row[9] == 1
+                    })
+
+            cursor.execute("""
+                SELECT TC.TABLE_NAME, KCU.COLUMN_NAME
+                FROM INFORMATION_SCHEMA.TABLE_CONSTRAINTS TC
+                JOIN INFORMATION_SCHEMA.KEY_COLUMN_USAGE KCU
+                    ON TC.CONSTRAINT_NAME = KCU.CONSTRAINT_NAME
+                    AND TC.TABLE_NAME = KCU.TABLE_NAME
+                WHERE TC.CONSTRAINT_TYPE = 'PRIMARY KEY'
+                ORDER BY TC.TABLE_NAME, KCU.ORDINAL_POSITION
+            """)
+            for row in cursor.fetchall():
+                if row[0] in tables:
+                    tables[row[0]]["primary_key"].append(row[1])
+
+            cursor.execute("""
+                SELECT FK.TABLE_NAME, FK.COLUMN_NAME, PK.TABLE_NAME, PK.COLUMN_NAME, RC.CONSTRAINT_NAME
+                FROM INFORMATION_SCHEMA.REFERENTIAL_CONSTRAINTS RC
+                JOIN INFORMATION_SCHEMA.KEY_COLUMN_USAGE FK
+                    ON RC.CONSTRAINT_NAME = FK.CONSTRAINT_NAME
+                JOIN INFORMATION_SCHEMA.KEY_COLUMN_USAGE PK
+                    ON RC.UNIQUE_CONSTRAINT_NAME = PK.CONSTRAINT_NAME
+                    AND FK.ORDINAL_POSITION = PK.ORDINAL_POSITION
+                ORDER BY FK.TABLE_NAME, RC.CONSTRAINT_NAME, FK.ORDINAL_POSITION
+            """)
+            for row in cursor.fetchall():
+                if row[0] in tables:
+                    tables[row[0]]["foreign_keys"].append({
+                        "column": row[1], "ref_table": row[2], "ref_column": row[3], "name": row[4]
+                    })
+        finally:
+            conn.close()
+
+        return {
+            "format": self.FORMAT_VERSION,
+            "db_name": self.db_name,
+            "schema_stamp": self._read_schema_stamp(),
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "tables": tables
+        }
+
+    # ------------------------------------------
+    # CONSULTAS (sin ir a la BD)
+    # ------------------------------------------
+
+    def tables(self):
+        return list(self._ensure()["tables"].keys())
+
+    def has_table(self, table_name):
+        self._ensure()
+        return table_name.lower() in self._index
+
+    def _table(self, table_name):
+        data = self._ensure()
+        real_name = self._index.get(table_name.lower())
+        if real_name is None:
+            raise ValueError(f"La tabla {table_name} no existe en el esquema.")
+        return data["tables"][real_name]
+
+    def columns(self, table_name):
+        """Nombres de columnas en el orden de la tabla."""
+        return [c["name"] for c in self._table(table_name)["columns"]]
+
+    def required_columns(self, table_name):
+        """Columnas que un INSERT debe traer: NOT NULL, sin DEFAULT y que la BD no genera."""
+        return [
+            c["name"] for c in self._table(table_name)["columns"]
+            if not c["nullable"] and c["default"] is None and not c["identity"] and not c["computed"]
+            and c["type"] not in ("timestamp", "rowversion")
+        ]
+
+    def column_info(self, table_name, column_name):
+        for col in self._table(table_name)["columns"]:
+            if col["name"].lower() == column_name.lower():
+                return col
+        raise ValueError(f"La columna {column_name} no existe en {table_name}.")
+
+    def primary_key(self, table_name):
+        return list(self._table(table_name)["primary_key"])
+
+    def foreign_keys(self, table_name):
+        return [dict(fk) for fk in self._table(table_name)["foreign_keys"]]
+
+    def resolve_columns(self, table_name, column_names):
+        """Valida nombres de columnas y los retorna con la escritura real de la tabla."""
+        lookup = {c.lower(): c for c in self.columns(table_name)}
+        resolved = []
+        for name in column_names:
+            real_name = lookup.get(name.lower())
+            if real_name is None:
+                raise ValueError(f"La columna {name} no existe en {table_name}.")
+            resolved.append(real_name)
+        return resolved
+
+    # ------------------------------------------
+    # ENLACE TIPADO
+    # ------------------------------------------
+
+    def coerce(self, table_name, column_name, value):
+        """
+        Convierte el valor al tipo de Python que corresponde a la columna
+        (ej. el texto de un QLineEdit a int para una columna INT).
+        """
+        return self.converter(table_name, column_name)(value)
+
+    def converter(self, table_name, column_name):
+        """
+        Función valor -> valor convertido para la columna (la misma regla que coerce).
+        Para cargas masivas: se resuelve la columna una vez y no por cada valor.
+        """
+        col = self.column_info(table_name, column_name)
+        col_type = col["type"]
+        nullable = col["nullable"]
+
+        if col_type in INT_TYPES:
+            cast = int
+        elif col_type in DECIMAL_TYPES:
+            cast = lambda v: v if isinstance(v, Decimal) else Decimal(str(v))
+        elif col_type in FLOAT_TYPES:
+            cast = float
+        elif col_type == "bit":
+            cast = lambda v: v.lower() in ("1", "true", "si", "sí") if isinstance(v, str) else bool(v)
+        elif col_type in DATETIME_TYPES:
+            cast = lambda v: datetime.fromisoformat(v) if isinstance(v, str) else v
+        elif col_type == "date":
+            cast = lambda v: date.fromisoformat(v) if isinstance(v, str) else v
+        elif col_type == "time":
+            cast = lambda v: time.fromisoformat(v) if isinstance(v, str) else v
+        elif col_type in TEXT_TYPES:
+            return lambda v: v if v is None or isinstance(v, str) else str(v)
+        else:
+            cast = lambda v: v
+
+        def convert(value):
+            if value is None:
+                return None
+            if isinstance(value, str):
+                value = value.strip()
+                if value == "" and nullable:
+                    return None
+            return cast(value)
+        return convert
+
+    def bind_row(self, table_name, data_dict):
+        """Valida y convierte un diccionario {columna: valor} antes de enlazarlo."""
+        names = self.resolve_columns(table_name, list(data_dict.keys()))
+        return {
+            real: self.coerce(table_name, real, value)
+            for real, value in zip(names, data_dict.values())
+        }
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+def get_schema_catalog():
+    """Catálogo de la BD en uso (la del nodo actual; se carga en el primer uso)."""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                db_name = current_database()
+                cache_path = os.path.join(SCHEMA_CACHE_DIR, f"schema_{db_name}.json")
+                _catalog = SchemaCatalog(db_name, cache_path)
+    return _catalog
@@ -0,0 +1,122 @@
+# backend/services/catalog_cache.py
+
+import threading
+import time
+import unicodedata
+from types import MappingProxyType
+from backend.config import CATALOG_CACHE
+
+def fold_text(text):
+    """Minúsculas y sin tildes, para buscar como SQL Server (collation CI_AI)."""
+    text = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in text if not unicodedata.combining(c)).casefold()
+
+
+class _Snapshot:
+    """Catálogo de una sucursal en un momento dado. Nunca se modifica: se reemplaza entero."""
+    __slots__ = ("items", "positions", "expires_at")
+
+    def __init__(self, items, expires_at):
+        self.items = tuple(MappingProxyType(dict(item)) for item in items)
+        self.positions = {item["id"]: i for i, item in enumerate(self.items)}
+        self.expires_at = expires_at
+
+
+class CatalogCache:
+    """
+    Catálogo web (productos con stock) por sucursal, en memoria del proceso.
+    Los lectores toman la foto vigente sin lock; los cambios arman una foto nueva
+    y la intercambian de una vez (un hilo nunca ve un catálogo a medio actualizar).
+    - patch_stock(): un cambio de stock conocido se aplica sobre la foto actual.
+    - invalidate(): cambios de precio / alta / baja de productos; se recarga al próximo pedido.
+    - TTL: cubre lo que cambie por fuera de la app.
+    """
+    def __init__(self, ttl_seconds=60):
+        self.ttl_seconds = ttl_seconds
+        self._write_lock = threading.Lock()
+        self._snapshots = {}   # sucursal -> _Snapshot
+        self._generation = 0   # Sube con cada cambio: una carga que empezó antes no pisa la foto nueva
+        self._stats = {"hits": 0, "loads": 0, "patches": 0, "invalidations": 0}
+
+    def get(self, sucursal_id, loader):
+        """Items del catálogo de la sucursal; loader() se llama si no hay foto vigente."""
+        snapshot = self._snapshots.get(sucursal_id)
+        if snapshot is not None and snapshot.expires_at > time.monotonic():
+            with self._write_lock:
+                self._stats["hits"] += 1
+            return snapshot.items
+
+        generation = self._generation
+        items = loader()
+        snapshot = _Snapshot(items, time.monotonic() + self.ttl_seconds)
+        with self._write_lock:
+            if generation == self._generation:
+                self._snapshots[sucursal_id] = snapshot
+            self._stats["loads"] += 1
+        return snapshot.items
+
+    def search(self, sucursal_id, loader, text):
+        """Filtra la foto por nombre o marca (sin distinguir mayúsculas ni tildes)."""
+        items = self.get(sucursal_id, loader)
+        needle = fold_text(text.strip())
+        if not needle:
+            return items
+        return tuple(item for item in items
+                     if needle in fold_text(item["nombre"]) or needle in fold_text(item["marca"]))
+
+    def patch_stock(self, sucursal_id, quantities):
+        """
+        Aplica {Id_producto: cantidad nueva} a la foto de la sucursal.
+        Un producto que se queda sin stock sale del catálogo; uno que no estaba
+        (vuelve a tener stock) no se puede armar desde aquí y obliga a recargar.
+        """
+        with self._write_lock:
+            self._generation += 1
+            snapshot = self._snapshots.get(sucursal_id)
+            if snapshot is None:
+                return
+            items = list(snapshot.items)
+            removed = set()
+            for prod_id, qty in quantities.items():
+                pos = snapshot.positions.get(prod_id)
+                if pos is None:
+                    if qty is not None and qty > 0:
+                        del self._snapshots[sucursal_id]
+                        self._stats["invalidations"] += 1
+                        return
+                    continue
+                if qty is None or qty <= 0:
+                    removed.add(pos)
+                else:
+                    items[pos] = {**items[pos], "stock": int(qty)}
+            items = [item for i, item in enumerate(items) if i not in removed]
+            self._snapshots[sucursal_id] = _Snapshot(items, snapshot.expires_at)
+            self._stats["patches"] += 1
+
+    def invalidate(self, sucursal_id=None):
+        with self._write_lock:
+            self._generation += 1
+            if sucursal_id is None:
+                self._snapshots.clear()
+            else:
+                self._snapshots.pop(sucursal_id, None)
+            self._stats["invalidations"] += 1
+
+    def get_stats(self):
+        with self._write_lock:
+            stats = dict(self._stats)
+            stats["branches"] = len(self._snapshots)
+        return stats
+
+
+_catalog_cache = None
+_catalog_cache_lock = threading.Lock()
+
+def get_catalog_cache():
+    """Caché del catálogo web compartida por el proceso."""
+    global _catalog_cache
+    if _catalog_cache is None:
+        with _catalog_cache_lock:
+            if _catalog_cache is None:
+                _catalog_cache = CatalogCache(**CATALOG_CACHE)
+    return _catalog_cache
@@ -0,0 +1,58 @@
+# backend/services/client_cache.py
+
+import threading
+from backend.query_cache import QueryCache
+from backend.config import CLIENT_CACHE
+
+class ClientCache:
+    """
+    Correo -> {"id", "nombre"} de los clientes web, en memoria del proceso.
+    El registro escribe la entrada al confirmar (write-through).
+    Un correo que no existe se recuerda como "desconocido" (None) por un tiempo corto,
+    así un login fallido repetido no vuelve a la BD; el registro lo reemplaza al instante.
+    """
+    def __init__(self, max_entries=2000, ttl_seconds=300, negative_ttl_seconds=10):
+        self._known = QueryCache(max_entries, ttl_seconds)
+        self._unknown = QueryCache(max_entries, negative_ttl_seconds)
+
+    def _key(self, email):
+        # correo se compara sin distinguir mayúsculas en SQL Server
+        return email.strip().casefold()
+
+    def get(self, email):
+        """Retorna (True, cliente o None si se sabe que no existe) o (False, None) si no está."""
+        key = self._key(email)
+        hit, client = self._known.get(key)
+        if hit:
+            return True, client
+        hit, _ = self._unknown.get(key)
+        return (True, None) if hit else (False, None)
+
+    def put(self, email, client):
+        """client = {"id", "nombre"}; None recuerda que el correo no está registrado."""
+        key = self._key(email)
+        if client is None:
+            self._unknown.put(key, None, ("CLIENTE", f"CLIENTE#{key}"))
+        else:
+            self._unknown.invalidate_table(f"CLIENTE#{key}")
+            self._known.put(key, dict(client), ("CLIENTE",))
+
+    def clear(self):
+        self._known.clear()
+        self._unknown.clear()
+
+    def get_stats(self):
+        return {"known": self._known.get_stats(), "unknown": self._unknown.get_stats()}
+
+
+_client_cache = None
+_client_cache_lock = threading.Lock()
+
+def get_client_cache():
+    """Caché de clientes compartida por el proceso (login y registro web)."""
+    global _client_cache
+    if _client_cache is None:
+        with _client_cache_lock:
+            if _client_cache is None:
+                _client_cache = ClientCache(**CLIENT_CACHE)
+    return _client_cache
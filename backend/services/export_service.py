@@ -0,0 +1,159 @@
+# backend/services/export_service.py
+
+import argparse
+import csv
+import os
+import time
+from itertools import islice
+from backend.generic_dao import GenericDAO
+from backend.schema_catalog import (get_schema_catalog, INT_TYPES, DECIMAL_TYPES, FLOAT_TYPES,
+                                    TEXT_TYPES, DATETIME_TYPES)
+from backend.config import STREAM_CHUNK_SIZE
+
+try:
+    import pyarrow as pa          # Opcional: solo para Parquet / Arrow
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+EXPORT_FORMATS = {".csv": "csv", ".parquet": "parquet", ".arrow": "arrow", ".feather": "arrow"}
+
+
+class ExportService:
+    """
+    Vuelca una tabla a disco leyendo en streaming (GenericDAO.stream_table_data):
+    en memoria solo hay un bloque de chunk_size filas, sin importar el tamaño de la tabla.
+    El archivo se escribe con otro nombre y se renombra al terminar, así nunca queda uno a medias.
+    """
+    def __init__(self, dao=None):
+        self.dao = dao or GenericDAO()
+
+    def export_table(self, table_name, path, fmt=None, columns=None, filters=None,
+                     order_by=None, chunk_size=STREAM_CHUNK_SIZE, progress=None):
+        """
+        Exporta table_name a path. fmt se deduce de la extensión si no se indica
+        ("csv", "parquet" o "arrow"). progress(filas_escritas) se llama tras cada bloque.
+        Retorna {"table", "path", "format", "rows", "seconds"}.
+        """
+        fmt = fmt or EXPORT_FORMATS.get(os.path.splitext(path)[1].lower())
+        if fmt not in ("csv", "parquet", "arrow"):
+            raise ValueError(f"Formato de exportación no soportado: {path}")
+        if fmt != "csv" and pa is None:
+            raise ImportError(f"Exportar a {fmt} requiere pyarrow (pip install pyarrow).")
+
+        start = time.perf_counter()
+        col_names, rows = self.dao.stream_table_data(
+            table_name, chunk_size, columns=columns, filters=filters, order_by=order_by
+        )
+        chunks = self._chunks(rows, chunk_size)
+
+        tmp_path = path + ".part"
+        try:
+            if fmt == "csv":
+                total = self._write_csv(tmp_path, col_names, chunks, progress)
+            else:
+                schema = self._arrow_schema(table_name, col_names)
+                total = self._write_arrow(tmp_path, fmt, schema, chunks, progress)
+            os.replace(tmp_path, path)
+        except BaseException:
+            rows.close()  # Devuelve la conexión aunque el volcado se corte
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        return {
+            "table": table_name, "path": path, "format": fmt,
+            "rows": total, "seconds": round(time.perf_counter() - start, 3)
+        }
+
+    def _chunks(self, rows, chunk_size):
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+    def _write_csv(self, path, columns, chunks, progress):
+        total = 0
+        # utf-8-sig para que Excel reconozca los acentos al abrir el archivo
+        with open(path, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for chunk in chunks:
+                writer.writerows(chunk)
+                total += len(chunk)
+                if progress:
+                    progress(total)
+        return total
+
+    def _arrow_schema(self, table_name, columns):
+        """Tipos Arrow desde el catálogo: un bloque con una columna toda NULL no cambia el tipo."""
+        catalog = get_schema_catalog()
+        fields = []
+        for name in columns:
+            col = catalog.column_info(table_name, name)
+            col_type = col["type"]
+            if col_type in INT_TYPES:
+                arrow_type = pa.int64()
+            elif col_type in DECIMAL_TYPES:
+                arrow_type = pa.decimal128(col["precision"] or 38, col["scale"] or 0)
+            elif col_type in FLOAT_TYPES:
+                arrow_type = pa.float64()
+            elif col_type == "bit":
+                arrow_type = pa.bool_()
+            elif col_type in DATETIME_TYPES:
+                arrow_type = pa.timestamp("us")
+            elif col_type == "date":
+                arrow_type = pa.date32()
+            elif col_type == "time":
+                arrow_type = pa.time64("us")
+            elif col_type in TEXT_TYPES:
+                arrow_type = pa.string()
+            else:
+                arrow_type = pa.binary()
+            fields.append(pa.field(name, arrow_type, nullable=col["nullable"]))
+        return pa.schema(fields)
+
+    def _write_arrow(self, path, fmt, schema, chunks, progress):
+        total = 0
+        writer = pq.ParquetWriter(path, schema) if fmt == "parquet" else pa.ipc.new_file(path, schema)
+        try:
+            for chunk in chunks:
+                arrays = [pa.array([row[i] for row in chunk], type=field.type)
+                          for i, field in enumerate(schema)]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                total += len(chunk)
+                if progress:
+                    progress(total)
+        finally:
+            writer.close()
+        return total
+
+
+def main(argv=None):
+    """
+    Uso:
+        python -m backend.services.export_service FACTURA facturas.csv
+        python -m backend.services.export_service INVENTARIO inv.parquet --columns Id_producto cantidad
+    """
+    parser = argparse.ArgumentParser(description="Exporta una tabla de TechStore a CSV, Parquet o Arrow.")
+    parser.add_argument("table", help="Tabla a exportar (ej. FACTURA)")
+    parser.add_argument("path", help="Archivo destino; la extensión define el formato")
+    parser.add_argument("--format", choices=["csv", "parquet", "arrow"], help="Forzar formato")
+    parser.add_argument("--columns", nargs="+", help="Solo estas columnas")
+    parser.add_argument("--order-by", nargs="+", help="Columnas de orden")
+    parser.add_argument("--chunk-size", type=int, default=STREAM_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    def report(rows):
+        print(f"\r{rows} filas exportadas...", end="", flush=True)
+
+    result = ExportService().export_table(
+        args.table.upper(), args.path, fmt=args.format, columns=args.columns,
+        order_by=args.order_by, chunk_size=args.chunk_size, progress=report
+    )
+    print(f"\nListo: {result['rows']} filas de {result['table']} en {result['path']} ({result['seconds']} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+# backend/services/id_allocator.py
+
+import threading
+import pyodbc
+from backend.connection import get_db_connection
+from backend.config import ID_BLOCK_SIZE
+
+RESERVE_QUERY = "UPDATE ID_CONTADOR SET ultimo_id = ultimo_id + ? OUTPUT INSERTED.ultimo_id WHERE clave = ?"
+
+class IdAllocator:
+    """
+    Asignación de IDs sin SELECT MAX()+1 (patrón hi/lo).
+    Cada proceso reserva un bloque de IDs en ID_CONTADOR con un UPDATE atómico
+    y los entrega desde memoria; solo vuelve a la BD cuando el bloque se agota.
+    Los bloques de procesos distintos nunca se solapan.
+    Cada clave tiene su propio lock, que solo cubre la memoria: la reserva en la BD
+    se hace sin lock, así una clave que va a la BD no frena a las demás.
+    """
+    def __init__(self, block_size=ID_BLOCK_SIZE):
+        self.block_size = block_size
+        self._lock = threading.Lock()   # Protege _key_locks y _stats
+        self._key_locks = {}            # clave -> Lock
+        self._blocks = {}               # clave -> [[siguiente_id, último_id_reservado], ...]
+        self._stats = {"allocated": 0, "reservations": 0, "seeds": 0}
+
+    def _key(self, table_name, id_column, scope):
+        key = f"{table_name}.{id_column}"
+        if scope:
+            key += "@" + ",".join(f"{col}={val}" for col, val in sorted(scope.items()))
+        return key
+
+    def _key_lock(self, key):
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    def _count(self, stat, n=1):
+        with self._lock:
+            self._stats[stat] += n
+
+    def next_id(self, table_name, id_column, scope=None, block_size=None, cursor=None):
+        """
+        Siguiente ID libre para table_name.id_column.
+        scope (ej. {"id_sucursal": 2}) lleva un contador independiente por sucursal.
+        cursor: incrementa el contador en la transacción del llamador (de a 1, sin bloque
+        en memoria y sin pedir otra conexión); si revierte, el número se libera.
+        """
+        key = self._key(table_name, id_column, scope)
+        if cursor is not None:
+            value = self._increment(cursor, key, table_name, id_column, scope, 1)
+            self._count("allocated")
+            return value
+
+        lock = self._key_lock(key)
+        with lock:
+            value = self._take_locked(key)
+        if value is None:
+            # Sin lock: otros hilos pueden reservar a la vez; cada bloque se guarda y se usa
+            size = block_size or self.block_size
+            last = self._reserve(key, table_name, id_column, scope, size)
+            with lock:
+                self._blocks.setdefault(key, []).append([last - size + 1, last])
+                value = self._take_locked(key)
+        self._count("allocated")
+        return value
+
+    def next_invoice_id(self, sucursal_id, cursor):
+        """
+        Siguiente número de factura de la sucursal: contador propio en ID_CONTADOR
+        (sembrado por la migración 005), incrementado en la transacción de la factura.
+        Si la compra se revierte el número vuelve a quedar libre: correlativos sin huecos.
+        """
+        return self.next_id("FACTURA", "id_factura", scope={"id_sucursal": sucursal_id}, cursor=cursor)
+
+    def _take_locked(self, key):
+        for block in self._blocks.get(key, ()):
+            if block[0] <= block[1]:
+                value = block[0]
+                block[0] += 1
+                return value
+        self._blocks.pop(key, None)
+        return None
+
+    def resync(self, table_name, id_column, scope=None):
+        """
+        Alinea el contador con el MAX real de la tabla (ej. tras una carga con IDs
+        explícitos) y descarta los bloques en memoria de este proceso.
+        """
+        key = self._key(table_name, id_column, scope)
+        where, params = self._scope_filter(scope)
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                UPDATE C
+                SET ultimo_id = CASE WHEN M.max_id > C.ultimo_id THEN M.max_id ELSE C.ultimo_id END
+                FROM ID_CONTADOR C
+                CROSS JOIN (SELECT ISNULL(MAX({id_column}), 0) AS max_id FROM {table_name}{where}) M
+                WHERE C.clave = ?
+            """, params + [key])
+            conn.commit()
+        finally:
+            conn.close()
+        with self._key_lock(key):
+            self._blocks.pop(key, None)
+
+    def resync_table(self, table_name):
+        """
+        resync() de todos los contadores de la tabla (incluidos los que van por sucursal).
+        Llamar tras cargas con claves explícitas (importaciones, lotes con IDs del llamador):
+        si no, el próximo bloque podría entregar IDs que ya existen.
+        """
+        prefix = f"{table_name}."
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT clave FROM ID_CONTADOR WHERE clave LIKE ?", (prefix + "%",))
+            keys = [row[0] for row in cursor.fetchall() if row[0].startswith(prefix)]
+        finally:
+            conn.close()
+        for key in keys:
+            column, _, scope_text = key[len(prefix):].partition("@")
+            scope = dict(item.split("=", 1) for item in scope_text.split(",")) if scope_text else None
+            self.resync(table_name, column, scope)
+        return len(keys)
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            locks = list(self._key_locks.items())
+        cached = 0
+        for key, lock in locks:
+            with lock:
+                cached += sum(b[1] - b[0] + 1 for b in self._blocks.get(key, ()))
+        stats["cached_ids"] = cached
+        return stats
+
+    def _scope_filter(self, scope):
+        if not scope:
+            return "", []
+        cols = sorted(scope)
+        return " WHERE " + " AND ".join(f"{c} = ?" for c in cols), [scope[c] for c in cols]
+
+    def _increment(self, cursor, key, table_name, id_column, scope, size):
+        """
+        Suma size al contador sobre cursor (sin confirmar) y retorna el último ID reservado.
+        Si la clave es nueva, el contador arranca en el MAX actual de la tabla: ese
+        recorrido ocurre una sola vez por clave.
+        """
+        cursor.execute(RESERVE_QUERY, (size, key))
+        row = cursor.fetchone()
+        if row is None:
+            where, params = self._scope_filter(scope)
+            try:
+                cursor.execute(
+                    f"INSERT INTO ID_CONTADOR (clave, ultimo_id) "
+                    f"SELECT ?, ISNULL(MAX({id_column}), 0) FROM {table_name} WITH (UPDLOCK, HOLDLOCK){where}",
+                    [key] + params
+                )
+                self._count("seeds")
+            except pyodbc.IntegrityError:
+                # Otro proceso creó la clave al mismo tiempo: usamos la suya
+                # (la falla revierte solo esa sentencia, no la transacción)
+                pass
+            cursor.execute(RESERVE_QUERY, (size, key))
+            row = cursor.fetchone()
+        return int(row[0])
+
+    def _reserve(self, key, table_name, id_column, scope, size):
+        """Reserva `size` IDs en una transacción propia (independiente de la del llamador)."""
+        conn = get_db_connection()
+        try:
+            last = self._increment(conn.cursor(), key, table_name, id_column, scope, size)
+            conn.commit()
+            self._count("reservations")
+            return last
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+
+_allocator = None
+_allocator_lock = threading.Lock()
+
+def get_id_allocator():
+    """Asignador compartido por todo el proceso (escritorio o web)."""
+    global _allocator
+    if _allocator is None:
+        with _allocator_lock:
+            if _allocator is None:
+                _allocator = IdAllocator()
+    return _allocator
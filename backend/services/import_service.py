@@ -0,0 +1,240 @@
+# backend/services/import_service.py
+
+import argparse
+import csv
+import time
+from decimal import InvalidOperation
+from itertools import islice
+from backend.connection import get_db_connection
+from backend.generic_dao import GenericDAO, in_chunks
+from backend.schema_catalog import get_schema_catalog, TEXT_TYPES
+from backend.config import BULK_CHUNK_SIZE
+
+
+class ImportService:
+    """
+    Carga masiva desde CSV en tres etapas, bloque por bloque:
+    1. Lectura en streaming (csv.reader): en memoria solo hay chunk_size filas.
+    2. Validación contra el catálogo: tipos, obligatorios, largo de texto y
+       existencia de FK (una consulta IN por FK y por bloque).
+    3. INSERT con fast_executemany y commit por bloque.
+    Las filas rechazadas van a un CSV aparte con el número de línea y el motivo.
+    """
+    def __init__(self, dao=None):
+        self.dao = dao or GenericDAO()
+
+    def import_csv(self, table_name, path, reject_path=None, chunk_size=BULK_CHUNK_SIZE,
+                   delimiter=",", progress=None):
+        """
+        Importa path (con encabezado) a table_name.
+        reject_path: por defecto "<path>.rechazos.csv" (solo se crea si hay rechazos).
+        progress(leidas, insertadas, rechazadas) se llama tras cada bloque.
+        Retorna {"table", "read", "inserted", "rejected", "reject_path", "seconds", "rows_per_second"}.
+        """
+        self.dao._check_table_security(table_name)
+        reject_path = reject_path or path + ".rechazos.csv"
+        start = time.perf_counter()
+        stats = {"read": 0, "inserted": 0, "rejected": 0}
+
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.reader(f, delimiter=delimiter)
+            header = next(reader, None)
+            if not header:
+                raise ValueError(f"El archivo {path} está vacío o no tiene encabezado.")
+            columns = self._check_header(table_name, header)
+            rejects = _RejectWriter(reject_path, header)
+
+            conn = get_db_connection()
+            try:
+                cursor = conn.cursor()
+                placeholders = ", ".join(["?"] * len(columns))
+                query = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})"
+                validator = _BatchValidator(table_name, columns)
+                line_no = 1  # El encabezado es la línea 1
+
+                while True:
+                    raw_rows = list(islice(reader, chunk_size))
+                    if not raw_rows:
+                        break
+                    lines = range(line_no + 1, line_no + 1 + len(raw_rows))
+                    line_no += len(raw_rows)
+                    stats["read"] += len(raw_rows)
+
+                    good, bad = validator.validate(cursor, raw_rows, lines)
+                    failed = self._insert_batch(conn, cursor, query, good)
+                    stats["inserted"] += len(good) - len(failed)
+                    stats["rejected"] += len(bad) + len(failed)
+                    for line, raw, reason in sorted(bad + failed, key=lambda item: item[0]):
+                        rejects.write(line, raw, reason)
+                    if progress:
+                        progress(stats["read"], stats["inserted"], stats["rejected"])
+            finally:
+                conn.close()
+                rejects.close()
+                if stats["inserted"]:
+                    # Las filas traen su clave: el contador de IDs debe saltar lo importado
+                    self.dao._resync_ids(table_name)
+
+        seconds = time.perf_counter() - start
+        return {
+            "table": table_name, **stats,
+            "reject_path": reject_path if stats["rejected"] else None,
+            "seconds": seconds,
+            "rows_per_second": stats["read"] / seconds if seconds > 0 else float(stats["read"])
+        }
+
+    def _check_header(self, table_name, header):
+        catalog = get_schema_catalog()
+        columns = catalog.resolve_columns(table_name, [h.strip() for h in header])
+        missing = [k for k in catalog.primary_key(table_name) if k not in columns]
+        if missing:
+            raise ValueError(f"Faltan columnas de la clave primaria en el archivo: {', '.join(missing)}")
+        # Sin una columna obligatoria fallaría cada fila (y cada bloque se partiría hasta 1 fila)
+        missing = [c for c in catalog.required_columns(table_name) if c not in columns]
+        if missing:
+            raise ValueError(f"Faltan columnas obligatorias (NOT NULL sin valor por defecto) "
+                             f"en el archivo: {', '.join(missing)}")
+        return columns
+
+    def _insert_batch(self, conn, cursor, query, good):
+        """
+        Inserta el bloque con fast_executemany. Si el lote falla (ej. PK duplicada) se
+        parte en mitades y se reintenta cada una hasta aislar las filas culpables:
+        con k filas malas son unos 2·k·log2(n) envíos, no uno (y un commit) por fila.
+        Retorna los rechazos [(linea, fila_original, motivo)].
+        """
+        if not good:
+            return []
+        try:
+            cursor.fast_executemany = True
+            cursor.executemany(query, [row for _, _, row in good])
+            conn.commit()
+            return []
+        except Exception as e:
+            conn.rollback()
+            if len(good) == 1:
+                line, raw, _ = good[0]
+                return [(line, raw, f"Error de BD: {e}")]
+        finally:
+            cursor.fast_executemany = False
+
+        mid = len(good) // 2
+        return (self._insert_batch(conn, cursor, query, good[:mid])
+                + self._insert_batch(conn, cursor, query, good[mid:]))
+
+
+class _BatchValidator:
+    """Valida un bloque de filas crudas (texto) y las convierte a los tipos de la tabla."""
+    def __init__(self, table_name, columns):
+        catalog = get_schema_catalog()
+        self.columns = columns
+        self.converters = [catalog.converter(table_name, c) for c in columns]
+        self.infos = [catalog.column_info(table_name, c) for c in columns]
+        # FK de la tabla cuyas columnas vienen en el archivo: (posición, tabla, columna referida)
+        self.foreign_keys = [
+            (columns.index(fk["column"]), fk["ref_table"], fk["ref_column"])
+            for fk in catalog.foreign_keys(table_name) if fk["column"] in columns
+        ]
+
+    def validate(self, cursor, raw_rows, lines):
+        """Retorna (buenas [(linea, cruda, convertida)], malas [(linea, cruda, motivo)])."""
+        good, bad = [], []
+        n_cols = len(self.columns)
+        for line, raw in zip(lines, raw_rows):
+            if len(raw) != n_cols:
+                bad.append((line, raw, f"Se esperaban {n_cols} columnas y hay {len(raw)}"))
+                continue
+            try:
+                good.append((line, raw, self._convert(raw)))
+            except ValueError as e:
+                bad.append((line, raw, str(e)))
+
+        # Existencia de FK: una consulta por FK con los valores distintos del bloque
+        for pos, ref_table, ref_column in self.foreign_keys:
+            values = {row[pos] for _, _, row in good if row[pos] is not None}
+            missing = values - self._existing(cursor, ref_table, ref_column, values)
+            if missing:
+                name = self.columns[pos]
+                still_good = []
+                for item in good:
+                    if item[2][pos] in missing:
+                        bad.append((item[0], item[1], f"{name}={item[2][pos]} no existe en {ref_table}"))
+                    else:
+                        still_good.append(item)
+                good = still_good
+        return good, bad
+
+    def _convert(self, raw):
+        row = []
+        for value, convert, info in zip(raw, self.converters, self.infos):
+            try:
+                value = convert(value)
+            except (ValueError, TypeError, InvalidOperation):
+                raise ValueError(f"{info['name']}: '{value}' no es un valor {info['type']} válido")
+            if value is None or value == "":
+                if not info["nullable"]:
+                    raise ValueError(f"{info['name']} es obligatorio")
+                value = None
+            elif (info["type"] in TEXT_TYPES and info["max_length"]
+                    and info["max_length"] > 0 and len(value) > info["max_length"]):
+                raise ValueError(f"{info['name']} supera {info['max_length']} caracteres")
+            row.append(value)
+        return row
+
+    def _existing(self, cursor, table_name, column_name, values):
+        found = set()
+        for part in in_chunks(values):
+            placeholders = ", ".join(["?"] * len(part))
+            cursor.execute(f"SELECT {column_name} FROM {table_name} WHERE {column_name} IN ({placeholders})", part)
+            found.update(row[0] for row in cursor.fetchall())
+        return found
+
+
+class _RejectWriter:
+    """CSV de rechazos: línea original, motivo y las columnas tal como venían."""
+    def __init__(self, path, header):
+        self.path = path
+        self.header = header
+        self._file = None
+        self._writer = None
+
+    def write(self, line, raw, reason):
+        if self._writer is None:
+            self._file = open(self.path, "w", newline="", encoding="utf-8-sig")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(["linea", "motivo"] + list(self.header))
+        self._writer.writerow([line, reason] + list(raw))
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+def main(argv=None):
+    """
+    Uso:
+        python -m backend.services.import_service PRODUCTO productos.csv
+        python -m backend.services.import_service INVENTARIO inv.csv --delimiter ";"
+    """
+    parser = argparse.ArgumentParser(description="Importa un CSV (con encabezado) a una tabla de TechStore.")
+    parser.add_argument("table", help="Tabla destino (ej. PRODUCTO)")
+    parser.add_argument("path", help="Archivo CSV; los encabezados son los nombres de columna")
+    parser.add_argument("--rejects", help="Archivo de rechazos (por defecto <path>.rechazos.csv)")
+    parser.add_argument("--delimiter", default=",")
+    parser.add_argument("--chunk-size", type=int, default=BULK_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    def report(read, inserted, rejected):
+        print(f"\r{read} leídas | {inserted} insertadas | {rejected} rechazadas", end="", flush=True)
+
+    result = ImportService().import_csv(
+        args.table.upper(), args.path, reject_path=args.rejects,
+        chunk_size=args.chunk_size, delimiter=args.delimiter, progress=report
+    )
+    print(f"\nListo en {result['seconds']:.1f} s ({result['rows_per_second']:.0f} filas/s).")
+    if result["reject_path"]:
+        print(f"Rechazos en {result['reject_path']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,25 @@
-from backend.generic_dao import GenericDAO
+import pyodbc
+from backend.generic_dao import GenericDAO, in_chunks
 from backend.connection import get_db_connection
-from backend.config import CURRENT_NODE
+from backend.schema_catalog import get_schema_catalog
+from backend.services.stock_cache import get_stock_cache
+from backend.services.stock_alerts import on_stock_changed
+from backend.services.id_allocator import get_id_allocator
+from backend.config import CURRENT_NODE, LOW_STOCK_THRESHOLD
+
+# Resumen por producto: la vista indexada (migración 003) o, si no existe, la misma agregación al vuelo
+STOCK_SUMMARY_VIEW = "dbo.V_STOCK_PRODUCTO V WITH (NOEXPAND)"
+STOCK_SUMMARY_FALLBACK = """(
+    SELECT Id_producto, SUM(ISNULL(cantidad, 0)) AS stock_total,
+           SUM(CASE WHEN ISNULL(cantidad, 0) <= 0 THEN 1 ELSE 0 END) AS sucursales_sin_stock,
+           COUNT_BIG(*) AS sucursales
+    FROM INVENTARIO GROUP BY Id_producto
+) V"""
 
 class InventoryService(GenericDAO):
     
     def create_product_with_inventory(self, product_data, initial_qty):
+        product_data = get_schema_catalog().bind_row("PRODUCTO", product_data)
         conn = get_db_connection()
         cursor = conn.cursor()
         try:
@@ -27,7 +42,6 @@ class InventoryService(GenericDAO):
             cursor.execute(query_inv, (current_branch_id, prod_id, initial_qty))
 
             conn.commit()
-            return True
         except Exception as e:
             conn.rollback()
             print(f"Error transaccional crear prod+inv: {e}")
@@ -35,33 +49,101 @@ class InventoryService(GenericDAO):
         finally:
             conn.close()
 
-    def update_inventory_quantity(self, product_id, new_quantity):
+        on_stock_changed(current_branch_id, {prod_id: initial_qty})
+        return True
+
+    def create_products_with_inventory(self, products, sucursal_id=None):
+        """
+        Versión por lote de create_product_with_inventory: products es una lista de
+        (datos_producto, cantidad_inicial). Los productos sin Id_producto reciben uno del asignador.
+        Todo va en una transacción: PRODUCTO e INVENTARIO se cargan en temporales y
+        se insertan con un INSERT ... SELECT cada uno. Retorna los Id_producto creados.
+        """
+        if sucursal_id is None:
+            sucursal_id = CURRENT_NODE["id_sucursal"]
+        products = [(dict(data), qty) for data, qty in products]
+        if not products:
+            return []
+
+        without_id = [data for data, _ in products if data.get("Id_producto") is None]
+        allocator = get_id_allocator()
+        for data in without_id:
+            data["Id_producto"] = allocator.next_id("PRODUCTO", "Id_producto", block_size=len(without_id))
+
+        _, columns, values = self._normalize_batch("PRODUCTO", [data for data, _ in products], ["Id_producto"])
+        id_idx = columns.index("Id_producto")
+        ids = [row[id_idx] for row in values]
+        inventory = [[sucursal_id, prod_id, qty] for prod_id, (_, qty) in zip(ids, products)]
+
         conn = get_db_connection()
-        cursor = conn.cursor()
         try:
-            sucursal_id = CURRENT_NODE["id_sucursal"]
-            
-            # Intentar actualizar
-            query_update = """
-                UPDATE INVENTARIO SET cantidad = ? 
-                WHERE Id_producto = ? AND Id_sucursal = ?
-            """
-            cursor.execute(query_update, (new_quantity, product_id, sucursal_id))
-            
-            # Si no existía, crear
-            if cursor.rowcount == 0:
-                query_insert = """
-                    INSERT INTO INVENTARIO (Id_sucursal, Id_producto, cantidad)
-                    VALUES (?, ?, ?)
-                """
-                cursor.execute(query_insert, (sucursal_id, product_id, new_quantity))
+            cursor = conn.cursor()
+            cols = ", ".join(columns)
+            staging = self._stage_rows(cursor, "PRODUCTO", columns, values)
+            cursor.execute(f"INSERT INTO PRODUCTO ({cols}) SELECT {cols} FROM {staging}")
+            cursor.execute(f"DROP TABLE {staging}")
+
+            inv_cols = ["Id_sucursal", "Id_producto", "cantidad"]
+            staging = self._stage_rows(cursor, "INVENTARIO", inv_cols, inventory)
+            cursor.execute(f"INSERT INTO INVENTARIO ({', '.join(inv_cols)}) SELECT {', '.join(inv_cols)} FROM {staging}")
+            cursor.execute(f"DROP TABLE {staging}")
 
             conn.commit()
-            return True
         except Exception as e:
+            conn.rollback()
+            print(f"Error transaccional crear lote prod+inv ({len(products)} productos): {e}")
             raise e
         finally:
             conn.close()
+
+        if len(without_id) < len(products):
+            self._resync_ids("PRODUCTO")  # Hubo IDs elegidos por el llamador
+        on_stock_changed(sucursal_id, {prod_id: qty for _, prod_id, qty in inventory})
+        return ids
+
+    def build_inventory_upsert(self, product_id, new_quantity, sucursal_id=None):
+        """(sql, params) que fija el stock de un producto en una sucursal (crea la fila si falta)."""
+        if sucursal_id is None:
+            sucursal_id = CURRENT_NODE["id_sucursal"]
+
+        # Actualiza o crea la fila en un solo viaje (HOLDLOCK evita duplicados concurrentes)
+        query_merge = """
+            MERGE INVENTARIO WITH (HOLDLOCK) AS T
+            USING (SELECT ? AS Id_sucursal, ? AS Id_producto, ? AS cantidad) AS S
+                ON T.Id_sucursal = S.Id_sucursal AND T.Id_producto = S.Id_producto
+            WHEN MATCHED THEN UPDATE SET cantidad = S.cantidad
+            WHEN NOT MATCHED THEN INSERT (Id_sucursal, Id_producto, cantidad)
+                VALUES (S.Id_sucursal, S.Id_producto, S.cantidad);
+        """
+        return query_merge, [sucursal_id, product_id, new_quantity]
+
+    def update_inventory_quantity(self, product_id, new_quantity):
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(*self.build_inventory_upsert(product_id, new_quantity))
+
+            conn.commit()
+        finally:
+            conn.close()
+
+        on_stock_changed(CURRENT_NODE["id_sucursal"], {product_id: new_quantity})
+        return True
+
+    def update_inventory_quantities(self, quantities, sucursal_id=None):
+        """
+        Versión por lote: quantities es {Id_producto: cantidad}.
+        Todo se aplica con un único MERGE (sincronizaciones nocturnas de stock).
+        """
+        if sucursal_id is None:
+            sucursal_id = CURRENT_NODE["id_sucursal"]
+        rows = [
+            {"Id_sucursal": sucursal_id, "Id_producto": prod_id, "cantidad": qty}
+            for prod_id, qty in quantities.items()
+        ]
+        self.upsert_many("INVENTARIO", rows, ["Id_sucursal", "Id_producto"])
+        on_stock_changed(sucursal_id, quantities)
+        return True
             
     def delete_product_secure(self, product_id):
         """Sobrescribe el borrado genérico para manejar cascada manual"""
@@ -73,6 +155,7 @@ class InventoryService(GenericDAO):
             # Borrar producto
             cursor.execute("DELETE FROM PRODUCTO WHERE Id_producto = ?", (product_id,))
             conn.commit()
+            get_stock_cache().invalidate_product(product_id)
             return True
         except Exception as e:
             conn.rollback()
@@ -80,16 +163,143 @@ class InventoryService(GenericDAO):
         finally:
             conn.close()
 
-    def get_product_stock(self, product_id):
+    def delete_products_secure(self, product_ids):
+        """
+        Versión por lote de delete_product_secure: borra inventario y productos
+        con dos DELETE ... JOIN contra una temporal de IDs, en una transacción.
+        Retorna la cantidad de productos borrados.
+        """
+        product_ids = list(dict.fromkeys(product_ids))
+        if not product_ids:
+            return 0
+
         conn = get_db_connection()
-        cursor = conn.cursor()
         try:
-            # Asumiendo que tu tabla es INVENTARIO
-            query = "SELECT cantidad FROM INVENTARIO WHERE Id_producto = ?"
-            cursor.execute(query, (product_id,))
-            row = cursor.fetchone()
-            return row[0] if row else 0
+            cursor = conn.cursor()
+            staging = self._stage_rows(cursor, "PRODUCTO", ["Id_producto"], [[pid] for pid in product_ids])
+            # Dependencias primero, igual que en el borrado individual
+            cursor.execute(f"DELETE I FROM INVENTARIO I JOIN {staging} S ON I.Id_producto = S.Id_producto")
+            cursor.execute(f"DELETE P FROM PRODUCTO P JOIN {staging} S ON P.Id_producto = S.Id_producto")
+            deleted = cursor.rowcount
+            cursor.execute(f"DROP TABLE {staging}")
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(f"Error borrando lote de productos ({len(product_ids)}): {e}")
+            raise e
+        finally:
+            conn.close()
+
+        cache = get_stock_cache()
+        for product_id in product_ids:
+            cache.invalidate_product(product_id)
+        return deleted
+
+    def get_product_stock(self, product_id, sucursal_id=None):
+        """Stock del producto en la sucursal (por defecto, la del nodo actual)."""
+        try:
+            return self.get_stock_bulk([product_id], sucursal_id).get(product_id, 0)
         except Exception:
             return 0
+
+    def get_stock_bulk(self, product_ids, sucursal_id=None):
+        """
+        {Id_producto: cantidad} de varios productos en una sucursal, en un solo viaje.
+        Lo que ya está en la caché de stock no se consulta; un producto sin fila cuenta 0.
+        """
+        if sucursal_id is None:
+            sucursal_id = CURRENT_NODE["id_sucursal"]
+        cache = get_stock_cache()
+        stock, missing = cache.get_many(sucursal_id, list(dict.fromkeys(product_ids)))
+        if not missing:
+            return stock
+
+        generations = cache.load_generations(missing)
+        conn = get_db_connection(read_only=True)
+        try:
+            cursor = conn.cursor()
+            loaded = dict.fromkeys(missing, 0)
+            for part in in_chunks(missing):
+                placeholders = ", ".join(["?"] * len(part))
+                cursor.execute(f"""
+                    SELECT Id_producto, cantidad FROM INVENTARIO
+                    WHERE Id_sucursal = ? AND Id_producto IN ({placeholders})
+                """, [sucursal_id] + part)
+                for prod_id, qty in cursor.fetchall():
+                    loaded[prod_id] = qty
+        finally:
+            conn.close()
+
+        cache.put_loaded(sucursal_id, loaded, generations)
+        stock.update(loaded)
+        return stock
+
+    def get_inventory_summary(self, product_ids=None, low_stock_threshold=LOW_STOCK_THRESHOLD,
+                              with_branches=True):
+        """
+        Stock de la red (todas las sucursales), leído de la vista indexada V_STOCK_PRODUCTO:
+        {
+            "products": [{"id", "nombre", "total", "sucursales", "sin_stock", "por_sucursal": {sucursal: cantidad}}],
+            "total_units": unidades en toda la red (de los productos listados),
+            "low_stock_count": productos con total <= low_stock_threshold (en toda la red)
+        }
+        product_ids limita el listado; with_branches=False omite el desglose por sucursal.
+        """
+        conn = get_db_connection(read_only=True)
+        try:
+            cursor = conn.cursor()
+            try:
+                products, low_count = self._read_summary(cursor, STOCK_SUMMARY_VIEW, product_ids, low_stock_threshold)
+            except pyodbc.ProgrammingError:
+                # Sin la vista (migración no aplicada o réplica sin ella) se agrega al vuelo
+                products, low_count = self._read_summary(cursor, STOCK_SUMMARY_FALLBACK, product_ids, low_stock_threshold)
+
+            if with_branches and products:
+                by_id = {p["id"]: p for p in products}
+                query = "SELECT Id_producto, Id_sucursal, cantidad FROM INVENTARIO"
+                ids = list(by_id) if product_ids is not None else None
+                for part in self._id_chunks(ids):
+                    if part is None:
+                        cursor.execute(query)
+                    else:
+                        placeholders = ", ".join(["?"] * len(part))
+                        cursor.execute(f"{query} WHERE Id_producto IN ({placeholders})", part)
+                    for prod_id, branch_id, qty in cursor.fetchall():
+                        if prod_id in by_id:
+                            by_id[prod_id]["por_sucursal"][branch_id] = qty
         finally:
-            conn.close()
\ No newline at end of file
+            conn.close()
+
+        return {
+            "products": products,
+            "total_units": sum(p["total"] for p in products),
+            "low_stock_count": low_count
+        }
+
+    def _read_summary(self, cursor, source, product_ids, low_stock_threshold):
+        query = f"""
+            SELECT V.Id_producto, P.nombre, V.stock_total, V.sucursales, V.sucursales_sin_stock
+            FROM {source}
+            JOIN PRODUCTO P ON P.Id_producto = V.Id_producto
+        """
+        products = []
+        for part in self._id_chunks(product_ids):
+            if part is None:
+                cursor.execute(query + " ORDER BY V.Id_producto")
+            else:
+                placeholders = ", ".join(["?"] * len(part))
+                cursor.execute(f"{query} WHERE V.Id_producto IN ({placeholders}) ORDER BY V.Id_producto", part)
+            products.extend(
+                {"id": r[0], "nombre": r[1], "total": int(r[2]), "sucursales": int(r[3]),
+                 "sin_stock": int(r[4]), "por_sucursal": {}}
+                for r in cursor.fetchall()
+            )
+
+        cursor.execute(f"SELECT COUNT_BIG(*) FROM {source} WHERE V.stock_total <= ?", (low_stock_threshold,))
+        return products, int(cursor.fetchone()[0])
+
+    def _id_chunks(self, ids):
+        """Bloques de IDs para IN (...); [None] significa "sin filtro"."""
+        if ids is None:
+            return [None]
+        return list(in_chunks(dict.fromkeys(ids)))
@@ -0,0 +1,305 @@
+# backend/services/stock_alerts.py
+
+import threading
+import time
+import pyodbc
+from backend.connection import get_db_connection
+from backend.generic_dao import in_chunks
+from backend.services.stock_cache import get_stock_cache
+from backend.services.catalog_cache import get_catalog_cache
+from backend.config import CURRENT_NODE, LOW_STOCK_THRESHOLD
+
+# Detector con índices: margen <= 0 en la vista indexada (productos con umbral)
+# + rango sobre INVENTARIO.cantidad (productos sin umbral, umbral por defecto)
+LOW_STOCK_QUERY = """
+    SELECT V.Id_producto, V.cantidad, V.umbral
+    FROM dbo.V_STOCK_MARGEN V WITH (NOEXPAND)
+    WHERE V.margen <= 0 AND V.Id_sucursal = ?
+    UNION ALL
+    SELECT I.Id_producto, I.cantidad, ?
+    FROM INVENTARIO I
+    WHERE I.cantidad <= ? AND I.Id_sucursal = ?
+      AND NOT EXISTS (SELECT 1 FROM UMBRAL_STOCK U WHERE U.Id_producto = I.Id_producto)
+"""
+
+# Copia las reglas de UMBRAL_MARCA a los productos de cada marca sin umbral propio:
+# agrega los nuevos, corrige los que cambiaron de regla o de marca y quita los que
+# ya no tienen regla. Los umbrales 'producto' no se tocan.
+BRAND_SYNC_QUERY = """
+    MERGE UMBRAL_STOCK WITH (HOLDLOCK) AS T
+    USING (
+        SELECT P.Id_producto, M.umbral
+        FROM PRODUCTO P JOIN UMBRAL_MARCA M ON M.marca = P.marca
+    ) AS S ON T.Id_producto = S.Id_producto
+    WHEN MATCHED AND T.origen = 'marca' AND T.umbral <> S.umbral THEN UPDATE SET umbral = S.umbral
+    WHEN NOT MATCHED BY TARGET THEN INSERT (Id_producto, umbral, origen) VALUES (S.Id_producto, S.umbral, 'marca')
+    WHEN NOT MATCHED BY SOURCE AND T.origen = 'marca' THEN DELETE;
+"""
+
+# Lo mismo sin la vista (migración no aplicada o réplica sin ella)
+LOW_STOCK_FALLBACK = """
+    SELECT I.Id_producto, I.cantidad, ISNULL(U.umbral, ?)
+    FROM INVENTARIO I
+    LEFT JOIN UMBRAL_STOCK U ON U.Id_producto = I.Id_producto
+    WHERE I.Id_sucursal = ? AND I.cantidad <= ISNULL(U.umbral, ?)
+"""
+
+
+class StockAlertEngine:
+    """
+    Detecta productos en o bajo su umbral de reposición, por sucursal.
+    - scan(): revisión completa con consultas por índice (periódica).
+    - check(): revisión incremental de los productos cuyo stock acaba de cambiar,
+      en memoria, con los umbrales cacheados (sin ir a la BD).
+    Solo se avisa la transición "bien -> bajo": un producto que sigue bajo no se
+    repite hasta que se reponga y vuelva a caer.
+    Los oyentes (subscribe) reciben la lista de alertas nuevas.
+    """
+    def __init__(self, default_threshold=LOW_STOCK_THRESHOLD):
+        self.default_threshold = default_threshold
+        self._lock = threading.Lock()
+        self._thresholds = None   # Id_producto -> umbral (solo los que tienen umbral propio)
+        self._active = {}         # (sucursal, producto) -> alerta vigente
+        self._listeners = []
+        self._use_view = True
+
+    # ------------------------------------------
+    # UMBRALES
+    # ------------------------------------------
+
+    def _load_thresholds(self):
+        conn = get_db_connection(read_only=True)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT Id_producto, umbral FROM UMBRAL_STOCK")
+            return {row[0]: row[1] for row in cursor.fetchall()}
+        except pyodbc.ProgrammingError:
+            return {}  # Tabla aún no creada: todos usan el umbral por defecto
+        finally:
+            conn.close()
+
+    def threshold_for(self, product_id):
+        if self._thresholds is None:
+            thresholds = self._load_thresholds()
+            with self._lock:
+                self._thresholds = thresholds
+        return self._thresholds.get(product_id, self.default_threshold)
+
+    def reload_thresholds(self):
+        thresholds = self._load_thresholds()
+        with self._lock:
+            self._thresholds = thresholds
+
+    def set_product_threshold(self, product_id, threshold):
+        """Umbral propio de un producto (prevalece sobre el de su marca)."""
+        self._write_thresholds("""
+            MERGE UMBRAL_STOCK WITH (HOLDLOCK) AS T
+            USING (SELECT ? AS Id_producto, ? AS umbral) AS S ON T.Id_producto = S.Id_producto
+            WHEN MATCHED THEN UPDATE SET umbral = S.umbral, origen = 'producto'
+            WHEN NOT MATCHED THEN INSERT (Id_producto, umbral, origen) VALUES (S.Id_producto, S.umbral, 'producto');
+        """, (product_id, threshold))
+
+    def set_brand_threshold(self, brand, threshold):
+        """
+        Umbral para los productos de una marca que no tengan uno propio.
+        Queda guardado como regla (UMBRAL_MARCA): alcanza también a los productos
+        que se agreguen a la marca después (ver sync_brand_thresholds).
+        """
+        self._write_thresholds("""
+            MERGE UMBRAL_MARCA WITH (HOLDLOCK) AS T
+            USING (SELECT ? AS marca, ? AS umbral) AS S ON T.marca = S.marca
+            WHEN MATCHED THEN UPDATE SET umbral = S.umbral
+            WHEN NOT MATCHED THEN INSERT (marca, umbral) VALUES (S.marca, S.umbral);
+        """, (brand, threshold), sync_brands=True)
+
+    def clear_product_threshold(self, product_id):
+        """Quita el umbral propio: vuelve al de su marca, si tiene regla, o al por defecto."""
+        self._write_thresholds("DELETE FROM UMBRAL_STOCK WHERE Id_producto = ?", (product_id,),
+                               sync_brands=True)
+
+    def sync_brand_thresholds(self):
+        """
+        Aplica las reglas por marca a los productos actuales (llamar tras crear,
+        borrar o cambiar de marca productos). Retorna las filas de umbral tocadas.
+        """
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(BRAND_SYNC_QUERY)
+            changed = cursor.rowcount
+            conn.commit()
+        except pyodbc.ProgrammingError:
+            conn.rollback()
+            return 0  # UMBRAL_MARCA aún no creada: no hay reglas por marca
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        if changed:
+            self.reload_thresholds()
+        return changed
+
+    def _write_thresholds(self, query, params, sync_brands=False):
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            if sync_brands:
+                cursor.execute(BRAND_SYNC_QUERY)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        self.reload_thresholds()
+
+    # ------------------------------------------
+    # DETECCIÓN
+    # ------------------------------------------
+
+    def scan(self, sucursal_id=None):
+        """
+        Revisión completa de una sucursal (por defecto, la del nodo actual).
+        Retorna todas las alertas vigentes; avisa a los oyentes solo las nuevas.
+        """
+        if sucursal_id is None:
+            sucursal_id = CURRENT_NODE["id_sucursal"]
+        low = self._query_low_stock(sucursal_id)
+        current = {
+            (sucursal_id, prod_id): self._alert(sucursal_id, prod_id, qty, threshold)
+            for prod_id, qty, threshold in low
+        }
+        with self._lock:
+            previous = {k for k in self._active if k[0] == sucursal_id}
+            for key in previous - current.keys():
+                del self._active[key]
+            new = []
+            for key, alert in current.items():
+                if key in self._active:
+                    self._active[key].update(cantidad=alert["cantidad"], umbral=alert["umbral"])
+                else:
+                    self._active[key] = alert
+                    new.append(alert)
+            result = [dict(self._active[key]) for key in current]
+        self._notify(new)
+        return result
+
+    def check(self, sucursal_id, quantities):
+        """
+        Revisión incremental tras un cambio de stock: quantities es {Id_producto: cantidad nueva}.
+        Retorna las alertas nuevas (ya avisadas a los oyentes).
+        """
+        new = []
+        for prod_id, qty in quantities.items():
+            key = (sucursal_id, prod_id)
+            threshold = self.threshold_for(prod_id)
+            with self._lock:
+                if qty is not None and qty <= threshold:
+                    if key not in self._active:
+                        self._active[key] = self._alert(sucursal_id, prod_id, qty, threshold)
+                        new.append(self._active[key])
+                    else:
+                        self._active[key]["cantidad"] = qty
+                else:
+                    self._active.pop(key, None)
+        self._notify(new)
+        return [dict(a) for a in new]
+
+    def get_active_alerts(self, sucursal_id=None):
+        """Alertas vigentes (todas las sucursales o solo una)."""
+        with self._lock:
+            return [dict(a) for k, a in self._active.items() if sucursal_id is None or k[0] == sucursal_id]
+
+    def _alert(self, sucursal_id, product_id, quantity, threshold):
+        return {"sucursal": sucursal_id, "producto": product_id, "cantidad": quantity,
+                "umbral": threshold, "desde": time.time()}
+
+    def _query_low_stock(self, sucursal_id):
+        conn = get_db_connection(read_only=True)
+        try:
+            cursor = conn.cursor()
+            if self._use_view:
+                try:
+                    default = self.default_threshold
+                    cursor.execute(LOW_STOCK_QUERY, (sucursal_id, default, default, sucursal_id))
+                    return cursor.fetchall()
+                except pyodbc.ProgrammingError:
+                    self._use_view = False
+            cursor.execute(LOW_STOCK_FALLBACK, (self.default_threshold, sucursal_id, self.default_threshold))
+            return cursor.fetchall()
+        finally:
+            conn.close()
+
+    def _add_names(self, alerts):
+        """Nombre del producto para mostrar la alerta (una consulta, solo cuando hay alertas nuevas)."""
+        ids = list({a["producto"] for a in alerts})
+        names = {}
+        conn = get_db_connection(read_only=True)
+        try:
+            cursor = conn.cursor()
+            for part in in_chunks(ids):
+                placeholders = ", ".join(["?"] * len(part))
+                cursor.execute(f"SELECT Id_producto, nombre FROM PRODUCTO WHERE Id_producto IN ({placeholders})", part)
+                names.update((row[0], row[1]) for row in cursor.fetchall())
+        except pyodbc.Error:
+            pass
+        finally:
+            conn.close()
+        with self._lock:
+            for alert in alerts:
+                alert["nombre"] = names.get(alert["producto"], f"Producto #{alert['producto']}")
+
+    # ------------------------------------------
+    # OYENTES
+    # ------------------------------------------
+
+    def subscribe(self, callback):
+        """callback(alertas_nuevas) se llama cada vez que aparecen productos con stock bajo."""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def _notify(self, alerts):
+        with self._lock:
+            listeners = list(self._listeners)
+        # Sin oyentes (ej. el proceso web) no se consulta el nombre de los productos
+        if not alerts or not listeners:
+            return
+        self._add_names(alerts)
+        for callback in listeners:
+            try:
+                callback([dict(a) for a in alerts])
+            except Exception as e:
+                print(f"ALERTA: Oyente de stock bajo falló: {e}")
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_stock_alert_engine():
+    """Motor de alertas compartido por el proceso (inventario, carrito web y escritorio)."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = StockAlertEngine()
+    return _engine
+
+def on_stock_changed(sucursal_id, quantities):
+    """
+    Llamar tras confirmar un cambio de stock ({Id_producto: cantidad nueva}):
+    actualiza la caché de stock y el catálogo web, y revisa las alertas de esos productos.
+    """
+    get_stock_cache().put_many(sucursal_id, quantities)
+    get_catalog_cache().patch_stock(sucursal_id, quantities)
+    try:
+        get_stock_alert_engine().check(sucursal_id, quantities)
+    except Exception as e:
+        # El cambio ya está confirmado: una falla al revisar alertas no lo revierte
+        print(f"ALERTA: No se pudieron revisar las alertas de stock: {e}")
@@ -0,0 +1,74 @@
+# backend/services/stock_cache.py
+
+import threading
+from backend.query_cache import QueryCache
+from backend.config import STOCK_CACHE
+
+class StockCache:
+    """
+    Stock por (sucursal, producto) en memoria del proceso.
+    Las escrituras de la app actualizan la entrada al confirmar (write-through);
+    el TTL cubre lo que cambie por fuera (otros procesos, replicación).
+    Usa QueryCache: cada entrada se etiqueta con su producto para poder
+    descartarlo en todas las sucursales de una vez (ej. al borrarlo).
+    Una lectura de la BD toma load_generations() antes de consultar y guarda con
+    put_loaded(): si entretanto llegó un write-through del producto, no lo pisa.
+    """
+    def __init__(self, max_entries=5000, ttl_seconds=10):
+        self._cache = QueryCache(max_entries, ttl_seconds)
+
+    def _tags(self, product_id):
+        return ("INVENTARIO", f"INVENTARIO#{product_id}")
+
+    def get_many(self, branch_id, product_ids):
+        """Retorna ({producto: cantidad} en caché, [productos que faltan])."""
+        found, missing = {}, []
+        for product_id in product_ids:
+            hit, qty = self._cache.get(("stock", branch_id, product_id))
+            if hit:
+                found[product_id] = qty
+            else:
+                missing.append(product_id)
+        return found, missing
+
+    def put(self, branch_id, product_id, quantity):
+        """Write-through tras confirmar: sube la generación del producto (las cargas en curso quedan viejas)."""
+        self._cache.invalidate_table(f"INVENTARIO#{product_id}")
+        self._cache.put(("stock", branch_id, product_id), quantity, self._tags(product_id))
+
+    def put_many(self, branch_id, quantities):
+        for product_id, qty in quantities.items():
+            self.put(branch_id, product_id, qty)
+
+    def load_generations(self, product_ids):
+        """{producto: generación}, a tomar antes de leer su stock de la BD."""
+        return {product_id: self._cache.generation(self._tags(product_id)) for product_id in product_ids}
+
+    def put_loaded(self, branch_id, quantities, generations):
+        """Guarda lo leído de la BD, salvo los productos escritos desde load_generations()."""
+        for product_id, qty in quantities.items():
+            self._cache.put(("stock", branch_id, product_id), qty, self._tags(product_id),
+                            generation=generations[product_id])
+
+    def invalidate_product(self, product_id):
+        """Descarta el stock del producto en todas las sucursales."""
+        self._cache.invalidate_table(f"INVENTARIO#{product_id}")
+
+    def clear(self):
+        self._cache.clear()
+
+    def get_stats(self):
+        return self._cache.get_stats()
+
+
+_stock_cache = None
+_stock_cache_lock = threading.Lock()
+
+def get_stock_cache():
+    """Caché de stock compartida por el proceso (inventario, carrito web y unidad de trabajo)."""
+    global _stock_cache
+    if _stock_cache is None:
+        with _stock_cache_lock:
+            if _stock_cache is None:
+                _stock_cache = StockCache(**STOCK_CACHE)
+    return _stock_cache
@@ -1,10 +1,44 @@
 from datetime import datetime
+import pyodbc
 from backend.connection import get_db_connection
-from backend.config import CURRENT_NODE  # <--- Importante para saber quién soy
+from backend.services.id_allocator import get_id_allocator
+from backend.services.stock_alerts import on_stock_changed
+from backend.services.catalog_cache import get_catalog_cache
+from backend.services.client_cache import get_client_cache
+from backend.config import CURRENT_NODE, MAX_IN_PARAMS  # <--- Importante para saber quién soy
+
+# SQL Server acepta hasta 1000 filas por VALUES (y MAX_IN_PARAMS parámetros)
+MAX_VALUES_ROWS = 1000
+
+def _values_chunks(rows):
+    """
+    Parte filas de igual largo en bloques que caben en una sentencia.
+    Genera ("(?, ?), (?, ?)...", parámetros planos) para usar en VALUES.
+    """
+    per_chunk = min(MAX_VALUES_ROWS, MAX_IN_PARAMS // len(rows[0]))
+    row_sql = "(" + ", ".join(["?"] * len(rows[0])) + ")"
+    for i in range(0, len(rows), per_chunk):
+        part = rows[i:i + per_chunk]
+        yield ", ".join([row_sql] * len(part)), [value for row in part for value in row]
 
 class WebService:
-    def get_catalog(self):
-        conn = get_db_connection()
+    def get_catalog(self, search=None, sucursal_id=None):
+        """
+        Productos con stock de la sucursal (por defecto, la local), desde la foto en memoria.
+        La búsqueda (nombre o marca) también se resuelve sobre la foto.
+        """
+        if sucursal_id is None:
+            sucursal_id = CURRENT_NODE["id_sucursal"]
+        try:
+            return list(get_catalog_cache().search(
+                sucursal_id, lambda: self._load_catalog(sucursal_id), search or ""
+            ))
+        except Exception as e:
+            print(f"Error web catalog: {e}")
+            return []
+
+    def _load_catalog(self, sucursal_id):
+        conn = get_db_connection(read_only=True)
         cursor = conn.cursor()
         
         # Filtramos por Id_sucursal para mostrar SOLO lo que tengo en mi tienda física local
@@ -15,105 +49,32 @@ class WebService:
             WHERE I.cantidad > 0 AND I.Id_sucursal = ?
         """
         try:
-            # Pasamos el ID de la sucursal actual
-            cursor.execute(query, (CURRENT_NODE["id_sucursal"],))
+            cursor.execute(query, (sucursal_id,))
             rows = cursor.fetchall()
             return [
                 {"id": r[0], "nombre": r[1], "marca": r[2], "precio": float(r[3]), "stock": int(r[4])}
                 for r in rows
             ]
-        except Exception as e:
-            print(f"Error web catalog: {e}")
-            return []
         finally:
             conn.close()
             
-    def process_cart_purchase(self, client_id, cart_items):
+    def process_cart_purchase(self, client_id, cart_items, sucursal_id=None):
         """
-        cart_items: Lista de diccionarios [{'id': 1, 'qty': 2}, ...]
+        cart_items: Lista de diccionarios [{'id': 1, 'qty': 2}, ...]; 'precio' opcional
+        es el precio que vio el cliente: si el de la BD es otro, la compra se rechaza.
+        sucursal_id: por defecto, la del nodo actual.
         """
+        if sucursal_id is None:
+            sucursal_id = CURRENT_NODE["id_sucursal"]
         conn = get_db_connection()
         cursor = conn.cursor()
-        sucursal_id = CURRENT_NODE["id_sucursal"]
         
         try:
-            total_factura = 0.0
-            detalles_para_insertar = []
-
-            # 1. VALIDACIÓN PREVIA Y CÁLCULO
-            # Recorremos el carrito para verificar stock y precios antes de tocar nada
-            for item in cart_items:
-                prod_id = item['id']
-                qty_solicitada = item['qty']
-
-                query_check = """
-                    SELECT I.cantidad, P.precio, P.nombre
-                    FROM INVENTARIO I
-                    JOIN PRODUCTO P ON I.Id_producto = P.Id_producto
-                    WHERE I.Id_producto = ? AND I.Id_sucursal = ?
-                """
-                cursor.execute(query_check, (prod_id, sucursal_id))
-                row = cursor.fetchone()
-
-                if not row:
-                    return False, f"Producto ID {prod_id} no disponible."
-                
-                stock_actual = row[0]
-                precio_unitario = float(row[1])
-                nombre_prod = row[2]
-
-                if stock_actual < qty_solicitada:
-                    return False, f"Stock insuficiente para '{nombre_prod}'. Disponibles: {stock_actual}"
-                
-                subtotal = precio_unitario * qty_solicitada
-                total_factura += subtotal
-                
-                # Guardamos datos para la inserción posterior
-                detalles_para_insertar.append({
-                    "prod_id": prod_id,
-                    "qty": qty_solicitada,
-                    "precio": precio_unitario,
-                    "subtotal": subtotal
-                })
-
-            # --- INICIO TRANSACCIÓN ---
-            
-            # 2. Generar Cabecera FACTURA
-            cursor.execute("SELECT MAX(id_factura) FROM FACTURA WHERE id_sucursal = ?", (sucursal_id,))
-            row_max = cursor.fetchone()
-            new_factura_id = (row_max[0] + 1) if row_max and row_max[0] else 1
-            
-            fecha_actual = datetime.now()
-            
-            query_factura = """
-                INSERT INTO FACTURA (id_factura, fecha, total, id_cliente, id_sucursal)
-                VALUES (?, ?, ?, ?, ?)
-            """
-            cursor.execute(query_factura, (new_factura_id, fecha_actual, total_factura, client_id, sucursal_id))
-
-            # 3. Insertar DETALLES y Actualizar STOCK (Bucle de escritura)
-            for det in detalles_para_insertar:
-                # Insertar Detalle
-                query_detalle = """
-                    INSERT INTO DETALLE_FACTURA 
-                    (id_factura, id_producto, id_sucursal, cantidad, precio_unidad, subtotal)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """
-                cursor.execute(query_detalle, (
-                    new_factura_id, det['prod_id'], sucursal_id, 
-                    det['qty'], det['precio'], det['subtotal']
-                ))
-
-                # Restar Inventario
-                query_update = """
-                    UPDATE INVENTARIO 
-                    SET cantidad = cantidad - ? 
-                    WHERE Id_producto = ? AND Id_sucursal = ?
-                """
-                cursor.execute(query_update, (det['qty'], det['prod_id'], sucursal_id))
-
+            ok, message, nuevo_stock = self._checkout(cursor, client_id, cart_items, sucursal_id)
+            if not ok:
+                conn.rollback()
+                return False, message
             conn.commit()
-            return True, f"Compra completada. Factura #{new_factura_id}"
 
         except Exception as e:
             conn.rollback()
@@ -122,26 +83,134 @@ class WebService:
         finally:
             conn.close()
 
+        # Ya con la conexión devuelta (las alertas pueden pedir otra):
+        # el stock que quedó en la BD pasa directo a la caché y a las alertas
+        on_stock_changed(sucursal_id, nuevo_stock)
+        return True, message
+
+    def _checkout(self, cursor, client_id, cart_items, sucursal_id, factura_id=None):
+        """
+        Valida el carrito y registra la factura sobre cursor, sin confirmar.
+        Cada paso es una sola sentencia sobre todo el carrito (no una por producto):
+        descuento de stock condicional, cabecera y detalles.
+        factura_id: por defecto, el siguiente número de la sucursal.
+        Retorna (ok, mensaje, {Id_producto: stock nuevo}); si ok es False el llamador
+        debe revertir (puede haber descontado parte del stock).
+        """
+        # Un producto repetido en el carrito se compra una vez con la suma de cantidades.
+        # Orden por Id_producto: todas las compras bloquean las filas en el mismo orden
+        # y dos carritos con productos en común no se bloquean mutuamente (deadlock)
+        cantidades = {}
+        precios_vistos = {}
+        for item in cart_items:
+            # Una cantidad 0 o negativa pasaría "cantidad >= qty" y sumaría stock
+            if item['qty'] <= 0:
+                return False, "Cantidad inválida.", {}
+            cantidades[item['id']] = cantidades.get(item['id'], 0) + item['qty']
+            if item.get('precio') is not None:
+                precios_vistos.setdefault(item['id'], item['precio'])
+        if not cantidades:
+            return False, "El carrito está vacío.", {}
+        pedido = sorted(cantidades.items())
+
+        # 1. DESCONTAR STOCK (validación y descuento en la misma sentencia, atómica por fila):
+        # solo se actualizan las filas con cantidad >= lo pedido, nunca queda stock negativo.
+        # FORCE ORDER + LOOP JOIN: recorre la lista en orden y toma cada fila en ese orden.
+        # OUTPUT ... INTO una variable de tabla: SQL Server no admite OUTPUT directo al
+        # cliente si INVENTARIO tiene triggers habilitados (replicación, auditoría)
+        descontados = {}
+        for values, params in _values_chunks(pedido):
+            cursor.execute(f"""
+                SET NOCOUNT ON;
+                DECLARE @descontados TABLE (
+                    Id_producto INT PRIMARY KEY, cantidad INT, precio DECIMAL(19, 4), nombre NVARCHAR(MAX)
+                );
+                UPDATE I SET cantidad = I.cantidad - C.qty
+                OUTPUT INSERTED.Id_producto, INSERTED.cantidad, P.precio, P.nombre INTO @descontados
+                FROM (VALUES {values}) AS C (Id_producto, qty)
+                JOIN INVENTARIO I ON I.Id_producto = C.Id_producto AND I.Id_sucursal = ?
+                JOIN PRODUCTO P ON P.Id_producto = C.Id_producto
+                WHERE I.cantidad >= C.qty
+                OPTION (FORCE ORDER, LOOP JOIN);
+                SELECT Id_producto, cantidad, precio, nombre FROM @descontados;
+            """, params + [sucursal_id])
+            descontados.update((row[0], (row[1], row[2], row[3])) for row in cursor.fetchall())
+
+        if len(descontados) < len(pedido):
+            faltantes = [prod_id for prod_id, _ in pedido if prod_id not in descontados]
+            return False, self._stock_error(cursor, faltantes, sucursal_id), {}
+
+        # El catálogo web es una copia en memoria: si el precio cambió desde que el
+        # cliente vio el carrito, no se cobra uno distinto; se refresca la copia
+        cambiados = [nombre for prod_id, (_, precio, nombre) in sorted(descontados.items())
+                     if prod_id in precios_vistos
+                     and round(float(precio), 2) != round(float(precios_vistos[prod_id]), 2)]
+        if cambiados:
+            get_catalog_cache().invalidate(sucursal_id)
+            return False, (f"El precio de {', '.join(repr(n) for n in cambiados)} cambió. "
+                           "Revisa el carrito antes de comprar."), {}
+
+        total_factura = 0.0
+        detalles = []
+        for prod_id, qty in pedido:
+            precio_unitario = float(descontados[prod_id][1])
+            subtotal = precio_unitario * qty
+            total_factura += subtotal
+            detalles.append((prod_id, qty, precio_unitario, subtotal))
+
+        # 2. Generar Cabecera FACTURA (número por sucursal, sin MAX()+1)
+        if factura_id is None:
+            factura_id = get_id_allocator().next_invoice_id(sucursal_id, cursor)
+        cursor.execute("""
+            INSERT INTO FACTURA (id_factura, fecha, total, id_cliente, id_sucursal)
+            VALUES (?, ?, ?, ?, ?)
+        """, (factura_id, datetime.now(), total_factura, client_id, sucursal_id))
+
+        # 3. Insertar DETALLES (un INSERT multi-fila)
+        filas = [(factura_id, prod_id, sucursal_id, qty, precio, subtotal)
+                 for prod_id, qty, precio, subtotal in detalles]
+        for values, params in _values_chunks(filas):
+            cursor.execute(f"""
+                INSERT INTO DETALLE_FACTURA
+                (id_factura, id_producto, id_sucursal, cantidad, precio_unidad, subtotal)
+                VALUES {values}
+            """, params)
+
+        nuevo_stock = {prod_id: qty for prod_id, (qty, _, _) in descontados.items()}
+        return True, f"Compra completada. Factura #{factura_id}", nuevo_stock
+
+    def _stock_error(self, cursor, product_ids, sucursal_id):
+        """Mensaje para el primer producto que no se pudo descontar (solo en el camino de error)."""
+        prod_id = product_ids[0]
+        cursor.execute("""
+            SELECT I.cantidad, P.nombre
+            FROM PRODUCTO P
+            LEFT JOIN INVENTARIO I ON I.Id_producto = P.Id_producto AND I.Id_sucursal = ?
+            WHERE P.Id_producto = ?
+        """, (sucursal_id, prod_id))
+        row = cursor.fetchone()
+        if not row or row[0] is None:
+            return f"Producto ID {prod_id} no disponible."
+        return f"Stock insuficiente para '{row[1]}'. Disponibles: {row[0]}"
+
     def register_client(self, data):
+        cache = get_client_cache()
+        # 1. Verificar si ya existe por correo (caché, luego índice único de correo)
+        _, client = cache.get(data['correo'])
+        if client is not None:
+            return client["id"]  # Ya existe, retornamos su ID
+
         conn = get_db_connection()
         cursor = conn.cursor()
         try:
-            # 1. Verificar si ya existe por correo
-            check_query = "SELECT id_cliente FROM CLIENTE WHERE correo = ?"
-            cursor.execute(check_query, (data['correo'],))
-            row = cursor.fetchone()
-            
-            if row:
-                return row[0]  # Ya existe, retornamos su ID
+            # Un "desconocido" de la caché se confirma igual: pudo registrarse en otra PC
+            existing = self._select_client(cursor, data['correo'])
+            if existing:
+                cache.put(data['correo'], existing)
+                return existing["id"]
 
-            # 2. NUEVO: Calcular el siguiente ID manualmente
-            # Buscamos el ID más alto que exista en la tabla
-            cursor.execute("SELECT MAX(id_cliente) FROM CLIENTE")
-            row_max = cursor.fetchone()
-            
-            # Si row_max[0] es None (tabla vacía), empezamos con el 1
-            # Si tiene un número, le sumamos 1
-            new_id = (row_max[0] + 1) if row_max and row_max[0] is not None else 1
+            # 2. Siguiente ID del contador, en esta misma transacción (sin otra conexión)
+            new_id = get_id_allocator().next_id("CLIENTE", "id_cliente", cursor=cursor)
 
             # 3. Preparar datos (concatenamos nombre y apellido)
             nombre_completo = f"{data['nombre']} {data['apellido']}"
@@ -154,9 +223,19 @@ class WebService:
             """
             values = (new_id, nombre_completo, data['direccion'], data['telefono'], data['correo'], sucursal_id)
             
-            cursor.execute(query, values)
-            conn.commit()
-            
+            try:
+                cursor.execute(query, values)
+                conn.commit()
+            except pyodbc.IntegrityError:
+                # UX_CLIENTE_CORREO: otro registro con el mismo correo ganó la carrera
+                conn.rollback()
+                existing = self._select_client(cursor, data['correo'])
+                if existing is None:
+                    raise
+                cache.put(data['correo'], existing)
+                return existing["id"]
+
+            cache.put(data['correo'], {"id": new_id, "nombre": nombre_completo})
             return new_id
             
         except Exception as e:
@@ -167,20 +246,34 @@ class WebService:
             conn.close()
 
     def login_by_email(self, email):
-        conn = get_db_connection()
+        cache = get_client_cache()
+        hit, user = cache.get(email)
+        if hit:
+            return dict(user) if user else None
+
+        # Primero la réplica; si no lo encuentra puede ser un cliente recién
+        # registrado que aún no se replicó, así que se confirma en el primario
+        user = self._find_client_by_email(email, read_only=True)
+        if not user:
+            user = self._find_client_by_email(email, read_only=False)
+        if user is not False:
+            cache.put(email, user)  # También el "no existe" (entrada negativa)
+        return user or None
+
+    def _find_client_by_email(self, email, read_only):
+        """Cliente, None si no existe o False si la consulta falló (no se cachea)."""
+        conn = get_db_connection(read_only=read_only)
         cursor = conn.cursor()
         try:
-            # Buscamos ID y Nombre usando el correo
-            query = "SELECT id_cliente, nombre FROM CLIENTE WHERE correo = ?"
-            cursor.execute(query, (email,))
-            row = cursor.fetchone()
-            
-            if row:
-                return {"id": row[0], "nombre": row[1]}
-            else:
-                return None
+            return self._select_client(cursor, email)
         except Exception as e:
             print(f"Error en login: {e}")
-            return None
+            return False
         finally:
-            conn.close()
\ No newline at end of file
+            conn.close()
+
+    def _select_client(self, cursor, email):
+        # Búsqueda puntual por el índice único UX_CLIENTE_CORREO (incluye nombre)
+        cursor.execute("SELECT id_cliente, nombre FROM CLIENTE WHERE correo = ?", (email,))
+        row = cursor.fetchone()
+        return {"id": row[0], "nombre": row[1]} if row else None
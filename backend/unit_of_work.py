@@ -0,0 +1,119 @@
+# backend/unit_of_work.py
+
+from backend.connection import get_db_connection
+from backend.services.stock_alerts import on_stock_changed
+from backend.config import CURRENT_NODE
+
+class UnitOfWork:
+    """
+    Junta operaciones de escritura y las confirma juntas: una conexión, una transacción.
+    Las operaciones consecutivas con la misma sentencia SQL viajan en un solo executemany.
+
+    Uso:
+        with manager.unit_of_work() as uow:
+            uow.update("PRODUCTO", datos, "Id_producto", 5)
+            uow.update_inventory_quantity(5, 10)
+        # Al salir del bloque sin errores se hace flush(); con error no se escribe nada.
+    """
+    def __init__(self, dao, inventory_service, on_flush=None, on_product_brands=None):
+        self.dao = dao
+        self.inventory_service = inventory_service
+        self.on_flush = on_flush   # Se llama con las tablas tocadas (ej. invalidar caché)
+        self.on_product_brands = on_product_brands   # Tras crear / borrar / cambiar de marca productos
+        self._brands_changed = False
+        self._ops = []             # [(sql, params)]
+        self._stock = {}           # (sucursal, producto) -> cantidad, para la caché de stock
+        self.tables = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        else:
+            self._ops.clear()
+            self._stock.clear()
+            self._brands_changed = False
+        return False
+
+    # ------------------------------------------
+    # REGISTRO DE OPERACIONES
+    # ------------------------------------------
+
+    def execute(self, sql, params, tables=()):
+        """Agrega una sentencia ya armada (params en el orden de los '?')."""
+        self._ops.append((sql, list(params)))
+        self.tables.update(tables)
+
+    def insert(self, table_name, data_dict):
+        self.execute(*self.dao.build_insert(table_name, data_dict), tables=[table_name])
+        self._brands_changed |= table_name.upper() == "PRODUCTO"
+
+    def update(self, table_name, data_dict, id_column, id_value):
+        self.execute(*self.dao.build_update(table_name, data_dict, id_column, id_value), tables=[table_name])
+        self._brands_changed |= (table_name.upper() == "PRODUCTO"
+                                 and "marca" in {c.lower() for c in data_dict})
+
+    def delete(self, table_name, id_column, id_value):
+        self.execute(*self.dao.build_delete(table_name, id_column, id_value), tables=[table_name])
+        self._brands_changed |= table_name.upper() == "PRODUCTO"
+
+    def update_inventory_quantity(self, product_id, new_quantity, sucursal_id=None):
+        sql, params = self.inventory_service.build_inventory_upsert(product_id, new_quantity, sucursal_id)
+        self.execute(sql, params, tables=["INVENTARIO"])
+        self._stock[(sucursal_id or CURRENT_NODE["id_sucursal"], product_id)] = new_quantity
+
+    # ------------------------------------------
+    # ENVÍO
+    # ------------------------------------------
+
+    def _batches(self):
+        """Agrupa operaciones consecutivas con el mismo SQL (el orden entre grupos se respeta)."""
+        batches = []
+        for sql, params in self._ops:
+            if batches and batches[-1][0] == sql:
+                batches[-1][1].append(params)
+            else:
+                batches.append((sql, [params]))
+        return batches
+
+    def flush(self):
+        """Envía todo en una transacción. Retorna la cantidad de operaciones aplicadas."""
+        if not self._ops:
+            return 0
+
+        batches = self._batches()
+        count = len(self._ops)
+        tables = set(self.tables)
+        brands_changed, self._brands_changed = self._brands_changed, False
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            for sql, param_sets in batches:
+                if len(param_sets) == 1:
+                    cursor.execute(sql, param_sets[0])
+                else:
+                    cursor.fast_executemany = True
+                    cursor.executemany(sql, param_sets)
+                    cursor.fast_executemany = False
+            conn.commit()
+            stock = dict(self._stock)
+        except Exception as e:
+            conn.rollback()
+            print(f"Error en unidad de trabajo ({count} operaciones): {e}")
+            raise e
+        finally:
+            conn.close()
+            self._ops.clear()
+            self._stock.clear()
+            self.tables.clear()
+            if self.on_flush and tables:
+                self.on_flush(*tables)
+
+        # Con la conexión ya devuelta al pool (las alertas pueden pedir otra)
+        if brands_changed and self.on_product_brands:
+            self.on_product_brands()
+        for (branch_id, product_id), qty in stock.items():
+            on_stock_changed(branch_id, {product_id: qty})
+        return count
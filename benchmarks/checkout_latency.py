@@ -0,0 +1,159 @@
+# benchmarks/checkout_latency.py
+"""
+Latencia del checkout web según el tamaño del carrito.
+
+Compara el flujo anterior (una consulta + un INSERT + un UPDATE por producto)
+con WebService._checkout (una sentencia por paso para todo el carrito).
+Cada compra corre dentro de una transacción que se revierte al final:
+no deja facturas, no toca el stock y no consume números de factura.
+Aun así bloquea filas de INVENTARIO mientras dura: corre contra una BD local de
+pruebas con el esquema de TechStore, NUNCA contra la de una sucursal.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.checkout_latency --database TechStore_Pruebas
+    python -m benchmarks.checkout_latency --database TechStore_Pruebas --sizes 1 10 50 --repeat 30
+"""
+
+import argparse
+import statistics
+import time
+from datetime import datetime
+from backend.connection import get_db_connection, use_database
+from backend.services.web_service import WebService
+from backend.config import SERVER_ADDR, NODES
+
+# Número de factura de prueba: nunca se confirma
+BENCH_FACTURA_ID = -1
+
+
+class _CountingCursor:
+    """Cuenta los viajes a la BD (execute / executemany) de una compra."""
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.round_trips = 0
+
+    def execute(self, *args):
+        self.round_trips += 1
+        return self._cursor.execute(*args)
+
+    def executemany(self, *args):
+        self.round_trips += 1
+        return self._cursor.executemany(*args)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def per_item_checkout(cursor, client_id, cart_items, sucursal_id, factura_id):
+    """El checkout como era antes: validación, detalle y stock producto por producto."""
+    total = 0.0
+    detalles = []
+    for item in cart_items:
+        cursor.execute("""
+            SELECT I.cantidad, P.precio, P.nombre
+            FROM INVENTARIO I
+            JOIN PRODUCTO P ON I.Id_producto = P.Id_producto
+            WHERE I.Id_producto = ? AND I.Id_sucursal = ?
+        """, (item['id'], sucursal_id))
+        row = cursor.fetchone()
+        if not row or row[0] < item['qty']:
+            return False
+        subtotal = float(row[1]) * item['qty']
+        total += subtotal
+        detalles.append((item['id'], item['qty'], float(row[1]), subtotal))
+
+    cursor.execute("""
+        INSERT INTO FACTURA (id_factura, fecha, total, id_cliente, id_sucursal)
+        VALUES (?, ?, ?, ?, ?)
+    """, (factura_id, datetime.now(), total, client_id, sucursal_id))
+    for prod_id, qty, precio, subtotal in detalles:
+        cursor.execute("""
+            INSERT INTO DETALLE_FACTURA
+            (id_factura, id_producto, id_sucursal, cantidad, precio_unidad, subtotal)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (factura_id, prod_id, sucursal_id, qty, precio, subtotal))
+        cursor.execute("""
+            UPDATE INVENTARIO SET cantidad = cantidad - ?
+            OUTPUT INSERTED.cantidad
+            WHERE Id_producto = ? AND Id_sucursal = ?
+        """, (qty, prod_id, sucursal_id))
+        cursor.fetchone()
+    return True
+
+
+def set_based_checkout(cursor, client_id, cart_items, sucursal_id, factura_id):
+    ok, _, _ = WebService()._checkout(cursor, client_id, cart_items, sucursal_id, factura_id)
+    return ok
+
+
+def _pick_fixture(max_size, sucursal_id):
+    """Un cliente cualquiera y max_size productos con stock en la sucursal."""
+    conn = get_db_connection(read_only=True)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT TOP 1 id_cliente FROM CLIENTE ORDER BY id_cliente")
+        client = cursor.fetchone()
+        cursor.execute("""
+            SELECT TOP (?) Id_producto FROM INVENTARIO
+            WHERE Id_sucursal = ? AND cantidad > 0
+            ORDER BY Id_producto
+        """, (max_size, sucursal_id))
+        products = [row[0] for row in cursor.fetchall()]
+    finally:
+        conn.close()
+    if client is None:
+        raise SystemExit("Se necesita al menos un cliente registrado.")
+    return client[0], products
+
+
+def measure(checkout, client_id, cart_items, sucursal_id, repeat):
+    """Retorna (latencias en ms, viajes por compra)."""
+    timings = []
+    round_trips = 0
+    for _ in range(repeat):
+        conn = get_db_connection()
+        try:
+            cursor = _CountingCursor(conn.cursor())
+            start = time.perf_counter()
+            if not checkout(cursor, client_id, cart_items, sucursal_id, BENCH_FACTURA_ID):
+                raise SystemExit("El carrito de prueba no pasó la validación (¿stock cambió?).")
+            timings.append((time.perf_counter() - start) * 1000)
+            round_trips = cursor.round_trips
+        finally:
+            conn.rollback()
+            conn.close()
+    return timings, round_trips
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Latencia del checkout web vs. tamaño del carrito.")
+    parser.add_argument("--database", required=True, help="BD de pruebas (no la de una sucursal)")
+    parser.add_argument("--server", default=SERVER_ADDR)
+    parser.add_argument("--sucursal", type=int, default=2)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 5, 10, 20, 50, 100])
+    parser.add_argument("--repeat", type=int, default=20, help="Compras por tamaño y variante")
+    args = parser.parse_args(argv)
+
+    if args.database in {node["db_name"] for node in NODES.values()}:
+        raise SystemExit(f"{args.database} es la BD de una sucursal; usa una copia de pruebas.")
+    use_database(args.database, args.server)
+
+    sucursal_id = args.sucursal
+    client_id, products = _pick_fixture(max(args.sizes), sucursal_id)
+
+    print(f"Sucursal {sucursal_id} | {args.repeat} compras por medición (revertidas)")
+    print(f"{'items':>6} | {'variante':<12} | {'viajes':>6} | {'mediana ms':>10} | {'p95 ms':>8}")
+    for size in args.sizes:
+        if size > len(products):
+            print(f"{size:>6} | solo hay {len(products)} productos con stock, se omite")
+            continue
+        cart = [{"id": prod_id, "qty": 1} for prod_id in products[:size]]
+        for name, checkout in (("por producto", per_item_checkout), ("por lote", set_based_checkout)):
+            timings, round_trips = measure(checkout, client_id, cart, sucursal_id, args.repeat)
+            p95 = sorted(timings)[max(0, int(len(timings) * 0.95) - 1)]
+            print(f"{size:>6} | {name:<12} | {round_trips:>6} | "
+                  f"{statistics.median(timings):>10.2f} | {p95:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
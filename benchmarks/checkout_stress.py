@@ -0,0 +1,224 @@
+# benchmarks/checkout_stress.py
+"""
+Prueba de carga del checkout web: cientos de compras concurrentes sobre pocos
+productos, para comprobar que el stock nunca queda negativo ni se vende de más.
+
+Corre contra una BD local de pruebas con el esquema de TechStore (ej. una copia
+restaurada en un SQL Server local), NUNCA contra la de una sucursal: fija el stock
+de los productos elegidos al inicio y lo restaura al final.
+Cada compra pasa por el camino real: WebService.process_cart_purchase, el pool de
+conexiones (apuntado a la BD de pruebas), el contador de facturas y on_stock_changed.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.checkout_stress --database TechStore_Pruebas
+    python -m benchmarks.checkout_stress --database TechStore_Pruebas --checkouts 1000 --threads 64 --stock 40
+
+Reporta compras por segundo, confirmadas, rechazadas por stock, abortadas
+(deadlocks, pool agotado u otros errores), las esperas y timeouts del pool
+y las violaciones de invariantes:
+- ningún INVENTARIO.cantidad negativo;
+- stock inicial - stock final = unidades en DETALLE_FACTURA de la prueba
+  = unidades de las compras confirmadas;
+- facturas de la prueba = compras confirmadas, con números correlativos.
+"""
+
+import argparse
+import random
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from backend.connection import get_db_connection, get_pool_stats, use_database
+from backend.services.web_service import WebService
+from backend.config import SERVER_ADDR, NODES
+
+
+def _invoice_key(sucursal_id):
+    return f"FACTURA.id_factura@id_sucursal={sucursal_id}"
+
+
+def _setup(args):
+    """
+    Elige los productos, guarda su stock original y lo fija en args.stock.
+    Retorna (cliente, {producto: stock original}, última factura, contador original).
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT TOP 1 id_cliente FROM CLIENTE ORDER BY id_cliente")
+        client = cursor.fetchone()
+        cursor.execute("""
+            SELECT TOP (?) Id_producto, cantidad FROM INVENTARIO
+            WHERE Id_sucursal = ? ORDER BY Id_producto
+        """, (args.products, args.sucursal))
+        original = {row[0]: row[1] for row in cursor.fetchall()}
+        if client is None or len(original) < args.products:
+            raise SystemExit("La BD de pruebas necesita al menos un cliente y "
+                             f"{args.products} productos en la sucursal {args.sucursal}.")
+        cursor.execute("SELECT ISNULL(MAX(id_factura), 0) FROM FACTURA WHERE id_sucursal = ?", (args.sucursal,))
+        last_invoice = cursor.fetchone()[0]
+        cursor.execute("SELECT ultimo_id FROM ID_CONTADOR WHERE clave = ?", (_invoice_key(args.sucursal),))
+        row = cursor.fetchone()
+        cursor.executemany("UPDATE INVENTARIO SET cantidad = ? WHERE Id_producto = ? AND Id_sucursal = ?",
+                           [(args.stock, prod_id, args.sucursal) for prod_id in original])
+        conn.commit()
+        return client[0], original, last_invoice, row[0] if row else None
+    finally:
+        conn.close()
+
+
+def _worker(args, client_id, product_ids, seed, results, lock):
+    """Una compra: carrito al azar de 1..max_items productos, como la hace la tienda web."""
+    rng = random.Random(seed)
+    cart = [{"id": prod_id, "qty": rng.randint(1, args.max_qty)}
+            for prod_id in rng.sample(product_ids, rng.randint(1, args.max_items))]
+    start = time.perf_counter()
+    error = None
+    try:
+        ok, message = WebService().process_cart_purchase(client_id, cart, sucursal_id=args.sucursal)
+        if ok:
+            outcome = "confirmadas"
+        elif message.startswith("Error del sistema"):
+            # Deadlock, timeout de bloqueo...: la compra se revierte entera
+            outcome, error = "abortadas", message.split(":", 1)[-1].strip()[:60]
+        else:
+            outcome = "rechazadas"
+    except Exception as e:
+        # Ej. TimeoutError del pool: no llegó a tener conexión
+        outcome, error = "abortadas", type(e).__name__
+    elapsed = (time.perf_counter() - start) * 1000
+    with lock:
+        results[outcome] += 1
+        results["latencias"].append(elapsed)
+        if error:
+            results["errores"][error] += 1
+        if outcome == "confirmadas":
+            for item in cart:
+                results["vendido"][item["id"]] += item["qty"]
+
+
+def _check_invariants(args, product_ids, sold, last_invoice, confirmed):
+    """Compara el stock final con lo vendido y lo facturado; retorna la lista de violaciones."""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        placeholders = ", ".join(["?"] * len(product_ids))
+        cursor.execute(f"""
+            SELECT Id_producto, cantidad FROM INVENTARIO
+            WHERE Id_sucursal = ? AND Id_producto IN ({placeholders})
+        """, [args.sucursal] + product_ids)
+        final = {row[0]: row[1] for row in cursor.fetchall()}
+        cursor.execute(f"""
+            SELECT id_producto, SUM(cantidad) FROM DETALLE_FACTURA
+            WHERE id_factura > ? AND id_sucursal = ? AND id_producto IN ({placeholders})
+            GROUP BY id_producto
+        """, [last_invoice, args.sucursal] + product_ids)
+        billed = {row[0]: row[1] for row in cursor.fetchall()}
+        cursor.execute("""
+            SELECT COUNT(*), ISNULL(MIN(id_factura), 0), ISNULL(MAX(id_factura), 0)
+            FROM FACTURA WHERE id_factura > ? AND id_sucursal = ?
+        """, (last_invoice, args.sucursal))
+        invoices, first, last = cursor.fetchone()
+    finally:
+        conn.close()
+
+    violations = []
+    for prod_id in product_ids:
+        qty = final.get(prod_id)
+        if qty is None or qty < 0:
+            violations.append(f"Producto {prod_id}: stock final {qty}")
+            continue
+        if args.stock - qty != billed.get(prod_id, 0):
+            violations.append(f"Producto {prod_id}: bajó {args.stock - qty}, facturado {billed.get(prod_id, 0)}")
+        if args.stock - qty != sold[prod_id]:
+            violations.append(f"Producto {prod_id}: bajó {args.stock - qty}, confirmado {sold[prod_id]}")
+    if invoices != confirmed:
+        violations.append(f"{invoices} facturas para {confirmed} compras confirmadas")
+    elif invoices and last - first + 1 != invoices:
+        violations.append(f"Números de factura con huecos: {first}..{last} para {invoices} facturas")
+    return violations
+
+
+def _cleanup(args, original, last_invoice, counter):
+    """Borra las facturas de la prueba y devuelve el stock y el contador de facturas originales."""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM DETALLE_FACTURA WHERE id_factura > ? AND id_sucursal = ?",
+                       (last_invoice, args.sucursal))
+        cursor.execute("DELETE FROM FACTURA WHERE id_factura > ? AND id_sucursal = ?",
+                       (last_invoice, args.sucursal))
+        cursor.executemany("UPDATE INVENTARIO SET cantidad = ? WHERE Id_producto = ? AND Id_sucursal = ?",
+                           [(qty, prod_id, args.sucursal) for prod_id, qty in original.items()])
+        if counter is None:
+            cursor.execute("DELETE FROM ID_CONTADOR WHERE clave = ?", (_invoice_key(args.sucursal),))
+        else:
+            cursor.execute("UPDATE ID_CONTADOR SET ultimo_id = ? WHERE clave = ?",
+                           (counter, _invoice_key(args.sucursal)))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compras concurrentes contra una BD local de pruebas.")
+    parser.add_argument("--database", required=True, help="BD de pruebas (no la de una sucursal)")
+    parser.add_argument("--server", default=SERVER_ADDR)
+    parser.add_argument("--sucursal", type=int, default=2)
+    parser.add_argument("--checkouts", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--products", type=int, default=8, help="Pocos productos = más contención")
+    parser.add_argument("--stock", type=int, default=50, help="Stock inicial de cada producto")
+    parser.add_argument("--max-items", type=int, default=4)
+    parser.add_argument("--max-qty", type=int, default=3)
+    parser.add_argument("--keep", action="store_true", help="No borrar facturas ni restaurar el stock")
+    args = parser.parse_args(argv)
+
+    if args.database in {node["db_name"] for node in NODES.values()}:
+        raise SystemExit(f"{args.database} es la BD de una sucursal; usa una copia de pruebas.")
+    args.max_items = min(args.max_items, args.products)
+    use_database(args.database, args.server)
+
+    client_id, original, last_invoice, counter = _setup(args)
+    product_ids = list(original)
+    results = {"confirmadas": 0, "rechazadas": 0, "abortadas": 0, "latencias": [],
+               "vendido": {prod_id: 0 for prod_id in product_ids},
+               "errores": Counter()}
+    lock = threading.Lock()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        for seed in range(args.checkouts):
+            executor.submit(_worker, args, client_id, product_ids, seed, results, lock)
+    seconds = time.perf_counter() - start
+
+    pool = get_pool_stats("primary")
+    violations = _check_invariants(args, product_ids, results["vendido"], last_invoice,
+                                   results["confirmadas"])
+    if not args.keep:
+        _cleanup(args, original, last_invoice, counter)
+
+    latencies = sorted(results["latencias"])
+    print(f"{args.checkouts} compras en {seconds:.2f} s con {args.threads} hilos "
+          f"({args.checkouts / seconds:.1f} compras/s)")
+    print(f"Confirmadas {results['confirmadas']} | rechazadas por stock {results['rechazadas']} | "
+          f"abortadas {results['abortadas']}")
+    if results["errores"]:
+        print("Errores: " + ", ".join(f"{code} x{n}" for code, n in results["errores"].most_common()))
+    print(f"Pool (max {pool['max_size']}): esperas {pool['waits']} ({pool['wait_seconds']:.2f} s) | "
+          f"timeouts {pool['timeouts']} | conexiones creadas {pool['creates']}")
+    if latencies:
+        print(f"Latencia mediana {statistics.median(latencies):.1f} ms | "
+              f"p95 {latencies[max(0, int(len(latencies) * 0.95) - 1)]:.1f} ms")
+    if violations:
+        print(f"VIOLACIONES DE INVARIANTES ({len(violations)}):")
+        for v in violations:
+            print(f"  - {v}")
+        raise SystemExit(1)
+    print("Invariantes OK: sin stock negativo, lo descontado coincide con lo facturado "
+          "y las facturas son correlativas.")
+
+
+if __name__ == "__main__":
+    main()
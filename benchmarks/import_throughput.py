@@ -0,0 +1,132 @@
+# benchmarks/import_throughput.py
+"""
+Filas por segundo de ImportService.import_csv (SQL Server + fast_executemany).
+
+Genera un CSV sintético para la tabla (valores según los tipos del catálogo, FK
+tomadas de filas existentes, claves a partir del MAX actual), lo importa y mide.
+--bad-every N repite la clave de una fila cada N, para medir el costo de aislar
+rechazos dentro de los bloques.
+
+Corre contra una BD local de pruebas, NUNCA contra la de una sucursal; al terminar
+borra las filas importadas (salvo --keep).
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.import_throughput --database TechStore_Pruebas
+    python -m benchmarks.import_throughput --database TechStore_Pruebas --rows 50000 --bad-every 1000
+"""
+
+import argparse
+import csv
+import os
+import tempfile
+from datetime import datetime
+from backend.connection import get_db_connection, use_database
+from backend.schema_catalog import (get_schema_catalog, INT_TYPES, DECIMAL_TYPES, FLOAT_TYPES,
+                                    TEXT_TYPES, DATETIME_TYPES)
+from backend.services.import_service import ImportService
+from backend.config import SERVER_ADDR, NODES, BULK_CHUNK_SIZE
+
+
+def _sample_values(table_name, pk):
+    """Un valor existente por cada FK de la tabla y el MAX actual de la clave."""
+    catalog = get_schema_catalog()
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        refs = {}
+        for fk in catalog.foreign_keys(table_name):
+            cursor.execute(f"SELECT TOP 1 {fk['ref_column']} FROM {fk['ref_table']}")
+            row = cursor.fetchone()
+            if row is None:
+                raise SystemExit(f"{fk['ref_table']} está vacía: no hay valor para {fk['column']}.")
+            refs[fk["column"]] = row[0]
+        cursor.execute(f"SELECT ISNULL(MAX({pk}), 0) FROM {table_name}")
+        return refs, cursor.fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _value(col, i):
+    col_type = col["type"]
+    if col_type in INT_TYPES:
+        return 1
+    if col_type in DECIMAL_TYPES or col_type in FLOAT_TYPES:
+        return "9.99"
+    if col_type == "bit":
+        return "0"
+    if col_type in DATETIME_TYPES or col_type == "date":
+        return datetime.now().strftime("%Y-%m-%d")
+    if col_type == "time":
+        return "12:00:00"
+    if col_type in TEXT_TYPES:
+        text = f"bench {i}"
+        max_length = col["max_length"]
+        return text[:max_length] if max_length and max_length > 0 else text
+    return ""
+
+
+def write_csv(path, table_name, pk, rows, bad_every):
+    """Retorna el primer ID generado (las claves son consecutivas desde ahí)."""
+    catalog = get_schema_catalog()
+    columns = [catalog.column_info(table_name, c) for c in catalog.columns(table_name)]
+    refs, max_id = _sample_values(table_name, pk)
+    first_id = max_id + 1
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow([c["name"] for c in columns])
+        for i in range(rows):
+            key = first_id + i
+            if bad_every and i and i % bad_every == 0:
+                key -= 1  # Clave repetida: la BD la rechaza
+            writer.writerow([
+                key if c["name"] == pk else refs.get(c["name"], _value(c, i))
+                for c in columns
+            ])
+    return first_id
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rendimiento de la importación CSV.")
+    parser.add_argument("--database", required=True, help="BD de pruebas (no la de una sucursal)")
+    parser.add_argument("--server", default=SERVER_ADDR)
+    parser.add_argument("--table", default="PRODUCTO")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--chunk-size", type=int, default=BULK_CHUNK_SIZE)
+    parser.add_argument("--bad-every", type=int, default=0, help="Una clave repetida cada N filas")
+    parser.add_argument("--keep", action="store_true", help="No borrar las filas importadas")
+    args = parser.parse_args(argv)
+
+    if args.database in {node["db_name"] for node in NODES.values()}:
+        raise SystemExit(f"{args.database} es la BD de una sucursal; usa una copia de pruebas.")
+    use_database(args.database, args.server)
+
+    table = args.table.upper()
+    pk = get_schema_catalog().load().primary_key(table)
+    if len(pk) != 1 or get_schema_catalog().column_info(table, pk[0])["type"] not in INT_TYPES:
+        raise SystemExit(f"{table} no tiene una clave entera simple; elige otra tabla.")
+    pk = pk[0]
+
+    workdir = tempfile.mkdtemp(prefix="import_bench_")
+    path = os.path.join(workdir, f"{table.lower()}.csv")
+    first_id = write_csv(path, table, pk, args.rows, args.bad_every)
+    try:
+        result = ImportService().import_csv(table, path, chunk_size=args.chunk_size)
+    finally:
+        if not args.keep:
+            conn = get_db_connection()
+            try:
+                cursor = conn.cursor()
+                cursor.execute(f"DELETE FROM {table} WHERE {pk} >= ?", (first_id,))
+                conn.commit()
+            finally:
+                conn.close()
+
+    print(f"{table}: {result['read']} filas en {result['seconds']:.2f} s "
+          f"({result['rows_per_second']:.0f} filas/s, bloques de {args.chunk_size})")
+    print(f"Insertadas {result['inserted']} | rechazadas {result['rejected']}")
+    if result["reject_path"]:
+        print(f"Rechazos en {result['reject_path']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# benchmarks/routing_check.py
+"""
+Comprueba el enrutamiento de lecturas de get_db_connection contra dos BD locales
+de pruebas que hacen de primario y de réplica (ej. dos copias vacías de TechStore
+en un SQL Server local), NUNCA contra las de las sucursales:
+
+- una lectura (read_only=True) va a la réplica; una escritura, al primario;
+- tras un commit, el hilo lee del primario durante sticky_seconds y luego vuelve
+  a la réplica; read_from_primary() fuerza el primario;
+- con la réplica caída (servidor inalcanzable), la primera lectura espera el
+  timeout de login y cae al primario; las siguientes van directo al primario
+  (cortocircuito) hasta que vence replica_retry_seconds.
+
+Cada lectura pregunta SELECT DB_NAME() para saber qué BD la atendió.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.routing_check --primary TechStore_Pruebas_A --replica TechStore_Pruebas_B
+    python -m benchmarks.routing_check --primary A --replica B --down-server 127.0.0.1,1
+"""
+
+import argparse
+import time
+from backend.connection import (get_db_connection, get_routing_stats, read_from_primary,
+                                close_pool)
+from backend.config import SERVER_ADDR, NODES, ROUTING
+
+PRIMARY_NODE = "_PRUEBA_PRIMARIO"
+REPLICA_NODE = "_PRUEBA_REPLICA"
+
+
+def _read_db():
+    """Retorna (BD que atendió la lectura, segundos hasta tener la conexión)."""
+    start = time.perf_counter()
+    conn = get_db_connection(read_only=True)
+    elapsed = time.perf_counter() - start
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT DB_NAME()")
+        return cursor.fetchone()[0], elapsed
+    finally:
+        conn.close()
+
+
+def _commit_on_primary():
+    conn = get_db_connection()
+    try:
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _configure(args, replica_server):
+    """Apunta los roles a las BD de pruebas y reinicia pools y cortocircuito."""
+    NODES[PRIMARY_NODE] = {"db_name": args.primary, "server": args.server}
+    NODES[REPLICA_NODE] = {"db_name": args.replica, "server": replica_server}
+    ROUTING.update(enabled=True, primary=PRIMARY_NODE, replica=REPLICA_NODE,
+                   sticky_seconds=args.sticky, replica_retry_seconds=args.retry)
+    close_pool()
+
+
+def run_checks(args):
+    """Retorna la lista de (descripción, ok, detalle)."""
+    results = []
+
+    def check(name, ok, detail=""):
+        results.append((name, ok, detail))
+
+    _configure(args, args.server)
+    db, _ = _read_db()
+    check("Lectura sin escrituras previas -> réplica", db == args.replica, db)
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT DB_NAME()")
+        db = cursor.fetchone()[0]
+    finally:
+        conn.close()
+    check("Conexión de escritura -> primario", db == args.primary, db)
+
+    _commit_on_primary()
+    db, _ = _read_db()
+    check("Lectura justo después de un commit -> primario", db == args.primary, db)
+    time.sleep(args.sticky + 0.2)
+    db, _ = _read_db()
+    check(f"Lectura pasados {args.sticky}s del commit -> réplica", db == args.replica, db)
+
+    with read_from_primary():
+        db, _ = _read_db()
+    check("Lectura dentro de read_from_primary() -> primario", db == args.primary, db)
+
+    _configure(args, args.down_server)
+    db, first = _read_db()
+    check("Réplica caída: la lectura cae al primario", db == args.primary, f"{db}, {first:.2f}s")
+    db, second = _read_db()
+    check("Réplica caída: la siguiente lectura no la reintenta",
+          db == args.primary and second < 0.5, f"{db}, {second:.2f}s")
+    stats = get_routing_stats()
+    check("Estadísticas: 1 falla, lecturas desviadas por el cortocircuito",
+          stats["replica_down"] and stats["replica_failures"] == 1 and stats["replica_skips"] >= 1,
+          f"fallas {stats['replica_failures']}, desviadas {stats['replica_skips']}")
+    time.sleep(args.retry + 0.2)
+    db, _ = _read_db()
+    stats = get_routing_stats()
+    check(f"Pasados {args.retry}s se vuelve a probar la réplica",
+          db == args.primary and stats["replica_failures"] == 2, f"fallas {stats['replica_failures']}")
+    close_pool()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Enrutamiento primario / réplica contra BD de pruebas.")
+    parser.add_argument("--primary", required=True, help="BD de pruebas que hace de primario")
+    parser.add_argument("--replica", required=True, help="BD de pruebas que hace de réplica")
+    parser.add_argument("--server", default=SERVER_ADDR)
+    parser.add_argument("--down-server", default="127.0.0.1,1",
+                        help="Servidor inalcanzable para simular la réplica caída")
+    parser.add_argument("--sticky", type=float, default=1.0, help="sticky_seconds de la prueba")
+    parser.add_argument("--retry", type=float, default=2.0, help="replica_retry_seconds de la prueba")
+    args = parser.parse_args(argv)
+
+    branch_dbs = {node["db_name"] for node in NODES.values()}
+    if args.primary in branch_dbs or args.replica in branch_dbs:
+        raise SystemExit("Usa copias de pruebas, no las BD de las sucursales.")
+    if args.primary == args.replica:
+        raise SystemExit("Primario y réplica deben ser BD distintas para distinguir quién atiende.")
+
+    results = run_checks(args)
+    for name, ok, detail in results:
+        print(f"{'OK   ' if ok else 'FALLA'} {name}" + (f" ({detail})" if detail else ""))
+    failed = sum(1 for _, ok, _ in results if not ok)
+    if failed:
+        print(f"{failed} de {len(results)} comprobaciones fallaron.")
+        raise SystemExit(1)
+    print(f"Enrutamiento OK ({len(results)} comprobaciones).")
+
+
+if __name__ == "__main__":
+    main()
@@ -39,10 +39,21 @@ class BasePage(QWidget):
         
         self.layout.addWidget(self.table)
 
-        # 3. FOOTER (Status)
+        # 3. FOOTER (Status + Paginación)
+        footer = QHBoxLayout()
         self.lbl_status = QLabel("Listo")
         self.lbl_status.setObjectName("Badge")
-        self.layout.addWidget(self.lbl_status)
+
+        self.btn_load_more = QPushButton("Cargar más")
+        self.btn_load_more.setStyleSheet(STYLES["btn_outlined"])
+        self.btn_load_more.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.btn_load_more.clicked.connect(self.on_load_more_click)
+        self.btn_load_more.hide()
+
+        footer.addWidget(self.lbl_status)
+        footer.addStretch()
+        footer.addWidget(self.btn_load_more)
+        self.layout.addLayout(footer)
 
         pass
 
@@ -98,6 +109,9 @@ class BasePage(QWidget):
     def on_add_click(self):
         pass
 
+    def on_load_more_click(self):
+        pass
+
     def set_title(self, title):
         self.lbl_title.setText(title)
 
@@ -223,5 +237,7 @@ class BasePage(QWidget):
 
     def on_refresh_click(self):
         """Recarga los datos y avisa si salió bien"""
+        # El usuario pidió datos frescos: saltamos la caché de lecturas
+        self.manager.invalidate_cache(self.current_table)
         if self.load_data(self.current_table):
             self.show_info("Actualizado", "Los datos se han recargado correctamente.")
\ No newline at end of file
@@ -53,12 +53,11 @@ class ProductsPage(TablePage):
                 # Separar cantidad
                 qty = new_data.pop("cantidad_inicial", None)
                 
-                # Actualizar Producto
-                self.manager.update_data("PRODUCTO", new_data, id_col_name, row_id)
-                
-                # Actualizar Inventario
-                if qty is not None:
-                    self.manager.update_inventory_quantity(row_id, qty)
+                # Producto + Inventario en una sola transacción (todo o nada)
+                with self.manager.unit_of_work() as uow:
+                    uow.update("PRODUCTO", new_data, id_col_name, row_id)
+                    if qty is not None:
+                        uow.update_inventory_quantity(row_id, qty)
                 
                 self.refresh()
                 self.show_success("Actualización Exitosa", "Los datos del producto y stock han sido guardados.")
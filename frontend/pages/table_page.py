@@ -1,7 +1,7 @@
 # frontend/pages/table_page.py
 
 from PyQt6.QtWidgets import (QMessageBox, QDialog, QTableWidgetItem, QWidget, QHBoxLayout, QPushButton)
-from PyQt6.QtCore import QSize, Qt
+from PyQt6.QtCore import QSize, Qt, QTimer
 from .base_page import BasePage
 from frontend.forms import EmployeeForm, ProductForm, SucursalForm
 from frontend.utils import get_icon
@@ -12,6 +12,21 @@ class TablePage(BasePage):
         self.table_name = table_name
         self.enable_actions = enable_actions
 
+        # Estado de la paginación por clave
+        self.columns = []
+        self.id_col_name = None
+        self.next_key = None
+        self.total_rows = 0
+        # Token de Change Tracking del último refresco completo (None = no hay)
+        self.change_token = None
+
+        # Búsqueda en servidor con debounce (una consulta al dejar de escribir)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(300)
+        self.search_timer.timeout.connect(self._apply_search)
+        self.combo_columns.currentIndexChanged.connect(self.filter_data)
+
         self.set_title(f"Gestión de {table_name.capitalize()}")
 
         if self.enable_actions and self.table_name in ["EMPLEADO", "PRODUCTO", "SUCURSAL"]:
@@ -25,46 +40,199 @@ class TablePage(BasePage):
 
     def load_data(self, table_name):
         self.current_table = table_name
+        # La página puede venir de la caché: el próximo refresco será completo
+        self.change_token = None
+        # Limpiamos sin disparar la búsqueda (la carga ya trae la primera página)
+        self.txt_search.blockSignals(True)
         self.txt_search.clear()
+        self.txt_search.blockSignals(False)
         
         try:
-            columns, rows = self.manager.fetch_table_data(table_name)
+            self._load_first_page(table_name, with_total=True)
 
-            display_columns = columns
-            if self.enable_actions:
-                display_columns = columns + ["Acciones"]
+            self.combo_columns.blockSignals(True)
+            self.combo_columns.clear()
+            self.combo_columns.addItem("Todo")
+            self.combo_columns.addItems(self.columns)
+            self.combo_columns.blockSignals(False)
+            return True
             
-            self.table.setColumnCount(len(display_columns))
-            self.table.setHorizontalHeaderLabels(display_columns)
-            self.table.verticalHeader().setDefaultSectionSize(40)
-            self.table.setRowCount(0)
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Error cargando tabla: {e}")
+            return False
 
-            # Asumimos que ID es la primera columna
-            if columns:
-                id_col_name = columns[0] 
+    def _load_first_page(self, table_name, with_total=True):
+        # Solo la primera página; el resto se pide con "Cargar más"
+        page = self.manager.fetch_table_page(table_name, with_total=with_total, **self._search_params())
+        columns = page["columns"]
+        self.columns = columns
 
-            for row_idx, row_data in enumerate(rows):
-                self.table.insertRow(row_idx)
-                
-                row_id = row_data[0] 
-                
-                # 1. Llenar datos normales
-                for col_idx, data in enumerate(row_data):
-                    val = str(data) if data is not None else ""
-                    self.table.setItem(row_idx, col_idx, QTableWidgetItem(val))
+        # La PK sale del catálogo de esquema (ya no asumimos la primera columna)
+        key_cols = self.manager.get_primary_key(table_name)
+        self.id_col_name = key_cols[0] if key_cols else columns[0]
+        self.next_key = page["next_key"]
+        self.total_rows = page["total"]
 
-                # 2. Agregar botones SOLO si está activado
-                if self.enable_actions:
-                    self._add_action_buttons(row_idx, len(columns), id_col_name, row_id, row_data, columns)
+        display_columns = columns
+        if self.enable_actions:
+            display_columns = columns + ["Acciones"]
+        
+        self.table.setColumnCount(len(display_columns))
+        self.table.setHorizontalHeaderLabels(display_columns)
+        self.table.verticalHeader().setDefaultSectionSize(40)
+        self.table.setRowCount(0)
 
-            self.lbl_status.setText(f"{len(rows)} registros cargados.")
-            
-            self.combo_columns.clear()
-            self.combo_columns.addItem("Todo")
-            self.combo_columns.addItems(columns)
-            
+        self._append_rows(page["rows"])
+        self._update_page_status()
+
+    def _search_params(self):
+        """Texto del buscador y columna elegida, para que SQL Server haga el filtrado"""
+        text = self.txt_search.text().strip()
+        if not text:
+            return {}
+        col_idx = self.combo_columns.currentIndex() # 0 es "Todo"
+        if col_idx > 0:
+            return {"search": text, "search_columns": [self.combo_columns.currentText()]}
+        return {"search": text}
+
+    def filter_data(self):
+        """La búsqueda se hace en el servidor; esperamos a que el usuario deje de escribir"""
+        self.search_timer.start()
+
+    def _apply_search(self):
+        try:
+            self._load_first_page(self.table_name)
         except Exception as e:
-            QMessageBox.warning(self, "Error", f"Error cargando tabla: {e}")
+            self.show_error("Error de Búsqueda", str(e))
+
+    def on_load_more_click(self):
+        """Trae la siguiente página (continúa después de la última PK cargada)"""
+        if self.next_key is None:
+            return
+        try:
+            page = self.manager.fetch_table_page(
+                self.table_name, after_key=self.next_key, **self._search_params()
+            )
+            self.next_key = page["next_key"]
+            self._append_rows(page["rows"])
+            self._update_page_status()
+        except Exception as e:
+            self.show_error("Error de Carga", f"No se pudo cargar más registros: {e}")
+
+    def on_refresh_click(self):
+        """Con Change Tracking el refresco solo trae (y pinta) lo que cambió"""
+        key_cols = self.manager.get_primary_key(self.table_name)
+        if self.change_token is None or self._search_params() or len(key_cols) != 1:
+            self._full_refresh()
+            return
+
+        try:
+            changes = self.manager.fetch_table_changes(self.table_name, self.change_token)
+        except Exception as e:
+            self.show_error("Error de Carga", f"No se pudieron leer los cambios: {e}")
+            return
+
+        if changes["full"]:
+            # El token expiró (retención de Change Tracking): recarga completa
+            self._full_refresh()
+            return
+
+        self.change_token = changes["token"]
+        applied = self._apply_changes(changes)
+        self._update_page_status()
+        if applied:
+            self.show_info("Actualizado", f"Se aplicaron {applied} cambios.")
+        else:
+            self.show_info("Actualizado", "No hubo cambios desde la última carga.")
+
+    def _full_refresh(self):
+        self.manager.invalidate_cache(self.table_name)
+        try:
+            # El token se toma antes de leer, para no perder cambios intermedios
+            token = self.manager.get_change_token(self.table_name)
+        except Exception:
+            token = None
+        if not self.load_data(self.table_name):
+            # load_data ya mostró el error; sin token, el próximo refresco vuelve a ser completo
+            return
+        self.change_token = token
+        self.show_info("Actualizado", "Los datos se han recargado correctamente.")
+
+    def _apply_changes(self, changes):
+        """Aplica un delta (insertadas / actualizadas / borradas) sobre las filas cargadas"""
+        id_idx = self.columns.index(self.id_col_name)
+        applied = 0
+
+        def row_positions():
+            positions = {}
+            for r in range(self.table.rowCount()):
+                item = self.table.item(r, id_idx)
+                if item is not None:
+                    positions[item.text()] = r
+            return positions
+
+        # 1. Borradas (de abajo hacia arriba para no correr los índices)
+        positions = row_positions()
+        to_remove = sorted(
+            (positions[str(key[0])] for key in changes["deleted"] if str(key[0]) in positions),
+            reverse=True
+        )
+        for r in to_remove:
+            self.table.removeRow(r)
+        applied += len(to_remove)
+        self.total_rows -= len(changes["deleted"])
+
+        # 2. Actualizadas: solo si la fila está cargada
+        positions = row_positions()
+        for row_data in changes["updated"]:
+            r = positions.get(str(row_data[id_idx]))
+            if r is not None:
+                self._fill_row(r, row_data)
+                applied += 1
+
+        # 3. Insertadas: si caen dentro del rango ya cargado (el resto llega con "Cargar más").
+        # Una fila insertada entre la lectura del token y la de la página ya está en la
+        # grilla (y en el total): se trata como actualización, no se agrega dos veces
+        visible = []
+        for row_data in changes["inserted"]:
+            r = positions.get(str(row_data[id_idx]))
+            if r is not None:
+                self._fill_row(r, row_data)
+                applied += 1
+                continue
+            self.total_rows += 1
+            if self.next_key is None or (row_data[id_idx],) <= tuple(self.next_key):
+                visible.append(row_data)
+        self._append_rows(visible)
+        applied += len(visible)
+        return applied
+
+    def _append_rows(self, rows):
+        start = self.table.rowCount()
+        for offset, row_data in enumerate(rows):
+            row_idx = start + offset
+            self.table.insertRow(row_idx)
+            
+            self._fill_row(row_idx, row_data)
+
+    def _fill_row(self, row_idx, row_data):
+        columns = self.columns
+        row_id = row_data[columns.index(self.id_col_name)]
+        
+        # 1. Llenar datos normales
+        for col_idx, data in enumerate(row_data):
+            val = str(data) if data is not None else ""
+            self.table.setItem(row_idx, col_idx, QTableWidgetItem(val))
+
+        # 2. Agregar botones SOLO si está activado
+        if self.enable_actions:
+            self._add_action_buttons(row_idx, len(columns), self.id_col_name, row_id, row_data, columns)
+
+    def _update_page_status(self):
+        loaded = self.table.rowCount()
+        suffix = " (filtrados)" if self._search_params() else ""
+        self.lbl_status.setText(f"{loaded} de {self.total_rows} registros cargados{suffix}.")
+        self.btn_load_more.setVisible(self.next_key is not None)
 
     def _add_action_buttons(self, row_idx, col_idx, id_col_name, row_id, row_data, columns):
         """
@@ -230,15 +398,16 @@ class TablePage(BasePage):
                         
                         print(f"DEBUG: Cantidad extraída: {qty}")  # <-- Veremos si captura el número
 
-                        # Actualizar Producto
-                        self.manager.update_data(self.table_name, new_data, id_col_name, row_id)
-                        
-                        # Actualizar Inventario (Solo si qty se encontró)
-                        if qty is not None:
-                            print(f"DEBUG: Actualizando inventario ID {row_id} a {qty}")
-                            self.manager.update_inventory_quantity(row_id, qty)
-                        else:
-                            print("ALERTA: No se encontró 'cantidad_inicial' en el formulario.")
+                        # Producto + Inventario en una sola transacción
+                        with self.manager.unit_of_work() as uow:
+                            uow.update(self.table_name, new_data, id_col_name, row_id)
+                            
+                            # Actualizar Inventario (Solo si qty se encontró)
+                            if qty is not None:
+                                print(f"DEBUG: Actualizando inventario ID {row_id} a {qty}")
+                                uow.update_inventory_quantity(row_id, qty)
+                            else:
+                                print("ALERTA: No se encontró 'cantidad_inicial' en el formulario.")
 
                     else:
                         self.manager.update_data(self.table_name, new_data, id_col_name, row_id)
@@ -1,6 +1,7 @@
 # frontend/window.py
 
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QHBoxLayout, QStackedWidget)
+from PyQt6.QtCore import QTimer, pyqtSignal
 
 from frontend.pages.employees_page import EmployeesPage
 from frontend.pages.products_page import ProductsPage
@@ -8,8 +9,13 @@ from frontend.pages.sucursales_page import SucursalesPage
 from .components import Sidebar
 from .theme import get_main_stylesheet
 from .pages.table_page import TablePage
+from .toast_alert import ToastNotification
+from backend.config import STOCK_ALERTS
 
 class TechStoreWindow(QMainWindow):
+    # Las alertas pueden llegar desde cualquier hilo; la señal las trae al hilo de la UI
+    stock_alerts_received = pyqtSignal(list)
+
     def __init__(self, data_manager):
         super().__init__()
         self.manager = data_manager
@@ -17,6 +23,7 @@ class TechStoreWindow(QMainWindow):
         self.pages = {} 
         
         self.init_ui()
+        self._setup_stock_alerts()
 
     def init_ui(self):
         self.setWindowTitle(f"TechStore - {self.node_info['key']}")
@@ -100,4 +107,47 @@ class TechStoreWindow(QMainWindow):
             self.stack.setCurrentWidget(target_page)
             
             # 2. Le decimos que cargue los datos frescos
-            target_page.refresh()
\ No newline at end of file
+            target_page.refresh()
+
+    # --- ALERTAS DE STOCK BAJO ---
+
+    def _setup_stock_alerts(self):
+        """Revisión periódica + avisos incrementales, agrupados en un solo toast"""
+        self._pending_alerts = {}
+
+        self.coalesce_timer = QTimer(self)
+        self.coalesce_timer.setSingleShot(True)
+        self.coalesce_timer.setInterval(STOCK_ALERTS["coalesce_ms"])
+        self.coalesce_timer.timeout.connect(self._show_stock_alerts)
+
+        self.stock_alerts_received.connect(self._queue_stock_alerts)
+        self.manager.subscribe_stock_alerts(self.stock_alerts_received.emit)
+
+        self.alert_timer = QTimer(self)
+        self.alert_timer.setInterval(STOCK_ALERTS["scan_interval_seconds"] * 1000)
+        self.alert_timer.timeout.connect(self._scan_stock)
+        self.alert_timer.start()
+        QTimer.singleShot(0, self._scan_stock)
+
+    def _scan_stock(self):
+        try:
+            self.manager.scan_low_stock()
+        except Exception as e:
+            print(f"ALERTA: Revisión de stock bajo fallida: {e}")
+
+    def _queue_stock_alerts(self, alerts):
+        for alert in alerts:
+            self._pending_alerts[(alert["sucursal"], alert["producto"])] = alert
+        if not self.coalesce_timer.isActive():
+            self.coalesce_timer.start()
+
+    def _show_stock_alerts(self):
+        alerts, self._pending_alerts = list(self._pending_alerts.values()), {}
+        if not alerts:
+            return
+        alerts.sort(key=lambda a: a["cantidad"])
+        lines = [f"{a['nombre']}: {a['cantidad']} (mín. {a['umbral']})" for a in alerts[:5]]
+        if len(alerts) > 5:
+            lines.append(f"... y {len(alerts) - 5} más")
+        title = "Stock bajo" if len(alerts) == 1 else f"{len(alerts)} productos con stock bajo"
+        ToastNotification(self, title, "\n".join(lines), "warning").show_toast()
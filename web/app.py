@@ -5,7 +5,7 @@ import tkinter as tk
 from tkinter import ttk
 import sys
 import os
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, abort
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
@@ -22,11 +22,13 @@ manager = DataManager()
 
 @app.route('/')
 def index():
-    products = manager.get_web_catalog()
+    # Búsqueda opcional (?q=texto), resuelta sobre el catálogo en memoria
+    search = request.args.get('q', '').strip()
+    products = manager.get_web_catalog(search)
     # Inicializar carrito si no existe
     if 'cart' not in session:
         session['cart'] = {}
-    return render_template('store.html', products=products, node=manager.current_node['key'])
+    return render_template('store.html', products=products, node=manager.current_node['key'], search=search)
 
 @app.route('/add_to_cart', methods=['POST'])
 def add_to_cart():
@@ -56,6 +58,7 @@ def view_cart():
     all_products = manager.get_web_catalog()
     cart_items = []
     total_general = 0
+    prices = {}
     
     for prod in all_products:
         p_id = str(prod['id'])
@@ -71,7 +74,11 @@ def view_cart():
                 "qty": qty,
                 "subtotal": subtotal
             })
-            
+            prices[p_id] = prod['precio']
+
+    # Precios que vio el cliente: el checkout no cobra otro distinto
+    session['cart_prices'] = prices
+    session.modified = True
     return render_template('cart.html', cart_items=cart_items, total=total_general)
 
 @app.route('/clear_cart')
@@ -93,8 +100,10 @@ def checkout():
         flash("El carrito está vacío.", "warning")
         return redirect(url_for('index'))
     
-    # Convertir formato para el backend: [{'id': 1, 'qty': 2}, ...]
-    items_to_buy = [{"id": int(k), "qty": v} for k, v in cart.items()]
+    # Convertir formato para el backend: [{'id': 1, 'qty': 2, 'precio': 10.5}, ...]
+    # (precio = el mostrado en el carrito; si cambió, la compra se rechaza)
+    prices = session.get('cart_prices', {})
+    items_to_buy = [{"id": int(k), "qty": v, "precio": prices.get(k)} for k, v in cart.items()]
     client_id = session['client_id']
     
     # 3. Procesar
@@ -165,6 +174,24 @@ def login_view():
 
     return render_template('login.html')
 
+# --- RUTAS DE ADMINISTRACIÓN (JSON) ---
+
+@app.route('/admin/stock-alerts')
+def admin_stock_alerts():
+    # No hay login de administrador: solo se responde a pedidos desde esta misma PC
+    if request.remote_addr not in ("127.0.0.1", "::1"):
+        abort(403)
+    sucursal = request.args.get('sucursal', type=int) or manager.current_node['id_sucursal']
+    alerts = manager.scan_low_stock(sucursal)
+    summary = manager.get_inventory_summary(with_branches=False)
+    return jsonify({
+        "nodo": manager.current_node['key'],
+        "sucursal": sucursal,
+        "alertas": alerts,
+        "productos_stock_bajo_red": summary["low_stock_count"],
+        "unidades_red": summary["total_units"]
+    })
+
 
 def get_ip_choices():
     """Detecta las IPs disponibles en la computadora."""